@@ -16,4 +16,5 @@ def debug_files():
     dirty_files = list(path.glob("*_DIRTY.CSV"))
     print(f"Files matching '*_DIRTY.CSV': {len(dirty_files)}")
 
-debug_files()
+if __name__ == "__main__":
+    debug_files()
@@ -0,0 +1,98 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+import error_table
+import store
+
+LIMITS = {
+    # field: (smallest departure from the rolling median that can be a
+    # spike, fastest plausible change per second)
+    "temp": (2.0, 0.2),
+    "hum": (10.0, 1.0),
+}
+WINDOW = 25
+THRESHOLD = 5.0
+MAD_SCALE = 1.4826
+FLATLINE_SECONDS = 3600
+
+def _runs(x):
+    # Start and end (exclusive) of every run of equal consecutive values.
+    change = np.flatnonzero(x[1:] != x[:-1]) + 1
+    return np.concatenate([[0], change]), np.concatenate([change, [len(x)]])
+
+def detect(values, step, min_deviation, max_rate, window=WINDOW, threshold=THRESHOLD,
+           flatline_seconds=FLATLINE_SECONDS):
+
+    # Error code per slot of one sensor's column, VALID where the reading is
+    # fine or missing. Readings are taken in order, gaps left out.
+    values = store.to_float64(values)
+    codes = np.zeros(len(values), dtype=np.int8)
+    slots = np.flatnonzero(~np.isnan(values))
+    x = values[slots]
+    if not len(x):
+        return codes
+    flags = np.zeros(len(x), dtype=np.int8)
+
+    # A run of one value over flatline_seconds worth of readings (counted,
+    # so equal values around an outage are not one) is a flatline, or stuck
+    # at zero for zeros, as is a shorter run of zeros next to a reading
+    # further than min_deviation from 0.
+    starts, ends = _runs(x)
+    run_of = np.repeat(np.arange(len(starts)), ends - starts)
+    long_run = (ends - starts) * step >= flatline_seconds
+    zero_run = x[starts] == 0
+    before = np.abs(x[np.maximum(starts - 1, 0)]) * (starts > 0)
+    after = np.abs(x[np.minimum(ends, len(x) - 1)]) * (ends < len(x))
+    stuck = zero_run & (long_run | (before > min_deviation) | (after > min_deviation))
+    flags[long_run[run_of]] = error_table.FLATLINE
+    flags[stuck[run_of]] = error_table.STUCK_ZERO
+
+    # Of the rest, a reading changing faster than max_rate next to a
+    # neighbour is a spike when it is further than threshold scaled MADs
+    # from the median of the window around it. Only those get a window.
+    rest = np.flatnonzero(flags == error_table.VALID)
+    y = x[rest]
+    if len(y) > 1:
+        jump = np.abs(np.diff(y)) / (np.diff(slots[rest]) * step) > max_rate
+        fast = np.flatnonzero(np.concatenate([jump, [False]]) | np.concatenate([[False], jump]))
+        if len(fast):
+            windows = sliding_window_view(np.pad(y, window // 2, mode="symmetric"), window)[fast]
+            median = np.median(windows, axis=1)
+            mad = np.median(np.abs(windows - median[:, None]), axis=1)
+            spike = np.abs(y[fast] - median) > np.maximum(threshold * MAD_SCALE * mad, min_deviation)
+            flags[rest[fast[spike]]] = error_table.SPIKE
+
+    codes[slots] = flags
+    return codes
+
+def detect_since(values, step, first, min_deviation, max_rate, window=WINDOW, threshold=THRESHOLD,
+                 flatline_seconds=FLATLINE_SECONDS):
+
+    # (start, codes): detect's codes from slot start <= first on, when only
+    # slots from first on changed; earlier verdicts cannot. A change reaches
+    # back through the run it continues and half a window of other readings,
+    # so the stretch scanned doubles until it also holds the run before and
+    # a whole window of other readings in between.
+    half = window // 2
+    margin = 4 * window
+    while True:
+        lo = max(first - margin, 0)
+        codes = detect(values[lo:], step, min_deviation, max_rate, window, threshold, flatline_seconds)
+        if not lo:
+            return 0, codes
+        chunk = store.to_float64(values[lo:])
+        slots = np.flatnonzero(~np.isnan(chunk))
+        x = chunk[slots]
+        change = np.flatnonzero(x[1:] != x[:-1]) + 1
+        known = np.searchsorted(slots, first - lo)
+        ends = change[change <= known - 1]
+        if len(ends) > 1:
+            rest = np.flatnonzero(np.isin(codes[slots], (error_table.VALID, error_table.SPIKE)))
+            r_first, r_run = np.searchsorted(rest, [change[0], ends[-1]])
+            if r_run - r_first >= 2 * half:
+                start = slots[rest[r_run - half]]
+                return lo + start, codes[start:]
+        margin *= 2
+
+def detect_columns(columns, step, limits=LIMITS):
+    return {field: detect(columns[field], step, *limits[field]) for field in store.FIELDS}
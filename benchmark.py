@@ -0,0 +1,1084 @@
+import argparse
+import contextlib
+import datetime as dt
+import filecmp
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import warnings
+
+import numpy as np
+
+import anomaly
+import consensus
+import error_table
+import impute
+import io_utils
+import main
+import perf
+import proc
+import query
+import report
+import rollup
+import store
+import synth
+import timeaxis
+import watch
+from main import HUM_RANGE, INVALID_TOKEN, TEMP_RANGE
+
+
+def count_lines(files_info):
+    total = 0
+    for info in files_info:
+        with open(info["path"], "r", encoding="utf-8") as f:
+            total += sum(1 for line in f if line.strip()) - 1
+    return max(total, 0)
+
+
+def _day_axis(files_info):
+    # Day axis on the date found in the files' rows.
+    return proc.build_timeline(day=next(filter(None, (io_utils.peek_date(i["path"]) for i in files_info)), None))
+
+
+def _with_axes(catalog, step=5):
+    # Adds the per-file "axis" that main.py sets up before ingest.
+    dates = main.resolve_dates(io_utils.group_by_day(catalog))
+    for info in catalog:
+        info["axis"] = timeaxis.TimeAxis.for_days(dates[info["day"]], step=step)
+    return catalog
+
+
+def _ingest_linear_scan(path, timeline):
+    # The original main.py loop: membership test against the timeline list.
+    found = set()
+    with open(path, "r", encoding="utf-8") as f:
+        next(f, None)
+        for line in f:
+            clean_line = line.strip()
+            if not clean_line:
+                continue
+            _ , time_v, t_raw, h_raw = [p.strip() for p in clean_line.split(";")]
+            if time_v not in timeline:
+                continue
+            found.add(time_v)
+            proc.validate_field(t_raw, "temp", TEMP_RANGE, INVALID_TOKEN)
+            proc.validate_field(h_raw, "hum", HUM_RANGE, INVALID_TOKEN)
+    return found
+
+
+def bench_slotting(raw_dir="data/raw"):
+
+    files_info = io_utils.find_raw_files(raw_dir)
+    n_lines = count_lines(files_info)
+    timeline = _day_axis(files_info)
+    labels = list(timeline)
+
+    start = time.perf_counter()
+    for info in files_info:
+        set(labels) - _ingest_linear_scan(info["path"], labels)
+    before = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for info in files_info:
+        _, presence, _, _ = proc.ingest_file(
+            info["path"], info["sensor"], timeline, TEMP_RANGE, HUM_RANGE, INVALID_TOKEN
+        )
+        proc.identify_gaps(timeline, presence, info["sensor"])
+    after = time.perf_counter() - start
+
+    print(f"Timestamp slotting over {len(files_info)} files, {n_lines:,} lines")
+    print(f"  list scan  : {before:8.3f} s  {n_lines / before:12,.0f} lines/s")
+    print(f"  time axis  : {after:8.3f} s  {n_lines / after:12,.0f} lines/s")
+    print(f"  speedup    : {before / after:.1f}x")
+
+
+def bench_store(raw_dir="data/raw"):
+
+    files_info = io_utils.find_raw_files(raw_dir)
+    sensor_names = [info["sensor"] for info in files_info]
+    timeline = _day_axis(files_info)
+
+    tracemalloc.start()
+    nested = {t: {s: {"temp": "N/A", "hum": "N/A"} for s in sensor_names} for t in timeline}
+    nested_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del nested
+
+    tracemalloc.start()
+    data = store.SensorStore(timeline, sensor_names)
+    store_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    for info in files_info:
+        columns, _, _, _ = proc.ingest_file(
+            info["path"], info["sensor"], timeline, TEMP_RANGE, HUM_RANGE, INVALID_TOKEN
+        )
+        for field, values in columns.items():
+            data.set_column(info["sensor"], field, values)
+
+    start = time.perf_counter()
+    proc.statistics(data, sensor_names)
+    stats_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    rollup.rollup(data, rollup.LEVELS)
+    agg_time = time.perf_counter() - start
+
+    print(f"Day store for {len(sensor_names)} sensors x {len(timeline):,} slots")
+    print(f"  nested dict : {nested_bytes / 1e6:8.2f} MB")
+    print(f"  SensorStore : {store_bytes / 1e6:8.2f} MB")
+    print(f"  statistics  : {stats_time * 1e3:8.1f} ms")
+    print(f"  aggregation : {agg_time * 1e3:8.1f} ms")
+
+
+def bench_workers(raw_dir="data/raw", counts=(1, 2, 4, 8)):
+
+    catalog = _with_axes(io_utils.build_catalog(raw_dir))
+    n_lines = count_lines(catalog)
+
+    print(f"Parallel ingest over {len(catalog)} files, {n_lines:,} lines")
+    baseline = None
+    for workers in counts:
+        executor = main.make_executor(workers)
+        start = time.perf_counter()
+        for _ in main.ingest_files(catalog, executor):
+            pass
+        elapsed = time.perf_counter() - start
+        if executor is not None:
+            executor.shutdown()
+        baseline = baseline or elapsed
+        print(f"  workers={workers:<3}: {elapsed:8.3f} s  {n_lines / elapsed:12,.0f} lines/s  {baseline / elapsed:5.2f}x")
+
+
+def _raw_fields(path):
+    temps, hums = [], []
+    with open(path, "r", encoding="utf-8") as f:
+        next(f, None)
+        for line in f:
+            clean_line = line.strip()
+            if not clean_line:
+                continue
+            _ , _, t_raw, h_raw = [p.strip() for p in clean_line.split(";")]
+            temps.append(t_raw)
+            hums.append(h_raw)
+    return temps, hums
+
+
+def bench_validation(raw_dir="data/raw"):
+
+    # Besides timing, checks that validate_column classifies every field of
+    # every raw file, and the odd fields below, exactly like validate_field.
+    catalog = io_utils.build_catalog(raw_dir)
+    columns = []
+    for info in catalog:
+        temps, hums = _raw_fields(info["path"])
+        columns.append((info["path"].name, "temp", temps, TEMP_RANGE))
+        columns.append((info["path"].name, "hum", hums, HUM_RANGE))
+    odd = ["21.5", "1\x00", "\x00", "\x001", "1\x00\x00", "x" * 40000, "0." + "0" * 40 + "1", "9" * 40,
+           "n/a", "N/A" * 12, "nan", "inf", "-", ".", "1.", ".5", "+1", "1e2", "-0", "--1", "1.2.3", "", "21.5",
+           "1E+05", "2.5e-1", "-Infinity", "+nan", "1e", "1_0", " 1", "\u0663", "1e400", "1" * 20 + "e-18"]
+    columns.append(("odd fields", "temp", odd, TEMP_RANGE))
+    n_fields = sum(len(raw) for _, _, raw, _ in columns)
+
+    start = time.perf_counter()
+    scalar = [
+        [proc.validate_field(v, field, v_range, INVALID_TOKEN) for v in raw]
+        for _, field, raw, v_range in columns
+    ]
+    scalar_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batch = [proc.validate_column(raw, v_range, INVALID_TOKEN) for _, _, raw, v_range in columns]
+    batch_time = time.perf_counter() - start
+
+    mismatches = 0
+    for (name, field, raw, _), expected, (values, valid, codes) in zip(columns, scalar, batch):
+        for i, (val, err) in enumerate(expected):
+            got_val = values[i] if valid[i] else "N/A"
+            if err != proc.ERROR_TYPES[codes[i]] or val != got_val:
+                mismatches += 1
+                print(f"  MISMATCH {name} {field} {raw[i][:40]!r}: {val!r}/{err} vs {got_val!r}/{proc.ERROR_TYPES[codes[i]]}")
+
+    print(f"Field validation over {len(catalog)} files, {n_fields:,} fields")
+    print(f"  validate_field  : {scalar_time:8.3f} s  {n_fields / scalar_time:12,.0f} fields/s")
+    print(f"  validate_column : {batch_time:8.3f} s  {n_fields / batch_time:12,.0f} fields/s")
+    print(f"  mismatches      : {mismatches}")
+    assert not mismatches, f"validate_column differs from validate_field on {mismatches} fields"
+
+
+def _load_output(path, fmt):
+    if fmt == "npz":
+        with np.load(path) as data:
+            return {name: data[name] for name in data.files}
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+        return pq.read_table(path)
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def bench_formats(raw_dir="data/raw", day="02"):
+
+    files_info = io_utils.find_raw_files(raw_dir, day=day)
+    sensor_names = [info["sensor"] for info in files_info]
+    timeline = _day_axis(files_info)
+    data = store.SensorStore(timeline, sensor_names)
+    for info in files_info:
+        columns = proc.ingest_file(
+            info["path"], info["sensor"], timeline, TEMP_RANGE, HUM_RANGE, INVALID_TOKEN
+        )[0]
+        for field, values in columns.items():
+            data.set_column(info["sensor"], field, values)
+
+    outputs = {"clean_data": data}
+    outputs.update({f"data_{name}": level for name, level in rollup.rollup(data).items()})
+
+    print(f"Output formats for DAY{day} ({len(sensor_names)} sensors)")
+    print(f"  {'output':<14} {'format':<8} {'size':>12} {'write':>10} {'load':>10}")
+    with tempfile.TemporaryDirectory() as out_dir:
+        for name, output in outputs.items():
+            for fmt in report.available_formats():
+                start = time.perf_counter()
+                path = report.write_data(output, out_dir, name, fmt)
+                write_time = time.perf_counter() - start
+                start = time.perf_counter()
+                _load_output(path, fmt)
+                load_time = time.perf_counter() - start
+                size = os.path.getsize(path)
+                os.remove(path)
+                print(f"  {name:<14} {fmt:<8} {size:>12,} {write_time * 1e3:>8.1f}ms {load_time * 1e3:>8.1f}ms")
+
+
+def _legacy_data_log(rows, timeline, sensor_names, output_path):
+    # The original generate_data_log: one write() per row on a default handle.
+    data_file = open(output_path, "w", encoding="utf-8")
+    for t in timeline:
+        first_entry = True
+        for s in sensor_names:
+            time_col = t if first_entry else ""
+            temp = rows[t][s]["temp"]
+            hum = rows[t][s]["hum"]
+            t_str = f"{temp:.2f}" if isinstance(temp, float) else str(temp)
+            h_str = f"{hum:.2f}" if isinstance(hum, float) else str(hum)
+            data_file.write(f"{time_col:<8} | {s:<10} | {t_str:<8} | {h_str:<8}\n")
+            first_entry = False
+        data_file.write("-" * 40 + "\n")
+    data_file.close()
+
+
+def _legacy_error_log(sorted_errors, output_path):
+    log_file = open(output_path, "w", encoding="utf-8")
+    last_time = None
+    for err in sorted_errors:
+        display_time = "" if err['time'] == last_time else err['time']
+        log_file.write(
+            f"{display_time:<8} | {err['sensor']:<10} | "
+            f"{err['type']:<15} | {err['msg']:<22} | {err['raw']}\n"
+        )
+        last_time = err['time']
+    log_file.close()
+
+
+def _day_errors(files_info, timeline, data=None):
+    tables = []
+    for info in files_info:
+        columns, presence, errors, _ = proc.ingest_file(
+            info["path"], info["sensor"], timeline, TEMP_RANGE, HUM_RANGE, INVALID_TOKEN
+        )
+        if data is not None:
+            for field, values in columns.items():
+                data.set_column(info["sensor"], field, values)
+        tables.append(errors)
+    return error_table.concat(tables)
+
+
+def bench_errors(raw_dir="data/raw", day="02"):
+
+    files_info = io_utils.find_raw_files(raw_dir, day=day)
+    timeline = _day_axis(files_info)
+    table = _day_errors(files_info, timeline)
+
+    tracemalloc.start()
+    records = list(table.records(timeline))
+    dict_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    sorted_records = sorted(records, key=lambda x: x['time'])
+    dict_sort = time.perf_counter() - start
+    start = time.perf_counter()
+    sorted_table = table.sorted()
+    table_sort = time.perf_counter() - start
+
+    start = time.perf_counter()
+    by_type = {}
+    for err in records:
+        by_type[err["type"]] = by_type.get(err["type"], 0) + 1
+    dict_count = time.perf_counter() - start
+    start = time.perf_counter()
+    table_counts = table.counts_by_type()
+    table_count = time.perf_counter() - start
+
+    mismatches = sum(a != b for a, b in zip(sorted_records, sorted_table.records(timeline)))
+    print(f"Error records for DAY{day}: {len(table):,} rows")
+    print(f"  memory     : dicts {dict_bytes / 1e6:8.1f} MB | table {table.nbytes / 1e6:8.2f} MB")
+    print(f"  sort       : dicts {dict_sort * 1e3:8.1f} ms | table {table_sort * 1e3:8.2f} ms")
+    print(f"  count/type : dicts {dict_count * 1e3:8.1f} ms | table {table_count * 1e3:8.2f} ms")
+    print(f"  {table_counts}")
+    print(f"  sorted order mismatches: {mismatches}")
+
+
+def bench_parsing(raw_dir="data/raw"):
+
+    # Every *_raw.csv in the corpus, parsed into fields and then fully
+    # ingested with both parsers; the ingest results must be identical and
+    # the mmap ingest at least 5x faster.
+    files_info = _with_axes(io_utils.build_catalog(raw_dir))
+    total_bytes = sum(info["size"] for info in files_info)
+
+    def split_lines(info):
+        for _ in io_utils.iter_chunks(info["path"]):
+            pass
+
+    def split_mmap(info):
+        for _ in io_utils.iter_blocks(info["path"]):
+            pass
+
+    def ingest(parser):
+        return lambda info: proc.ingest_file(info["path"], "", info["axis"], TEMP_RANGE, HUM_RANGE, INVALID_TOKEN, parser=parser)
+
+    def timed(fn, repeat=3):
+        # Sum over files of the best of `repeat` runs per file.
+        elapsed, results = 0.0, []
+        for info in files_info:
+            best = float("inf")
+            for _ in range(repeat):
+                start = time.perf_counter()
+                result = fn(info)
+                best = min(best, time.perf_counter() - start)
+            elapsed += best
+            results.append(result)
+        return elapsed, results
+
+    split = {name: timed(fn)[0] for name, fn in (("lines", split_lines), ("mmap", split_mmap))}
+    full = {parser: timed(ingest(parser)) for parser in proc.PARSERS}
+
+    mismatches = 0
+    for a, b in zip(full["mmap"][1], full["lines"][1]):
+        same = all(np.array_equal(a[0][f], b[0][f], equal_nan=True) for f in store.FIELDS)
+        same &= np.array_equal(a[1], b[1])
+        same &= all(np.array_equal(x, y) for x, y in zip(a[2].columns().values(), b[2].columns().values()))
+        mismatches += not same
+
+    print(f"Parsing {len(files_info)} files, {total_bytes / 1e6:.1f} MB")
+    for label, timings in (("split", split), ("ingest", {p: t for p, (t, _) in full.items()})):
+        for parser in ("lines", "mmap"):
+            print(f"  {label:<6} {parser:<5}: {timings[parser]:7.3f} s  {total_bytes / timings[parser] / 1e6:7.1f} MB/s")
+        print(f"  {label:<6} speedup: {timings['lines'] / timings['mmap']:.1f}x")
+    print(f"  ingest mismatches: {mismatches}")
+    assert not mismatches, f"the mmap and lines parsers differ on {mismatches} files"
+    speedup = full["lines"][0] / full["mmap"][0]
+    assert speedup >= 5, f"mmap ingest is {speedup:.1f}x faster than lines, short of the 5x target"
+
+
+def _per_slot_gaps(timeline, presence, sensor):
+    # The original identify_gaps: one UNRECIEVED record per missing slot.
+    timeline = list(timeline)
+    return [
+        {"time": timeline[slot], "sensor": sensor, "type": "UNRECIEVED", "msg": "Missing data entry", "raw": "N/A"}
+        for slot in np.flatnonzero(~presence).tolist()
+    ]
+
+
+def bench_gaps(raw_dir="data/raw", day="02"):
+
+    files_info = io_utils.find_raw_files(raw_dir, day=day)
+    timeline = _day_axis(files_info)
+    presences = [
+        (info["sensor"], proc.ingest_file(info["path"], info["sensor"], timeline, TEMP_RANGE, HUM_RANGE, INVALID_TOKEN)[1])
+        for info in files_info
+    ]
+
+    results = {}
+    for name, detect in (("per slot", _per_slot_gaps), ("intervals", proc.identify_gaps)):
+        start = time.perf_counter()
+        gaps = [g for sensor, presence in presences for g in detect(timeline, presence, sensor)]
+        results[name] = (time.perf_counter() - start, gaps)
+
+    covered = sum(g["slots"] for g in results["intervals"][1])
+    print(f"Gap detection for DAY{day}, {len(presences)} sensors")
+    for name, (elapsed, gaps) in results.items():
+        print(f"  {name:<10}: {elapsed * 1e3:8.2f} ms  {len(gaps):8,} records")
+    print(f"  missing slots covered by intervals: {covered:,} / {len(results['per slot'][1]):,}")
+
+
+def bench_reports(raw_dir="data/raw", day="02"):
+
+    files_info = io_utils.find_raw_files(raw_dir, day=day)
+    sensor_names = [info["sensor"] for info in files_info]
+    timeline = _day_axis(files_info)
+    data = store.SensorStore(timeline, sensor_names)
+    table = _day_errors(files_info, timeline, data)
+    sorted_errors = list(table.sorted().records(timeline))
+
+    print(f"Text reports for DAY{day}: {len(timeline) * len(sensor_names):,} data rows, {len(sorted_errors):,} error rows")
+    with tempfile.TemporaryDirectory() as out_dir:
+        path = os.path.join(out_dir, "report.log")
+        runs = [
+            ("data log, per-row", lambda: _legacy_data_log(data.to_dict(), timeline, sensor_names, path)),
+            ("data log, blocks", lambda: report.generate_data_log(data, timeline, sensor_names, path)),
+            ("error log, per-row", lambda: _legacy_error_log(sorted_errors, path)),
+            ("error log, blocks", lambda: report.generate_error_log(table, timeline, path)),
+        ]
+        for name, run in runs:
+            best = float("inf")
+            for _ in range(3):
+                start = time.perf_counter()
+                run()
+                best = min(best, time.perf_counter() - start)
+            print(f"  {name:<20}: {best * 1e3:8.1f} ms")
+
+
+def bench_window(raw_dir="data/raw"):
+
+    # All days of the corpus as one contiguous window against one store per
+    # day; ingest is shared, so this times placement, gaps and roll-ups.
+    catalog = _with_axes(io_utils.build_catalog(raw_dir))
+    results = [proc.ingest_file(info["path"], info["sensor"], info["axis"], TEMP_RANGE, HUM_RANGE, INVALID_TOKEN)
+               for info in catalog]
+    sensor_names = list(dict.fromkeys(info["sensor"] for info in catalog))
+    axes = {info["day"]: info["axis"] for info in catalog}
+    start, end = min(a.start for a in axes.values()), max(a.end for a in axes.values())
+    window = timeaxis.TimeAxis(start, (end - start) // 5, 5)
+
+    def assemble(axis, files):
+        data = store.SensorStore(axis, sensor_names)
+        presence = {s: np.zeros(len(axis), dtype=bool) for s in sensor_names}
+        for info, (columns, present, _, _) in files:
+            offset = axis.offset_of(info["axis"])
+            dst = slice(offset, offset + len(info["axis"]))
+            for field, values in columns.items():
+                data.set_column(info["sensor"], field, values, dst)
+            presence[info["sensor"]][dst] |= present
+        gaps = [g for s, p in presence.items() for g in proc.identify_gaps(axis, p, s)]
+        return data, gaps, rollup.rollup(data, rollup.LEVELS)
+
+    def per_day():
+        by_day = {}
+        for info, result in zip(catalog, results):
+            by_day.setdefault(info["day"], []).append((info, result))
+        return {day: assemble(axes[day], files) for day, files in by_day.items()}
+
+    def one_window():
+        return assemble(window, list(zip(catalog, results)))
+
+    timings = {}
+    for name, run in (("per day", per_day), ("window", one_window)):
+        best = float("inf")
+        for _ in range(3):
+            start = time.perf_counter()
+            out = run()
+            best = min(best, time.perf_counter() - start)
+        timings[name] = (best, out)
+
+    days, (data, _, _) = timings["per day"][1], timings["window"][1]
+    mismatches = 0
+    for day, (day_data, _, _) in days.items():
+        offset = window.offset_of(axes[day])
+        for field in store.FIELDS:
+            part = data.values(field)[offset:offset + len(axes[day])]
+            mismatches += not np.array_equal(part, day_data.values(field), equal_nan=True)
+
+    print(f"{len(axes)} days x {len(sensor_names)} sensors, window of {len(window):,} slots")
+    for name, (elapsed, _) in timings.items():
+        print(f"  {name:<8}: {elapsed * 1e3:8.1f} ms")
+    print(f"  store mismatches: {mismatches}")
+
+
+SYNTHETIC_SCALES = "9x1,9x3"
+SYNTHETIC_RESULTS = "bench_results.json"
+
+
+def _percentile(values, q):
+    return round(float(np.percentile(values, q)), 4) if len(values) else None
+
+
+def _scenario_result(corpus, run_s, perf_report):
+
+    # Throughput per stage over the whole run, latency per stage over its
+    # scopes (one per day) and per parsed file.
+    stages = {}
+    for record in perf_report["stages"]:
+        stages.setdefault(record["stage"], []).append(record)
+    by_stage = {}
+    for name, records in stages.items():
+        wall = sum(r["wall_s"] for r in records)
+        rows = sum(r["rows"] or 0 for r in records)
+        latencies = [r["wall_s"] for r in records]
+        by_stage[name] = {
+            "wall_s": round(wall, 4),
+            "cpu_s": round(sum(r["cpu_s"] for r in records), 4),
+            "rows": rows,
+            "rows_per_s": round(rows / wall) if wall else None,
+            "p50_s": _percentile(latencies, 50),
+            "max_s": max(latencies)
+        }
+
+    files = [f for f in perf_report["files"] if f["source"] == "parsed"]
+    file_wall = [f["wall_s"] for f in files]
+    total = perf_report["total"]
+    return {
+        "corpus": corpus,
+        "run_s": round(run_s, 3),
+        "total": total,
+        "rows_per_s": round(corpus["clean_rows"] / total["wall_s"]) if total["wall_s"] else None,
+        "mb_per_s": round(corpus["raw_bytes"] / 1e6 / total["wall_s"], 2) if total["wall_s"] else None,
+        "stages": by_stage,
+        "files": {
+            "parsed": len(files),
+            "p50_s": _percentile(file_wall, 50),
+            "p95_s": _percentile(file_wall, 95),
+            "max_s": max(file_wall, default=None),
+            "mb_per_s": round(sum(f["bytes"] for f in files) / 1e6 / sum(file_wall), 2) if sum(file_wall) else None
+        }
+    }
+
+
+def bench_synthetic(scales=SYNTHETIC_SCALES, interval=5, corruption_rate=0.15, coverage=0.9, seed=0,
+                    workers=1, window=False, output=SYNTHETIC_RESULTS):
+
+    # Generates a seeded corpus per scale (sensors x days) with the
+    # data/raw corruption logic, runs main.py over it in a fresh process so
+    # peak RSS is per run, and collects its perf_report.json.
+    main_py = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")
+    results = []
+    for sensors, days in synth.parse_scales(scales):
+        with tempfile.TemporaryDirectory() as work:
+            raw_dir, out_dir = os.path.join(work, "raw"), os.path.join(work, "processed")
+            corpus = synth.generate_corpus(raw_dir, sensors, days, interval, corruption_rate, coverage, seed, workers)
+            command = [
+                sys.executable, main_py, "--all", "--raw-dir", raw_dir, "--out-dir", out_dir,
+                "--no-cache", "--step", str(interval), "--workers", str(workers)
+            ]
+            if window:
+                command.append("--window")
+            start = time.perf_counter()
+            subprocess.run(command, check=True, stdout=subprocess.DEVNULL)
+            run_s = time.perf_counter() - start
+            with open(os.path.join(out_dir, perf.PERF_REPORT), "r", encoding="utf-8") as f:
+                results.append(_scenario_result(corpus, run_s, json.load(f)))
+
+        result = results[-1]
+        print(f"Synthetic corpus {sensors} sensors x {days} days, {corpus['clean_rows']:,} rows, "
+              f"{corpus['raw_bytes'] / 1e6:.1f} MB (generated in {corpus['generate_s']:.1f} s)")
+        print(f"  pipeline   : {result['total']['wall_s']:8.3f} s  {result['rows_per_s']:>12,} rows/s  "
+              f"{result['mb_per_s']:7.2f} MB/s  peak RSS {result['total']['peak_rss_mb']} MB")
+        for name, stage in sorted(result["stages"].items(), key=lambda item: -item[1]["wall_s"]):
+            print(f"  {name:<11}: {stage['wall_s']:8.3f} s  p50 {stage['p50_s']:7.3f} s  max {stage['max_s']:7.3f} s")
+
+    report = {
+        "started": dt.datetime.now().isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "numpy": np.__version__,
+        "settings": {"interval": interval, "corruption_rate": corruption_rate, "coverage": coverage,
+                     "seed": seed, "workers": workers, "window": window},
+        "scenarios": results
+    }
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results: {output}")
+
+
+def bench_watch(sensors=9, days=2, lines_per_tick=12, seed=0):
+
+    # Appends a synthetic corpus to growing SENSORxx.CSV files a minute of
+    # readings per sensor at a time, ticking the watcher after every append.
+    # Tick latency early and late in each day should be the same; the final
+    # outputs of every day are compared with process_day over the day files.
+    with tempfile.TemporaryDirectory() as work:
+        raw_dir, live_dir = os.path.join(work, "raw"), os.path.join(work, "live")
+        synth.generate_corpus(raw_dir, sensors, days, seed=seed)
+        catalog = _with_axes(io_utils.build_catalog(raw_dir))
+        lines = {}
+        for info in catalog:
+            with open(info["path"], "r", encoding="utf-8") as f:
+                lines.setdefault(info["sensor"], []).extend(line + "\n" for line in f.read().splitlines())
+        os.makedirs(live_dir)
+        sources = []
+        for sensor in lines:
+            path = os.path.join(live_dir, f"{sensor}.CSV")
+            open(path, "w").close()
+            sources.append({"path": path, "sensor": sensor})
+
+        watcher = watch.Watcher(sources, os.path.join(work, "watch"), flush_interval=float("inf"),
+                                rollover_grace=float("inf"), temp_range=TEMP_RANGE, hum_range=HUM_RANGE, anomaly_limits=anomaly.LIMITS,
+                                invalid_tokens=INVALID_TOKEN)
+        ticks = []
+        n_ticks = -(-max(len(v) for v in lines.values()) // lines_per_tick)
+        with contextlib.redirect_stdout(None):
+            for i in range(n_ticks):
+                for info in sources:
+                    with open(info["path"], "a", encoding="utf-8") as f:
+                        f.writelines(lines[info["sensor"]][i * lines_per_tick:(i + 1) * lines_per_tick])
+                start = time.perf_counter()
+                day = watcher.live and watcher.live.date
+                watcher.tick()
+                # Ticks that rolled the day over include its final flush.
+                if day == (watcher.live and watcher.live.date):
+                    ticks.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            watcher.flush()
+            flush_s = time.perf_counter() - start
+
+            batch_dir = os.path.join(work, "batch")
+            for day, files_info in io_utils.group_by_day(catalog).items():
+                date = timeaxis.from_seconds(files_info[0]["axis"].start).date()
+                main.process_day(files_info, files_info[0]["axis"], os.path.join(batch_dir, date.isoformat()),
+                                 anomalies=anomaly.LIMITS)
+        outputs = [
+            os.path.relpath(os.path.join(root, name), batch_dir)
+            for root, _, names in os.walk(batch_dir) for name in names
+        ]
+        different = [
+            path for path in sorted(outputs)
+            if not os.path.exists(os.path.join(work, "watch", path))
+            or not filecmp.cmp(os.path.join(batch_dir, path), os.path.join(work, "watch", path), shallow=False)
+        ]
+
+    tenth = max(len(ticks) // 10, 1)
+    print(f"{sensors} sensors x {days} days, {lines_per_tick} lines per sensor per tick, {len(ticks):,} ticks")
+    for name, part in (("first 10%", ticks[:tenth]), ("last 10%", ticks[-tenth:]), ("all", ticks)):
+        print(f"  {name:<10}: p50 {_percentile(part, 50) * 1e3:7.2f} ms  p99 {_percentile(part, 99) * 1e3:7.2f} ms")
+    print(f"  flush     : {flush_s * 1e3:7.1f} ms")
+    print(f"  outputs different from process_day: {len(different)}{' ' + ', '.join(different) if different else ''}")
+    assert outputs and not different, "watch outputs differ from process_day"
+
+
+def bench_query(raw_dir="data/raw", day="02", sensor="SENSOR04", start="14:00", end="14:30", lookups=1000):
+
+    # A half hour of one sensor, point lookups and minutely buckets from the
+    # day index against loading and walking the JSON outputs; the values
+    # read both ways must agree.
+    files_info = _with_axes(io_utils.build_catalog(raw_dir, days=[day]))
+    with tempfile.TemporaryDirectory() as out_dir:
+        with contextlib.redirect_stdout(None):
+            main.process_day(files_info, files_info[0]["axis"], out_dir)
+        axis = files_info[0]["axis"]
+        first, last = query.parse_when(start, axis), query.parse_when(end, axis)
+        points = np.random.default_rng(0).integers(axis.start, axis.end, lookups)
+
+        def from_json():
+            with open(os.path.join(out_dir, "clean_data.json"), "r", encoding="utf-8") as f:
+                rows = json.load(f)
+            labels = axis.labels(np.arange((first - axis.start) // axis.step, (last - axis.start) // axis.step))
+            readings = [rows[t][sensor] for t in labels]
+            point_rows = [rows[axis[(p - axis.start) // axis.step]][sensor] for p in points.tolist()]
+            with open(os.path.join(out_dir, "data_minutely.json"), "r", encoding="utf-8") as f:
+                minutely = json.load(f)
+            buckets = [minutely[t[:rollup.LEVELS["minutely"][1]]][sensor] for t in labels[::60 // axis.step]]
+            return readings, point_rows, buckets
+
+        def from_index():
+            index = query.DayIndex(out_dir)
+            readings = index.range(sensor, first, last)
+            point_rows = [index.point(sensor, p) for p in points.tolist()]
+            return readings, point_rows, index.buckets(sensor, "minutely", first, last)
+
+        timings = {}
+        for name, run in (("json", from_json), ("index", from_index)):
+            best = float("inf")
+            for _ in range(3):
+                t0 = time.perf_counter()
+                out = run()
+                best = min(best, time.perf_counter() - t0)
+            timings[name] = (best, out)
+
+    (readings, point_rows, buckets), (columns, index_points, index_buckets) = timings["json"][1], timings["index"][1]
+    na = lambda v: store.MISSING if v is None or v != v else v
+    mismatches = sum(
+        [readings[i][f] != na(v) for f in store.FIELDS for i, v in enumerate(columns[f].tolist())]
+        + [row[f] != na(p[f]) for row, p in zip(point_rows, index_points) for f in store.FIELDS]
+        + [buckets[i][key] != na(v) for key in ("temp", "hum", "temp_count", "hum_count")
+           for i, v in enumerate(index_buckets[key].tolist())]
+    )
+    print(f"{sensor} DAY{day} {start}-{end}: {len(columns['time'])} readings, {len(index_buckets['time'])} minutes, "
+          f"{lookups} point lookups")
+    for name, (elapsed, _) in timings.items():
+        print(f"  {name:<6}: {elapsed * 1e3:8.2f} ms")
+    print(f"  value mismatches: {mismatches}")
+
+
+def bench_anomalies(raw_dir="data/raw", sensors=9, seed=0):
+
+    # Spikes, short zero runs and a flatline are injected into clean
+    # synthetic temperature days; detect() should find them and nothing in
+    # the clean readings. Its cost is then set against parsing the day files.
+    rng = np.random.default_rng(seed)
+    n_slots = timeaxis.DAY_SECONDS // 5
+    kinds = {error_table.SPIKE: 0, error_table.STUCK_ZERO: 0, error_table.FLATLINE: 0}
+    injected, found, false_clean, false_dirty = dict(kinds), dict(kinds), 0, 0
+    for _ in range(sensors):
+        online, temp, _ = synth.day_readings(rng, n_slots, 0.9)
+        clean = np.where(online, temp, np.nan).astype(np.float32)
+        false_clean += int(np.count_nonzero(anomaly.detect(clean, 5, *anomaly.LIMITS["temp"])))
+
+        dirty = clean.copy()
+        expected = np.zeros(n_slots, dtype=np.int8)
+        slots = np.flatnonzero(online)
+        flat = slots[len(slots) // 2:len(slots) // 2 + 1440]
+        dirty[flat] = dirty[flat[0]]
+        expected[flat] = error_table.FLATLINE
+        picks = rng.choice(slots[:len(slots) // 3], 40, replace=False)
+        for i, slot in enumerate(picks.tolist()):
+            if i % 2:
+                dirty[slot] += rng.choice([-1, 1]) * rng.uniform(8, 15)
+                expected[slot] = error_table.SPIKE
+            else:
+                dirty[slot:slot + 2] = np.where(online[slot:slot + 2], 0, np.nan)
+                expected[slot:slot + 2] = np.where(online[slot:slot + 2], error_table.STUCK_ZERO, 0)
+        codes = anomaly.detect(dirty, 5, *anomaly.LIMITS["temp"])
+        for code in kinds:
+            injected[code] += int(np.count_nonzero(expected == code))
+            found[code] += int(np.count_nonzero((expected == code) & (codes == code)))
+        # A flatline also takes in the equal readings next to the copied ones.
+        false_dirty += int(np.count_nonzero((codes != 0) & (codes != error_table.FLATLINE) & (expected == 0)))
+
+    # Equal readings on both sides of an outage longer than a flatline are
+    # not one; a stuck sensor that drops the odd row still is.
+    gap = np.full(n_slots, np.nan, dtype=np.float32)
+    gap[0] = gap[800] = 12.3
+    assert not anomaly.detect(gap, 5, *anomaly.LIMITS["temp"]).any(), "outage flagged as a flatline"
+    stuck = np.full(n_slots, 12.3, dtype=np.float32)
+    stuck[::50] = np.nan
+    stuck[:1000] = np.linspace(5, 15, 1000)
+    codes = anomaly.detect(stuck, 5, *anomaly.LIMITS["temp"])
+    assert (codes[1000:][~np.isnan(stuck[1000:])] == error_table.FLATLINE).all(), "stuck sensor with drops missed"
+
+    print(f"{sensors} synthetic sensor-days, temperature")
+    for code in kinds:
+        print(f"  {error_table.TYPES[code]:<14}: {found[code]:>6,} of {injected[code]:>6,} found")
+    print(f"  false flags   : {false_clean} in clean days, {false_dirty} spikes or zeros around the injected ones")
+
+    catalog = _with_axes(io_utils.build_catalog(raw_dir, days=["02"]))
+    results = []
+    start = time.perf_counter()
+    for info in catalog:
+        results.append(proc.ingest_file(info["path"], info["sensor"], info["axis"], TEMP_RANGE, HUM_RANGE, INVALID_TOKEN))
+    ingest_s = time.perf_counter() - start
+    best = float("inf")
+    for _ in range(3):
+        start = time.perf_counter()
+        for columns, *_ in results:
+            anomaly.detect_columns(columns, 5)
+        best = min(best, time.perf_counter() - start)
+    print(f"DAY02, {len(catalog)} files: ingest {ingest_s * 1e3:.1f} ms, anomaly detection {best * 1e3:.1f} ms "
+          f"({best / len(catalog) * 1e3:.2f} ms per sensor-day)")
+
+
+def _pairwise_loop(values, min_overlap=consensus.MIN_OVERLAP):
+    # Reference for consensus.correlation: np.corrcoef pair by pair.
+    n = values.shape[1]
+    r = np.full((n, n), np.nan)
+    for i in range(n):
+        for j in range(n):
+            both = ~np.isnan(values[:, i]) & ~np.isnan(values[:, j])
+            if np.count_nonzero(both) >= min_overlap:
+                with np.errstate(invalid="ignore", divide="ignore"):
+                    r[i, j] = np.corrcoef(values[both, i], values[both, j])[0, 1]
+    return r
+
+
+def bench_consensus(scales=(9, 30, 120, 300), check=30, seed=0):
+
+    # Synthetic days of many sensors. The batched median, spread and
+    # correlation are checked against np.nanmedian, np.nanstd and a pair by
+    # pair np.corrcoef on the first check sensors, then timed as the number
+    # of sensors grows.
+    rng = np.random.default_rng(seed)
+    axis = timeaxis.TimeAxis.for_days(synth.START_DATE, step=5)
+    print(f"City consensus, one day of {len(axis):,} slots")
+    for n_sensors in scales:
+        data = store.SensorStore(axis, [f"SENSOR{s:02d}" for s in range(1, n_sensors + 1)])
+        for sensor in data.sensors:
+            online, temp, hum = synth.day_readings(rng, len(axis), 0.9)
+            data.set_column(sensor, "temp", np.where(online, temp, np.nan))
+            data.set_column(sensor, "hum", np.where(online, hum, np.nan))
+
+        if n_sensors == check:
+            city = consensus.Consensus(data)
+            values = data.values("temp")
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore", RuntimeWarning)
+                median_diff = np.nanmax(np.abs(city.median["temp"] - np.nanmedian(values, axis=1)))
+                spread_diff = np.nanmax(np.abs(city.spread["temp"] - np.nanstd(values, axis=1)))
+            start = time.perf_counter()
+            reference = _pairwise_loop(values)
+            loop_s = time.perf_counter() - start
+            start = time.perf_counter()
+            r = consensus.correlation(values)
+            batched_s = time.perf_counter() - start
+            same_nan = np.array_equal(np.isnan(r), np.isnan(reference))
+            print(f"  {n_sensors} sensors: median max diff {median_diff:.2e}, spread {spread_diff:.2e}, "
+                  f"correlation {np.nanmax(np.abs(r - reference)):.2e} (same NaNs: {same_nan}); "
+                  f"pairwise loop {loop_s * 1e3:.0f} ms, batched {batched_s * 1e3:.1f} ms")
+
+        best = float("inf")
+        for _ in range(3):
+            start = time.perf_counter()
+            consensus.Consensus(data).summary()
+            best = min(best, time.perf_counter() - start)
+        print(f"  {n_sensors:>4} sensors: {best * 1e3:8.1f} ms ({best / n_sensors * 1e3:.2f} ms per sensor)")
+
+
+def _fill_loop(values, method, max_slots):
+    # Reference for impute.fill_ffill and fill_linear: gap by gap per column.
+    filled = values.copy()
+    for col in range(values.shape[1]):
+        known = np.flatnonzero(~np.isnan(values[:, col]))
+        for before, after in zip(known[:-1].tolist(), known[1:].tolist()):
+            if 1 < after - before <= max_slots + 1:
+                a, b = values[before, col], values[after, col]
+                for slot in range(before + 1, after):
+                    share = (slot - before) / (after - before)
+                    filled[slot, col] = a if method == "ffill" else round(a + (b - a) * share, store.DECIMALS)
+        if method == "ffill" and len(known) and len(values) - 1 - known[-1] <= max_slots:
+            filled[known[-1] + 1:, col] = values[known[-1], col]
+    return filled
+
+
+def bench_fill(scales=(9, 120), check=9, max_gap=impute.MAX_GAP_SECONDS, seed=0):
+
+    # Synthetic days of sensors following one city signal, with holes of 1
+    # slot to 10 minutes punched into them. ffill and linear are checked
+    # against a gap by gap loop; every method is scored on the punched
+    # readings it restored, then timed.
+    rng = np.random.default_rng(seed)
+    axis = timeaxis.TimeAxis.for_days(synth.START_DATE, step=5)
+    max_slots = max_gap // axis.step
+    # A sensor reading 3 + 1.5 x the city, the others spread evenly around
+    # it: the fit on the median of the other sensors has to give back
+    # exactly a = 3 and b = 1.5, and fill the sensor's gap from them.
+    city = 15 + np.cumsum(rng.normal(0, 0.05, 2000))
+    values = np.column_stack([city + offset for offset in (-2, -1, 0, 1, 2)] + [3 + 1.5 * city])
+    values[500:540, 5] = np.nan
+    intercept, slope, _ = impute.fit_lines(values, impute.leave_one_out_median(values)[0])
+    assert np.isclose(intercept[5], 3) and np.isclose(slope[5], 1.5), (intercept[5], slope[5])
+    result, target = impute.fill_regression(values, max_slots)
+    assert target[500:540, 5].all() and np.allclose(result[500:540, 5], np.round(3 + 1.5 * city[500:540], 2))
+    print(f"Regression fill: a = {intercept[5]:.3f}, b = {slope[5]:.3f} for a sensor at 3 + 1.5 x the city")
+    # A gap after the last reading is carried forward, not interpolated.
+    tail = np.array([[1.0], [2.0]] + [[np.nan]] * max_slots)
+    assert np.array_equal(impute.fill_ffill(tail, max_slots)[0][:, 0], [1.0] + [2.0] * (max_slots + 1))
+    assert np.isnan(impute.fill_ffill(np.vstack([tail, [[np.nan]]]), max_slots)[0][-1, 0])
+    assert np.isnan(impute.fill_linear(tail, max_slots)[0][2:]).all()
+
+    print(f"Gap filling, one day of {len(axis):,} slots, gaps up to {max_gap} s filled")
+    for n_sensors in scales:
+        truth = store.SensorStore(axis, [f"SENSOR{s:02d}" for s in range(1, n_sensors + 1)])
+        holed = store.SensorStore(axis, truth.sensors)
+        _, city_temp, city_hum = synth.day_readings(rng, len(axis), 1.0)
+        for sensor in truth.sensors:
+            online, temp, hum = synth.day_readings(rng, len(axis), 0.9)
+            temp = np.round(city_temp + (temp - temp.mean()) * 0.2 + rng.normal(0, 1), 1)
+            hum = np.round(city_hum + (hum - hum.mean()) * 0.2 + rng.normal(0, 3), 1)
+            truth.set_column(sensor, "temp", np.where(online, temp, np.nan))
+            truth.set_column(sensor, "hum", np.where(online, hum, np.nan))
+            keep = np.ones(len(axis), dtype=bool)
+            for start, length in zip(rng.integers(0, len(axis), 100), rng.integers(1, 120, 100)):
+                keep[start:start + length] = False
+            holed.set_column(sensor, "temp", np.where(online & keep, temp, np.nan))
+            holed.set_column(sensor, "hum", np.where(online & keep, hum, np.nan))
+        punched = ~np.isnan(truth.values("temp")) & np.isnan(holed.values("temp"))
+
+        if n_sensors == check:
+            values = holed.values("temp")
+            for method in ("ffill", "linear"):
+                start = time.perf_counter()
+                reference = _fill_loop(values, method, max_slots)
+                loop_s = time.perf_counter() - start
+                result, _ = impute.FILLERS[method](values, max_slots)
+                same = np.array_equal(np.isnan(result), np.isnan(reference)) and np.allclose(
+                    result[~np.isnan(result)], reference[~np.isnan(reference)], atol=1e-9)
+                print(f"  {method:<10}: same as the gap by gap loop: {same} (loop {loop_s * 1e3:.0f} ms)")
+                assert same, f"{method} differs from the gap by gap loop"
+
+        for method in impute.FILLERS:
+            best = float("inf")
+            for _ in range(3):
+                start = time.perf_counter()
+                filled = impute.fill(holed, method, max_gap)
+                best = min(best, time.perf_counter() - start)
+            restored = punched & filled.imputed["temp"]
+            error = filled.data.values("temp")[restored] - truth.values("temp")[restored]
+            print(f"  {n_sensors:>4} sensors, {method:<10}: {best * 1e3:7.1f} ms, "
+                  f"{np.count_nonzero(restored) / max(np.count_nonzero(punched), 1):6.1%} of punched temps restored, "
+                  f"RMSE {np.sqrt(np.mean(error ** 2)):.3f} °C")
+
+
+def bench_startup(runs=5):
+
+    # Wall time of fresh interpreters running the lightweight commands, and
+    # whether they got by without numpy, against importing the pipeline.
+    commands = {
+        "python -c pass": ["-c", "pass"],
+        "cli.py --help": ["cli.py", "--help"],
+        "cli.py inspect": ["cli.py", "inspect"],
+        "cli.py query --help": ["cli.py", "query", "--help"],
+        "main.py --help": ["main.py", "--help"],
+    }
+    print(f"Startup, best of {runs} runs")
+    for name, args in commands.items():
+        best = float("inf")
+        for _ in range(runs):
+            start = time.perf_counter()
+            subprocess.run([sys.executable, *args], stdout=subprocess.DEVNULL, check=True)
+            best = min(best, time.perf_counter() - start)
+        modules = subprocess.run([sys.executable, "-X", "importtime", *args], stdout=subprocess.DEVNULL,
+                                 stderr=subprocess.PIPE, text=True, check=True).stderr
+        numpy = any(line.rstrip().endswith("| numpy") for line in modules.splitlines())
+        print(f"  {name:<22}: {best * 1e3:6.1f} ms{'  (imports numpy)' if numpy else ''}")
+
+
+def _check_detect():
+    # One spike, a flatline exactly FLATLINE_SECONDS of readings long next
+    # to one a reading short, zeros between readings and a missing slot.
+    limits = anomaly.LIMITS["temp"]
+    steady = 20 + 0.1 * np.sin(np.arange(200) / 5)
+    spiked = steady.copy()
+    spiked[100] += 8
+    spiked[150] = np.nan
+    codes = anomaly.detect(spiked, 5, *limits)
+    assert np.flatnonzero(codes).tolist() == [100] and codes[100] == error_table.SPIKE, np.flatnonzero(codes)
+
+    run = anomaly.FLATLINE_SECONDS // 5
+    for length, flagged in ((run, True), (run - 1, False)):
+        values = np.concatenate([steady[:20], np.full(length, 21.5), steady[:20]])
+        codes = anomaly.detect(values, 5, *limits)
+        assert (codes[20:20 + length] == error_table.FLATLINE).all() == flagged, length
+        assert not codes[:20].any() and not codes[20 + length:].any()
+
+    zeros = steady.copy()
+    zeros[60:65] = 0
+    codes = anomaly.detect(zeros, 5, *limits)
+    assert (codes[60:65] == error_table.STUCK_ZERO).all() and np.count_nonzero(codes) == 5
+
+    # detect_since over the end gives the same codes as detect over all.
+    start, tail = anomaly.detect_since(spiked, 5, 120, *limits)
+    assert start <= 120 and np.array_equal(tail, anomaly.detect(spiked, 5, *limits)[start:])
+
+
+def _check_fill():
+    # One sensor on a 5 s axis: a 2-slot gap, a gap too long for max_gap
+    # and a trailing gap.
+    axis = timeaxis.TimeAxis(0, 10, step=5)
+    data = store.SensorStore(axis, ["S1"])
+    data.set_column("S1", "temp", [1, np.nan, np.nan, 4, np.nan, np.nan, np.nan, 8, np.nan, np.nan])
+    nan = np.nan
+    expected = {
+        "ffill": [1, 1, 1, 4, nan, nan, nan, 8, 8, 8],
+        "linear": [1, 2, 3, 4, nan, nan, nan, 8, nan, nan],
+    }
+    for method, values in expected.items():
+        filled = impute.fill(data, method, max_gap=10)
+        assert np.array_equal(filled.data.values("temp")[:, 0], values, equal_nan=True), method
+        imputed = np.isnan(data.values("temp")[:, 0]) & ~np.isnan(values)
+        assert np.array_equal(filled.imputed["temp"][:, 0], imputed), method
+        assert filled.counts()["temp"] == np.count_nonzero(imputed)
+    assert np.isnan(data.temp[1, 0]), "fill changed the observed store"
+    try:
+        impute.fill(data, "cubic")
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("unknown fill method accepted")
+
+
+def _check_correlation():
+    # Perfectly related, inverted, constant and barely overlapping columns,
+    # and one pair with holes against np.corrcoef over the shared rows.
+    rng = np.random.default_rng(0)
+    a = rng.normal(size=50)
+    b = a + rng.normal(size=50)
+    b[::7] = np.nan
+    sparse = np.full(50, np.nan)
+    sparse[:consensus.MIN_OVERLAP - 1] = a[:consensus.MIN_OVERLAP - 1]
+    r = consensus.correlation(np.column_stack([a, 2 * a + 1, -a, np.full(50, 3.0), sparse, b]))
+    assert np.isclose(r[0, 1], 1) and np.isclose(r[0, 2], -1) and np.isclose(r[0, 0], 1)
+    assert np.isnan(r[0, 3]) and np.isnan(r[3, 3]) and np.isnan(r[0, 4])
+    both = ~np.isnan(b)
+    assert np.isclose(r[0, 5], np.corrcoef(a[both], b[both])[0, 1]) and np.allclose(r, r.T, equal_nan=True)
+
+
+def _check_store():
+    # Readings with up to four decimals come back as parsed, and
+    # round_values agrees with round() on ties.
+    readings = [21.4237, -0.125, 57.4, 0.0, 99.995, 1013.25, -40.0]
+    data = store.SensorStore(range(len(readings)), ["S1"])
+    data.set_column("S1", "temp", readings)
+    assert data.values("temp")[:, 0].tolist() == readings
+    assert [data[t]["S1"]["temp"] for t in range(len(readings))] == readings
+    means = np.arange(-2000, 2000) / 1000 + 0.005
+    assert store.round_values(means).tolist() == [round(v, store.DECIMALS) for v in means.tolist()]
+
+
+def bench_checks():
+    # Small fixed cases for the detector, the gap filler, the correlation
+    # matrix and the store; the other benchmarks run them on whole corpora.
+    for check in (_check_detect, _check_fill, _check_correlation, _check_store):
+        start = time.perf_counter()
+        check()
+        print(f"  {check.__name__[len('_check_'):]:<12}: ok ({(time.perf_counter() - start) * 1e3:.1f} ms)")
+
+
+BENCHMARKS = {
+    "slotting": bench_slotting,
+    "store": bench_store,
+    "workers": bench_workers,
+    "validation": bench_validation,
+    "formats": bench_formats,
+    "parsing": bench_parsing,
+    "errors": bench_errors,
+    "gaps": bench_gaps,
+    "reports": bench_reports,
+    "window": bench_window,
+    "synthetic": bench_synthetic,
+    "watch": bench_watch,
+    "query": bench_query,
+    "anomalies": bench_anomalies,
+    "consensus": bench_consensus,
+    "fill": bench_fill,
+    "startup": bench_startup,
+    "checks": bench_checks,
+}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the pipeline benchmarks (default: all of them).")
+    parser.add_argument("names", nargs="*", metavar="name",
+                        help=f"benchmarks to run: {', '.join(BENCHMARKS)}")
+    synthetic = parser.add_argument_group("synthetic")
+    synthetic.add_argument("--scales", default=SYNTHETIC_SCALES,
+                           help=f"corpora as sensors x days, e.g. 9x1,100x90 (default: {SYNTHETIC_SCALES})")
+    synthetic.add_argument("--interval", type=int, default=5, help="sampling interval in seconds (default: 5)")
+    synthetic.add_argument("--corruption", type=float, default=0.15,
+                           help="chance that a reading is corrupted (default: 0.15)")
+    synthetic.add_argument("--coverage", type=float, default=0.9,
+                           help="share of each sensor-day with readings (default: 0.9)")
+    synthetic.add_argument("--seed", type=int, default=0)
+    synthetic.add_argument("--workers", type=int, default=1)
+    synthetic.add_argument("--window", action="store_true", help="run main.py with --window")
+    synthetic.add_argument("--output", default=SYNTHETIC_RESULTS)
+    args = parser.parse_args()
+    unknown = [name for name in args.names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmark(s): {', '.join(unknown)}")
+
+    for name in args.names or list(BENCHMARKS):
+        if name == "synthetic":
+            bench_synthetic(args.scales, args.interval, args.corruption, args.coverage, args.seed,
+                            args.workers, args.window, args.output)
+        else:
+            BENCHMARKS[name]()
@@ -0,0 +1,154 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+
+import error_table
+
+CACHE_DIRNAME = "cache"
+MANIFEST_NAME = "manifest.json"
+CACHE_VERSION = 5
+
+
+def file_digest(path, block_size=1 << 20):
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def settings_digest(settings):
+    return hashlib.blake2b(json.dumps(settings, sort_keys=True).encode(), digest_size=16).hexdigest()
+
+
+def extend_day(cache_dir, output_dir, levels, formats, outputs):
+
+    # Records roll-up levels written into output_dir after its run (cli.py
+    # aggregate), so the day entry describes every output there. The
+    # manifest is edited as it is, whatever its parse settings.
+    manifest_path = Path(cache_dir) / MANIFEST_NAME
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return False
+    entry = manifest.get("days", {}).get(str(output_dir))
+    if entry is None:
+        return False
+    signature = entry["signature"]
+    signature["levels"] = signature["levels"] + [name for name in levels if name not in signature["levels"]]
+    signature["formats"].update(formats)
+    entry["outputs"] = entry["outputs"] + [p for p in outputs if p not in entry["outputs"]]
+    tmp_path = manifest_path.with_suffix(".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, manifest_path)
+    return True
+
+
+class FileCache:
+    """Parsed columns and error table per input file, keyed by content.
+
+    The manifest records size, mtime and hash for every input file, plus the
+    input hashes and outputs of every day directory written. A file whose
+    size and mtime are unchanged is trusted; otherwise it is re-hashed and
+    only re-parsed when the content really changed, or when it is wanted on
+    a different time axis. Changing the parse settings (ranges, tokens)
+    drops the whole cache.
+    """
+
+    def __init__(self, cache_dir, settings):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.manifest_path = self.cache_dir / MANIFEST_NAME
+        self.settings = settings_digest(settings)
+        self.manifest = self._load_manifest()
+        self.hits = 0
+        self.misses = 0
+
+    def _load_manifest(self):
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            manifest = None
+        if not manifest or manifest.get("version") != CACHE_VERSION or manifest.get("settings") != self.settings:
+            manifest = {"version": CACHE_VERSION, "settings": self.settings, "files": {}, "days": {}}
+        return manifest
+
+    def save(self):
+        tmp_path = self.manifest_path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.manifest_path)
+
+    def _result_path(self, info):
+        # Named after the whole path, so same-named files of two raw
+        # directories cached in one output directory keep apart.
+        path = Path(info["path"])
+        key = hashlib.blake2b(str(path.resolve()).encode(), digest_size=8).hexdigest()
+        return self.cache_dir / f"{path.name}.{key}.npz"
+
+    def _cached_digest(self, info):
+        # Content hash the cached result was parsed from, None if unreadable.
+        try:
+            with np.load(self._result_path(info)) as data:
+                return str(data["digest"])
+        except (OSError, KeyError, ValueError):
+            return None
+
+    def lookup(self, info, axis):
+
+        # Returns (content hash, cached result usable). The file is only
+        # read when its size or mtime no longer match the manifest.
+        key = str(info["path"])
+        entry = self.manifest["files"].get(key)
+        st = os.stat(info["path"])
+        if entry is not None and (st.st_size, st.st_mtime_ns) == (entry["size"], entry["mtime"]):
+            digest = entry["hash"]
+        else:
+            digest = file_digest(info["path"])
+        if (entry is None or digest != entry["hash"] or entry.get("axis") != axis.key
+                or self._cached_digest(info) != digest):
+            return digest, False
+        entry["mtime"] = st.st_mtime_ns
+        return digest, True
+
+    def load(self, info):
+        with np.load(self._result_path(info)) as data:
+            columns = {"temp": data["temp"], "hum": data["hum"]}
+            presence = data["presence"]
+            errors = error_table.ErrorTable(
+                [info["sensor"]], [info["path"]],
+                **{name: data[f"error_{name}"] for name in error_table.COLUMNS}
+            )
+        self.hits += 1
+        return columns, presence, errors
+
+    def store(self, info, digest, axis, columns, presence, errors):
+        error_columns = {f"error_{name}": values for name, values in errors.columns().items()}
+        np.savez(self._result_path(info), digest=np.array(digest), temp=columns["temp"], hum=columns["hum"],
+                 presence=presence, **error_columns)
+
+        st = os.stat(info["path"])
+        self.manifest["files"][str(info["path"])] = {
+            "size": st.st_size,
+            "mtime": st.st_mtime_ns,
+            "hash": digest,
+            "axis": axis.key
+        }
+        self.misses += 1
+
+    def day_is_current(self, output_dir, signature):
+        entry = self.manifest["days"].get(str(output_dir))
+        return (
+            entry is not None
+            and entry["signature"] == signature
+            and all(os.path.exists(p) for p in entry["outputs"])
+        )
+
+    def mark_day(self, output_dir, signature, outputs):
+        self.manifest["days"][str(output_dir)] = {"signature": signature, "outputs": list(outputs)}
@@ -0,0 +1,105 @@
+import re
+from pathlib import Path
+
+FILE_PATTERN = re.compile(r"^(?P<sensor>SENSOR\d+)_DAY(?P<day>\d+)(?P<raw>_raw)?\.csv$", re.IGNORECASE)
+SOURCE_PATTERN = re.compile(r"^(?P<sensor>SENSOR\d+)\.csv$", re.IGNORECASE)
+VARIANTS = ("raw", "clean")
+
+
+def parse_days(spec):
+
+    days = []
+    for part in str(spec).split(","):
+        part = part.strip()
+        if not part:
+            continue
+        try:
+            if "-" in part:
+                first, last = part.split("-", 1)
+                days.extend(f"{d:02d}" for d in range(int(first), int(last) + 1))
+            else:
+                days.append(f"{int(part):02d}")
+        except ValueError:
+            raise ValueError(f"not a day or day range: {part}") from None
+    return days
+
+
+def parse_sensors(spec):
+
+    sensors = []
+    for part in str(spec).split(","):
+        part = part.strip().upper()
+        if not part:
+            continue
+        sensors.append(f"SENSOR{int(part):02d}" if part.isdigit() else part)
+    return sensors
+
+
+def build_catalog(directory_name, days=None, sensors=None, variant="raw"):
+
+    if variant not in VARIANTS:
+        raise ValueError(f"Unknown variant: {variant}")
+
+    data_path = Path(directory_name)
+
+    if not data_path.exists():
+        return []
+
+    catalog = []
+
+    for file_path in data_path.iterdir():
+
+        match = FILE_PATTERN.match(file_path.name)
+        if not match or bool(match["raw"]) != (variant == "raw"):
+            continue
+
+        sensor, day = match["sensor"].upper(), match["day"]
+        if days is not None and day not in days:
+            continue
+        if sensors is not None and sensor not in sensors:
+            continue
+
+        catalog.append(
+            {
+            "path": file_path,
+            "sensor": sensor,
+            "day": day,
+            "size": file_path.stat().st_size
+            }
+        )
+
+    catalog.sort(key=lambda info: (info["day"], info["sensor"]))
+    return catalog
+
+
+def find_sources(directory_name, sensors=None):
+
+    # The SENSORxx.CSV files sensors append to, one per sensor, unsplit.
+    data_path = Path(directory_name)
+    if not data_path.exists():
+        return []
+
+    sources = []
+    for file_path in data_path.iterdir():
+        match = SOURCE_PATTERN.match(file_path.name)
+        if not match:
+            continue
+        sensor = match["sensor"].upper()
+        if sensors is not None and sensor not in sensors:
+            continue
+        sources.append({"path": file_path, "sensor": sensor})
+
+    sources.sort(key=lambda info: info["sensor"])
+    return sources
+
+
+def group_by_day(catalog):
+
+    grouped = {}
+    for info in catalog:
+        grouped.setdefault(info["day"], []).append(info)
+    return grouped
+
+
+def find_raw_files(directory_name, day="02", sensors=None, variant="raw"):
+    return build_catalog(directory_name, days=[day], sensors=sensors, variant=variant)
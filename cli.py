@@ -0,0 +1,217 @@
+import argparse
+import os
+import sys
+
+import catalog
+
+# Only argparse, os and the file catalog are imported up front. Every
+# command imports what it needs when it runs, so inspect never loads numpy
+# and query never loads the ingest pipeline.
+RAW_DIR = "data/raw"
+PROCESSED_DIR = "data/processed"
+PEEK_BYTES = 4096
+COUNT_BYTES = 1 << 20
+
+
+def cmd_ingest(argv):
+    import main
+    main.main(argv)
+
+
+def cmd_query(argv):
+    import query
+    query.main(argv)
+
+
+def cmd_stats(argv):
+    parser = argparse.ArgumentParser(prog="cli.py stats",
+                                     description="Print sensor and city statistics of day files without writing outputs.")
+    parser.add_argument("--days", default="02", help="day or day range, e.g. 02, 01-10 or 2,4,7 (default: 02)")
+    parser.add_argument("--sensors", default=None, help="comma separated sensors, e.g. SENSOR01,SENSOR04 or 1,4")
+    parser.add_argument("--variant", choices=catalog.VARIANTS, default="raw")
+    parser.add_argument("--step", type=int, default=5, help="sampling interval in seconds (default: 5)")
+    parser.add_argument("--anomalies", action="store_true", help="leave out spikes, flatlines and stuck-at-zero readings")
+    parser.add_argument("--no-cache", action="store_true", help="parse every file instead of reusing the ingest cache")
+    parser.add_argument("--output", default=None, help="also write the report to this file, like stats_report.log")
+    parser.add_argument("--raw-dir", default=RAW_DIR)
+    parser.add_argument("--out-dir", default=PROCESSED_DIR, help="where ingest keeps its cache (default: %(default)s)")
+    args = parser.parse_args(argv)
+    try:
+        days = catalog.parse_days(args.days)
+    except ValueError as e:
+        parser.error(f"--days: {e}")
+
+    import anomaly
+    import cache
+    import main
+    import proc
+    import report
+    import stats
+    import timeaxis
+
+    sensors = catalog.parse_sensors(args.sensors) if args.sensors else None
+    by_day = catalog.group_by_day(catalog.build_catalog(args.raw_dir, days, sensors, args.variant))
+    if not by_day:
+        raise SystemExit("No sensor files matched the selection")
+    anomalies = anomaly.LIMITS if args.anomalies else None
+    dates = main.resolve_dates(by_day)
+    file_cache = None
+    if not args.no_cache:
+        file_cache = cache.FileCache(os.path.join(args.out_dir, cache.CACHE_DIRNAME), main.cache_settings(anomalies))
+
+    # Per-file accumulators from ingest (or the cache), merged over the days
+    # like a batch run of main.py does.
+    merged = {}
+    for day, files_info in by_day.items():
+        for info in files_info:
+            info["axis"] = timeaxis.TimeAxis.for_days(dates[day], step=args.step)
+        lookups = [file_cache.lookup(info, info["axis"]) for info in files_info] if file_cache else None
+        for info, result in zip(files_info, main.load_day(files_info, None, file_cache, lookups, anomalies=anomalies)):
+            file_stats = result[3]
+            if len(by_day) > 1:
+                file_stats.activity.relabel(lambda t, day=day: f"DAY{day} {t}")
+            merged.setdefault(info["sensor"], stats.SensorStats()).merge(file_stats)
+    if file_cache:
+        file_cache.save()
+
+    sensor_names = sorted(merged)
+    city_stats, sensors_stats = proc.statistics(None, sensor_names, merged)
+    report.statistics_log(city_stats, sensors_stats, args.output or os.devnull)
+
+
+def cmd_aggregate(argv):
+    parser = argparse.ArgumentParser(prog="cli.py aggregate",
+                                     description="Roll the readings of an ingested day up to other levels, "
+                                                 "from its index instead of the day files, and add them to the index.")
+    parser.add_argument("levels", help="comma separated roll-up levels, e.g. 5min,15min")
+    parser.add_argument("--day", default=None, help="day of a batch run, e.g. 07 for DAY07 (default: the directory itself)")
+    parser.add_argument("--format", default="json", help="output format: json, compact, npz or parquet (default: json)")
+    parser.add_argument("--processed-dir", default=PROCESSED_DIR)
+    args = parser.parse_args(argv)
+
+    import cache
+    import query
+    import report
+    import rollup
+    import store
+
+    levels = [name.strip() for name in args.levels.split(",") if name.strip()]
+    unknown = [name for name in levels if name not in rollup.LEVELS]
+    if unknown:
+        raise SystemExit(f"Unknown roll-up level(s): {', '.join(unknown)} (available: {', '.join(rollup.LEVELS)})")
+    if args.format not in report.available_formats():
+        raise SystemExit(f"Unsupported output format: {args.format} (available: {', '.join(report.available_formats())})")
+    try:
+        index = query.find_index(args.processed_dir, args.day)
+    except (FileNotFoundError, ValueError) as e:
+        raise SystemExit(str(e))
+    if index.filled:
+        # The index keeps the observed readings only, so the filled
+        # roll-ups and their fill rates cannot be rebuilt from it.
+        raise SystemExit(f"{index.output_dir} was ingested with --fill; re-run main.py --fill with --levels "
+                         f"{','.join(index.levels + [name for name in levels if name not in index.levels])}")
+
+    data = store.SensorStore(index.axis, index.sensors)
+    for field in store.FIELDS:
+        getattr(data, field)[:] = index.column(query.SLOTS, field)
+    try:
+        rolled = rollup.rollup(data, levels)
+    except ValueError as e:
+        raise SystemExit(str(e))
+    outputs = [report.write_data(level, index.output_dir, f"data_{name}", args.format) for name, level in rolled.items()]
+    outputs.append(query.add_levels(index.output_dir, rolled))
+    cache.extend_day(os.path.join(args.processed_dir, cache.CACHE_DIRNAME), index.output_dir, levels,
+                     {name: args.format for name in levels}, outputs)
+    print("\n".join(outputs))
+
+
+def _first_and_last_rows(path, size):
+    # "Date Time" of the first and last data line, read from the two ends
+    # of the file only.
+    with open(path, "rb") as f:
+        head = f.read(PEEK_BYTES)
+        f.seek(max(size - PEEK_BYTES, 0))
+        tail = f.read(PEEK_BYTES)
+    rows = []
+    for lines in (head.splitlines(), tail.splitlines()[::-1]):
+        fields = next((line.split(b";") for line in lines
+                       if line.strip() and not line.startswith(b"Date") and line.count(b";") >= 1), None)
+        rows.append(" ".join(field.decode("utf-8", "replace").strip() for field in fields[:2]) if fields else "")
+    return rows
+
+
+def _count_lines(path):
+    count = 0
+    with open(path, "rb") as f:
+        while chunk := f.read(COUNT_BYTES):
+            count += chunk.count(b"\n")
+    return count
+
+
+def cmd_inspect(argv):
+    parser = argparse.ArgumentParser(prog="cli.py inspect",
+                                     description="List the sensor files of the raw directory with their size and time span.")
+    parser.add_argument("--days", default=None, help="day or day range, e.g. 02, 01-10 or 2,4,7 (default: all)")
+    parser.add_argument("--sensors", default=None, help="comma separated sensors, e.g. SENSOR01,SENSOR04 or 1,4")
+    parser.add_argument("--variant", choices=catalog.VARIANTS, default="raw")
+    parser.add_argument("--lines", action="store_true", help="count the lines of every file (reads them whole)")
+    parser.add_argument("--raw-dir", default=RAW_DIR)
+    args = parser.parse_args(argv)
+
+    try:
+        days = catalog.parse_days(args.days) if args.days else None
+    except ValueError as e:
+        parser.error(f"--days: {e}")
+    sensors = catalog.parse_sensors(args.sensors) if args.sensors else None
+    files = catalog.build_catalog(args.raw_dir, days, sensors, args.variant)
+    sources = catalog.find_sources(args.raw_dir, sensors)
+    print(f"{os.path.abspath(args.raw_dir)}: {len(files)} {args.variant} day files, {len(sources)} source files")
+    if not files and not sources:
+        return
+
+    header = f"{'Sensor':<10} | {'Day':<5} | {'Bytes':>10} | {'First row':<19} | {'Last row':<19}"
+    print(header + (f" | {'Lines':>7}" if args.lines else ""))
+    print("-" * (len(header) + (10 if args.lines else 0)))
+    empty = []
+    for info in files + [dict(source, day="-", size=source["path"].stat().st_size) for source in sources]:
+        first, last = _first_and_last_rows(info["path"], info["size"])
+        if not first:
+            empty.append(info["path"].name)
+        row = f"{info['sensor']:<10} | {info['day']:<5} | {info['size']:>10,} | {first:<19} | {last:<19}"
+        print(row + (f" | {_count_lines(info['path']):>7,}" if args.lines else ""))
+
+    # Sensor and day pairs the selection expects but has no file for.
+    by_day = catalog.group_by_day(files)
+    all_sensors = sorted({info["sensor"] for info in files})
+    missing = [f"{s}_DAY{day}" for day, day_files in by_day.items()
+               for s in sorted(set(all_sensors) - {info["sensor"] for info in day_files})]
+    print(f"\n{sum(info['size'] for info in files):,} bytes in {len(by_day)} days x {len(all_sensors)} sensors")
+    print(f"Without data rows: {', '.join(empty) or 'none'}")
+    print(f"Missing files: {', '.join(missing) or 'none'}")
+
+
+COMMANDS = {
+    # command: (handler, summary)
+    "ingest": (cmd_ingest, "clean, validate and aggregate day files and write every output (main.py)"),
+    "stats": (cmd_stats, "print sensor and city statistics of day files, reusing the ingest cache"),
+    "aggregate": (cmd_aggregate, "write more roll-up levels of an ingested day from its index"),
+    "inspect": (cmd_inspect, "list the raw sensor files with their size and time span"),
+    "query": (cmd_query, "read readings and roll-ups from the index (query.py)"),
+}
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    parser = argparse.ArgumentParser(
+        prog="cli.py", description="Sensor pipeline commands.",
+        epilog="commands:\n" + "\n".join(f"  {name:<10} {summary}" for name, (_, summary) in COMMANDS.items())
+               + "\n\nRun cli.py <command> --help for the options of a command.",
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=COMMANDS, metavar="command")
+    parser.add_argument("options", nargs=argparse.REMAINDER, help="options of the command")
+    args = parser.parse_args(argv[:1])
+    COMMANDS[args.command][0](argv[1:])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+import json
+import os
+
+import numpy as np
+
+import report
+import store
+import timeaxis
+
+CITY = "CITY"
+MIN_SENSORS = 3
+MIN_OVERLAP = 12
+SUMMARY_NAME = "consensus.json"
+
+def row_median(values):
+    # NaN-ignoring median of every row. NaN sorts last, so the middle of the
+    # n valid values of a row sits at (n - 1) // 2 and n // 2 of the sorted row.
+    count = np.count_nonzero(~np.isnan(values), axis=1)
+    ranked = np.sort(values, axis=1)
+    lo = np.take_along_axis(ranked, np.maximum((count - 1) // 2, 0)[:, None], axis=1)[:, 0]
+    hi = np.take_along_axis(ranked, np.maximum(count // 2, 0)[:, None], axis=1)[:, 0]
+    median = (lo + hi) / 2
+    median[count == 0] = np.nan
+    return median, count
+
+def _row_spread(values, count):
+    # Population std across the sensors reporting in each row.
+    valid = ~np.isnan(values)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = np.where(valid, values, 0.0).sum(axis=1) / count
+        return np.sqrt((np.where(valid, values - mean[:, None], 0.0) ** 2).sum(axis=1) / count)
+
+def correlation(values, min_overlap=MIN_OVERLAP):
+
+    # Pearson correlation of every pair of columns over the rows where both
+    # have a value, NaN for pairs sharing fewer than min_overlap rows or with
+    # a constant column. Pairwise sums are matrix products over the 0/1 mask.
+    valid = ~np.isnan(values)
+    mask = valid.astype(np.float64)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        # Centering first keeps the sums of squares small.
+        x = np.where(valid, values - np.nanmean(np.where(valid.any(axis=0), values, 0.0), axis=0), 0.0)
+        n = mask.T @ mask
+        sx = x.T @ mask
+        sxx = (x * x).T @ mask
+        cov = x.T @ x - sx * sx.T / n
+        var = sxx - sx * sx / n
+        r = cov / np.sqrt(var * var.T)
+    r[(n < min_overlap) | ~np.isfinite(r)] = np.nan
+    return np.clip(r, -1.0, 1.0)
+
+def _or_none(value, decimals=store.DECIMALS):
+    return None if value != value else round(float(value), decimals)
+
+class Consensus:
+    """Per field: the median, spread and count of sensors per slot, each
+    sensor's deviation from the median and the per-day correlation matrix."""
+
+    def __init__(self, data, min_sensors=MIN_SENSORS, min_overlap=MIN_OVERLAP):
+        self.timeline = data.timeline
+        self.sensors = list(data.sensors)
+        self.min_sensors = min_sensors
+        self.median = {}
+        self.spread = {}
+        self.count = {}
+        self.deviation = {}
+        self.correlation = {}
+
+        seconds = self.timeline.seconds() if isinstance(self.timeline, timeaxis.TimeAxis) else None
+        days = np.unique(seconds // timeaxis.DAY_SECONDS) if seconds is not None else []
+        for field in store.FIELDS:
+            values = data.values(field)
+            median, count = row_median(values)
+            self.median[field] = median
+            self.count[field] = count
+            self.spread[field] = _row_spread(values, count)
+
+            # Deviation of every reading from its slot's median.
+            counted = ~np.isnan(values) & (count >= min_sensors)[:, None]
+            dev = np.where(counted, values - median[:, None], 0.0)
+            slots = counted.sum(axis=0)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                self.deviation[field] = {
+                    "slots": slots,
+                    "bias": dev.sum(axis=0) / slots,
+                    "mean_abs": np.abs(dev).sum(axis=0) / slots,
+                    "max_abs": np.where(slots > 0, np.abs(dev).max(axis=0, initial=0.0), np.nan),
+                }
+
+            if seconds is None:
+                self.correlation[field] = {"all": correlation(values, min_overlap)}
+            else:
+                day_of = seconds // timeaxis.DAY_SECONDS
+                self.correlation[field] = {
+                    timeaxis.from_seconds(int(day) * timeaxis.DAY_SECONDS).strftime("%Y-%m-%d"):
+                        correlation(values[day_of == day], min_overlap)
+                    for day in days
+                }
+
+    @property
+    def labels(self):
+        return list(self.timeline)
+
+    def mean_correlation(self, field):
+        # Per sensor, its average correlation with the other sensors over all
+        # days, NaN when it has none.
+        matrices = np.stack(list(self.correlation[field].values()))
+        others = np.where(np.eye(len(self.sensors), dtype=bool), np.nan, matrices)
+        counted = ~np.isnan(others)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(counted, others, 0.0).sum(axis=(0, 2)) / counted.sum(axis=(0, 2))
+
+    def summary(self):
+        city = {}
+        for field in store.FIELDS:
+            median, spread, count = self.median[field], self.spread[field], self.count[field]
+            enough = count >= self.min_sensors
+            city[field] = {
+                "slots": int(np.count_nonzero(enough)),
+                "sensors_avg": _or_none(count.mean() if len(count) else np.nan),
+                "median_avg": _or_none(median[enough].mean() if enough.any() else np.nan),
+                "median_min": _or_none(median[enough].min() if enough.any() else np.nan),
+                "median_max": _or_none(median[enough].max() if enough.any() else np.nan),
+                "spread_avg": _or_none(spread[enough].mean() if enough.any() else np.nan),
+                "spread_max": _or_none(spread[enough].max() if enough.any() else np.nan),
+            }
+
+        sensors = {}
+        for field in store.FIELDS:
+            dev = self.deviation[field]
+            mean_r = self.mean_correlation(field)
+            for col, sensor in enumerate(self.sensors):
+                sensors.setdefault(sensor, {})[field] = {
+                    "slots": int(dev["slots"][col]),
+                    "bias": _or_none(dev["bias"][col]),
+                    "mean_abs": _or_none(dev["mean_abs"][col]),
+                    "max_abs": _or_none(dev["max_abs"][col]),
+                    "correlation": _or_none(mean_r[col], 3),
+                }
+
+        correlation = {}
+        for field in store.FIELDS:
+            for day, r in self.correlation[field].items():
+                rounded = np.round(r, 3).astype(object)
+                rounded[np.isnan(r)] = None
+                correlation.setdefault(day, {})[field] = rounded.tolist()
+
+        return {
+            "min_sensors": self.min_sensors,
+            "sensors": self.sensors,
+            "city": city,
+            "deviation": sensors,
+            "correlation": correlation,
+        }
+
+    def to_columns(self):
+        # The city as one more sensor, so every output format can carry it.
+        columns = {"time": np.array(self.labels), "sensor": np.array([CITY])}
+        for field in store.FIELDS:
+            columns[field] = self.median[field][:, None].astype(np.float32)
+            columns[f"{field}_spread"] = self.spread[field][:, None].astype(np.float32)
+            columns[f"{field}_sensors"] = self.count[field][:, None].astype(np.int32)
+        return columns
+
+    def to_dict(self):
+        cells = {}
+        for field in store.FIELDS:
+            for name, values in ((field, self.median[field]), (f"{field}_spread", self.spread[field])):
+                rounded = store.round_values(values)
+                obj = rounded.astype(object)
+                obj[np.isnan(rounded)] = store.MISSING
+                cells[name] = obj.tolist()
+            cells[f"{field}_sensors"] = self.count[field].tolist()
+        names = list(cells)
+        return {
+            t: {CITY: {name: cells[name][slot] for name in names}}
+            for slot, t in enumerate(self.labels)
+        }
+
+def write(city, output_dir, fmt="json", summary=None):
+    # data_consensus.<fmt> with the per-slot series, consensus.json with the
+    # per-sensor deviations and the correlation matrices.
+    summary_path = os.path.join(output_dir, SUMMARY_NAME)
+    with report.open_report(summary_path) as f:
+        json.dump(summary or city.summary(), f, ensure_ascii=False, indent=2)
+    return [report.write_data(city, output_dir, "data_consensus", fmt), summary_path]
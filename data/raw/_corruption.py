@@ -1,14 +1,19 @@
-import pandas as pd
 import numpy as np
-import random
+import argparse
 import io
 import os
+import time
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 
 # Set corruption parameters
 CORRUPTION_RATE = 0.15   # 15% chance to corrupt numeric values
+DELETE_FRACTION = 0.05   # Share of rows dropped from every file
+TIME_CORRUPTION_CHANCE = 0.02
 SPACE_CHANCE = 0.001     # Chance to add whitespace
 BLANK_LINE_CHANCE = 0.05 # 5% chance to add blank lines
+INVALID_NUMBERS = np.array(["-99", "999", "0.0"], dtype=object)
+CORRUPTED_TIME = "25:70"
 
 # File ranges - Updated to match your expected files
 days = [f"{i:02d}" for i in range(1, 11)]      # Days 01 to 10
@@ -37,9 +42,47 @@ class CorruptionStats:
             'blank_lines_added': 0
         }
 
-def corrupt_file_with_stats(input_file_path, output_file_path, stats, log_file):
-    """Corrupt a file and collect detailed statistics"""
-    
+    def merge(self, other):
+        """Add the counts of another CorruptionStats, e.g. from a worker"""
+        for name, value in vars(other).items():
+            if name == 'corruption_by_type':
+                for corruption_type, count in value.items():
+                    self.corruption_by_type[corruption_type] += count
+            else:
+                setattr(self, name, getattr(self, name) + value)
+        return self
+
+def read_columns(input_file_path):
+    """Header fields and one object array of stripped strings per column"""
+    with open(input_file_path, 'r', encoding='utf-8') as f:
+        text = f.read()
+    lines = [line for line in text.split('\n') if line.strip()]
+    body = text[text.find('\n') + 1:]
+    padded = any(c in body for c in ' \t\r')
+    header = [name.strip() for name in lines[0].split(';')] if lines else []
+    rows = lines[1:]
+
+    # One split over the whole body when every row has the header's field
+    # count, otherwise row by row, padding short rows like read_csv does.
+    fields = ';'.join(rows).split(';') if rows else []
+    if len(fields) == len(rows) * len(header):
+        table = np.array(fields, dtype=object).reshape(len(rows), len(header))
+    else:
+        split_rows = [(row.split(';') + [''] * len(header))[:len(header)] for row in rows]
+        table = np.array(split_rows, dtype=object).reshape(len(rows), len(header))
+    if padded:
+        table = np.array([[v.strip() for v in row] for row in table.tolist()], dtype=object).reshape(table.shape)
+    return header, [table[:, k].copy() for k in range(len(header))]
+
+def corrupt_file_with_stats(input_file_path, output_file_path, stats, log_file, rng=None, corruption_rate=CORRUPTION_RATE):
+    """Corrupt a file and collect detailed statistics
+
+    Every corruption type is drawn as one mask over a column from rng, a
+    numpy Generator; pass a seeded one to get the same output on every run.
+    """
+
+    rng = np.random.default_rng() if rng is None else rng
+
     if not os.path.exists(input_file_path):
         log_file.write(f"ERROR: Input file not found: {input_file_path}\n")
         stats.failed += 1
@@ -47,104 +90,87 @@ def corrupt_file_with_stats(input_file_path, output_file_path, stats, log_file):
     
     try:
         # Read the original file
-        df = pd.read_csv(input_file_path, sep=';', low_memory=False)
-        original_rows = len(df)
+        header, columns = read_columns(input_file_path)
+        original_rows = len(columns[0]) if columns else 0
         stats.total_rows_processed += original_rows
         
         if original_rows == 0:
             log_file.write(f"SKIPPED: File is empty: {input_file_path}\n")
-            df.to_csv(output_file_path, index=False, sep=';')
+            with open(output_file_path, 'w', encoding='utf-8') as f:
+                f.write(';'.join(header) + '\n')
             stats.skipped += 1
             stats.empty_files += 1
             return True
         
-        # Convert columns to object type
-        for col in ['Temperature (C)', 'Humidity (%)']:
-            if col in df.columns:
-                df[col] = df[col].astype(object)
-        
         # 1. Randomly delete 5% of rows
-        drop_indices = df.sample(frac=0.05).index
-        rows_deleted = len(drop_indices)
-        df = df.drop(drop_indices)
+        rows_deleted = int(round(DELETE_FRACTION * original_rows))
+        keep = np.ones(original_rows, dtype=bool)
+        keep[rng.choice(original_rows, size=rows_deleted, replace=False)] = False
+        columns = [col[keep] for col in columns]
+        n_rows = len(columns[0])
         stats.rows_deleted += rows_deleted
         
         # Initialize counters
-        temp_corruptions = 0
-        humidity_corruptions = 0
-        time_corruptions = 0
-        whitespace_additions = 0
+        corruptions = {}
         
         # 2. Corrupt numeric values
         for col in ['Temperature (C)', 'Humidity (%)']:
-            if col in df.columns:
-                for i in df.index:
-                    if random.random() < CORRUPTION_RATE:
-                        stats.rows_corrupted += 1
-                        if col == 'Temperature (C)':
-                            temp_corruptions += 1
-                        else:
-                            humidity_corruptions += 1
-                            
-                        rand_val = random.random()
-                        if rand_val < 0.4:
-                            df.at[i, col] = ""
-                            stats.corruption_by_type['empty_string'] += 1
-                        elif rand_val < 0.7:
-                            df.at[i, col] = 'NaN'
-                            stats.corruption_by_type['nan_string'] += 1
-                        else:
-                            df.at[i, col] = random.choice([-99, 999, 0.0])
-                            stats.corruption_by_type['invalid_number'] += 1
+            if col in header:
+                values = columns[header.index(col)]
+                hit = np.flatnonzero(rng.random(n_rows) < corruption_rate)
+                kind = rng.random(len(hit))
+                empty, nan = hit[kind < 0.4], hit[(kind >= 0.4) & (kind < 0.7)]
+                invalid = hit[kind >= 0.7]
+                values[empty] = ""
+                values[nan] = 'NaN'
+                values[invalid] = INVALID_NUMBERS[rng.integers(0, len(INVALID_NUMBERS), len(invalid))]
+
+                corruptions[col] = len(hit)
+                stats.rows_corrupted += len(hit)
+                stats.corruption_by_type['empty_string'] += len(empty)
+                stats.corruption_by_type['nan_string'] += len(nan)
+                stats.corruption_by_type['invalid_number'] += len(invalid)
         
         # 3. Corrupt Time column
-        if 'Time' in df.columns:
-            for i in df.index:
-                if random.random() < 0.02:
-                    df.at[i, 'Time'] = "25:70"
-                    stats.corruption_by_type['time_corrupted'] += 1
-                    time_corruptions += 1
-        
-        # 4. Add whitespace to values
-        def add_whitespace_with_stats(val):
-            nonlocal whitespace_additions
-            val_str = str(val) if pd.notnull(val) else ""
-            if random.random() < SPACE_CHANCE:
-                before = " " * random.randint(1, 2)
-                after = " " * random.randint(1, 2)
-                stats.corruption_by_type['whitespace_added'] += 1
-                whitespace_additions += 1
-                return f"{before}{val_str}{after}"
-            return val_str
-        
-        df = df.map(add_whitespace_with_stats)
+        time_corruptions = 0
+        if 'Time' in header:
+            hit = rng.random(n_rows) < TIME_CORRUPTION_CHANCE
+            columns[header.index('Time')][hit] = CORRUPTED_TIME
+            time_corruptions = int(hit.sum())
+            stats.corruption_by_type['time_corrupted'] += time_corruptions
         
-        # 5. Prepare output and apply random blank lines
-        output = io.StringIO()
-        df.to_csv(output, index=False, sep=';', quoting=3, escapechar=' ')
-        lines = output.getvalue().split('\n')
+        # 4. Add whitespace to values. Written with a space as escape
+        # character and no quoting, every space in a field comes out doubled
+        # (the header's too).
+        whitespace_additions = 0
+        for values in columns:
+            hit = np.flatnonzero(rng.random(n_rows) < SPACE_CHANCE)
+            pads = rng.integers(1, 3, size=(len(hit), 2)).tolist()
+            values[hit] = [f"{'  ' * before}{values[i]}{'  ' * after}" for i, (before, after) in zip(hit.tolist(), pads)]
+            whitespace_additions += len(hit)
+        stats.corruption_by_type['whitespace_added'] += whitespace_additions
         
-        final_lines = []
-        blank_lines_count = 0
-        for line in lines:
-            if not line.strip(): 
-                continue  # Skip empty lines from split
-            final_lines.append(line)
-            if random.random() < BLANK_LINE_CHANCE:
-                for _ in range(random.randint(1, 2)):
-                    final_lines.append("")
-                    blank_lines_count += 1
-                    stats.corruption_by_type['blank_lines_added'] += 1
+        # 5. Join the lines; each one (header included) is followed by 1-2
+        # blank lines with BLANK_LINE_CHANCE
+        lines = columns[0]
+        for values in columns[1:]:
+            lines = lines + ';' + values
+        lines = np.concatenate([[';'.join(name.replace(' ', '  ') for name in header)], lines])
+        blanks = np.where(rng.random(len(lines)) < BLANK_LINE_CHANCE, rng.integers(1, 3, len(lines)), 0)
+        newlines = blanks + 1
+        newlines[-1] -= 1
+        blank_lines_count = int(blanks.sum())
+        stats.corruption_by_type['blank_lines_added'] += blank_lines_count
         
         # 6. Write to final file
         with open(output_file_path, 'w', encoding='utf-8') as f:
-            f.write('\n'.join(final_lines))
+            f.write(''.join((lines + np.array(['\n' * k for k in range(4)], dtype=object)[newlines]).tolist()))
         
         # Log detailed statistics for this file
         log_file.write(f"SUCCESS: {os.path.basename(input_file_path)} -> {os.path.basename(output_file_path)}\n")
-        log_file.write(f"  Original rows: {original_rows}, After corruption: {len(df)} (Deleted: {rows_deleted})\n")
-        log_file.write(f"  Temperature corruptions: {temp_corruptions}\n")
-        log_file.write(f"  Humidity corruptions: {humidity_corruptions}\n")
+        log_file.write(f"  Original rows: {original_rows}, After corruption: {n_rows} (Deleted: {rows_deleted})\n")
+        log_file.write(f"  Temperature corruptions: {corruptions.get('Temperature (C)', 0)}\n")
+        log_file.write(f"  Humidity corruptions: {corruptions.get('Humidity (%)', 0)}\n")
         log_file.write(f"  Time corruptions: {time_corruptions}\n")
         log_file.write(f"  Whitespace additions: {whitespace_additions}\n")
         log_file.write(f"  Blank lines added: {blank_lines_count}\n")
@@ -157,7 +183,30 @@ def corrupt_file_with_stats(input_file_path, output_file_path, stats, log_file):
         stats.failed += 1
         return False
 
-def generate_detailed_report(stats, log_file, processing_time):
+def _corrupt_worker(task):
+    """Corrupt one file in a worker; returns its stats, log text and timing"""
+    input_path, output_path, seed, corruption_rate = task
+    stats = CorruptionStats()
+    stats.total_files = 1
+    log = io.StringIO()
+    start = time.perf_counter()
+    ok = corrupt_file_with_stats(input_path, output_path, stats, log, np.random.default_rng(seed), corruption_rate)
+    return ok, stats, log.getvalue(), time.perf_counter() - start
+
+def corrupt_files(tasks, workers=None):
+    """Corrupt (input, output, seed, corruption_rate) tasks across processes
+
+    Yields the _corrupt_worker result of every task, in task order, so the
+    log reads the same whatever the number of workers.
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1 or len(tasks) <= 1:
+        yield from map(_corrupt_worker, tasks)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        yield from executor.map(_corrupt_worker, tasks, chunksize=max(1, len(tasks) // (workers * 4)))
+
+def generate_detailed_report(stats, log_file, processing_time, expected_rate=CORRUPTION_RATE):
     """Generate a comprehensive report of corruption statistics"""
     
     log_file.write("\n" + "=" * 70 + "\n")
@@ -214,7 +263,7 @@ def generate_detailed_report(stats, log_file, processing_time):
     # Expected vs Actual Corruption Rates
     log_file.write("\nEXPECTED VS ACTUAL CORRUPTION RATES:\n")
     log_file.write("-" * 40 + "\n")
-    log_file.write(f"Expected corruption rate: {CORRUPTION_RATE * 100:.0f}%\n")
+    log_file.write(f"Expected corruption rate: {expected_rate * 100:.0f}%\n")
     
     if stats.total_rows_processed > 0:
         actual_corruption_rate = (stats.rows_corrupted / stats.total_rows_processed) * 100
@@ -222,15 +271,22 @@ def generate_detailed_report(stats, log_file, processing_time):
         
         # Calculate for Temperature/Humidity specifically (since CORRUPTION_RATE applies to each)
         if stats.total_rows_processed > 0:
-            expected_corrupted_values = stats.total_rows_processed * 2 * CORRUPTION_RATE  # 2 columns per row
+            expected_corrupted_values = stats.total_rows_processed * 2 * expected_rate  # 2 columns per row
             actual_corrupted_values = stats.corruption_by_type['empty_string'] + \
                                      stats.corruption_by_type['nan_string'] + \
                                      stats.corruption_by_type['invalid_number']
             log_file.write(f"Expected corrupted values: {expected_corrupted_values:.0f}\n")
             log_file.write(f"Actual corrupted values: {actual_corrupted_values:,}\n")
 
-def main():
+def main(argv=None):
     """Main function to process all files with corruption and detailed reporting"""
+
+    parser = argparse.ArgumentParser(description="Corrupt the clean SENSORxx_DAYyy.csv files into *_raw.csv.")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="seed for reproducible output (default: fresh randomness on every run)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="corrupt files in this many processes (default: one per CPU)")
+    args = parser.parse_args(argv)
     
     # Create directory if it doesn't exist
     if not os.path.exists('data/raw'):
@@ -241,12 +297,26 @@ def main():
     
     # Start timing
     start_time = datetime.now()
+
+    # One task per file; every file gets its own child seed, so the output
+    # for a seed does not depend on the number of workers.
+    tasks = []
+    for day in days:
+        for sensor in sensors:
+            # Format sensor number with leading zero
+            sensor_num = f"0{sensor}" if len(sensor) == 1 else sensor
+            tasks.append((f'data/raw/SENSOR{sensor_num}_DAY{day}.csv', f'data/raw/SENSOR{sensor_num}_DAY{day}_raw.csv'))
+    seeds = np.random.SeedSequence(args.seed).spawn(len(tasks))
+    tasks = [(input_path, output_path, seed, CORRUPTION_RATE) for (input_path, output_path), seed in zip(tasks, seeds)]
+    results = corrupt_files(tasks, args.workers)
     
     with open(log_filename, 'w', encoding='utf-8') as log_file:
         log_file.write(f"DATA CORRUPTION PROCESS WITH DETAILED REPORTING\n")
         log_file.write(f"Generated: {start_time.strftime('%Y-%m-%d %H:%M:%S')}\n")
         log_file.write(f"Target: {len(days)} days × {len(sensors)} sensors = {len(days)*len(sensors)} files\n")
         log_file.write(f"Corruption Rate: {CORRUPTION_RATE*100:.0f}%\n")
+        if args.seed is not None:
+            log_file.write(f"Seed: {args.seed}\n")
         log_file.write("=" * 70 + "\n\n")
         
         print(f"Starting corruption process with detailed reporting...")
@@ -254,37 +324,27 @@ def main():
         print(f"Sensors: {len(sensors)} sensors (1-9)")
         print(f"Expected files: {len(days)*len(sensors)}\n")
         
-        # Process all combinations of days and sensors
+        # Results arrive in task order: all sensors of a day, day by day
         for day in days:
-            day_start = datetime.now()
             files_for_day = 0
             successful_for_day = 0
+            day_time = 0.0
             
-            print(f"Processing day {day}...")
             log_file.write(f"\nPROCESSING DAY {day}:\n")
             log_file.write("-" * 50 + "\n")
             
-            for sensor in sensors:
-                stats.total_files += 1
+            for _ in sensors:
+                ok, file_stats, file_log, seconds = next(results)
+                stats.merge(file_stats)
+                log_file.write(file_log)
                 files_for_day += 1
-                
-                # Format sensor number with leading zero
-                sensor_num = f"0{sensor}" if len(sensor) == 1 else sensor
-                
-                # Define input and output file paths
-                # Changed to match your actual file naming convention
-                input_path = f'data/raw/SENSOR{sensor_num}_DAY{day}.csv'
-                output_path = f'data/raw/SENSOR{sensor_num}_DAY{day}_raw.csv'
-                
-                # Corrupt the file with statistics
-                if corrupt_file_with_stats(input_path, output_path, stats, log_file):
-                    successful_for_day += 1
+                successful_for_day += ok
+                day_time += seconds
             
-            day_time = (datetime.now() - day_start).total_seconds()
             log_file.write(f"\nDay {day} Summary:\n")
             log_file.write(f"  Files processed: {files_for_day}\n")
             log_file.write(f"  Successful: {successful_for_day}\n")
-            log_file.write(f"  Time taken: {day_time:.2f} seconds\n")
+            log_file.write(f"  Time taken: {day_time:.2f} seconds (summed over workers)\n")
             print(f"  Day {day}: {successful_for_day}/{files_for_day} files corrupted")
         
         # Calculate total processing time
@@ -1,104 +1,205 @@
-import pandas as pd
-from datetime import datetime
+import numpy as np
+import argparse
+import itertools
 import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
 
 days = [f"{i:02d}" for i in range(1, 11)]  # 01 to 10
 sensors = [str(i) for i in range(1, 10)]   # 1 to 9
 
 log_file = f"data/raw/_separation.log"
-empty_df = pd.DataFrame(columns=['Date', 'Time', 'Temperature (C)', 'Humidity (%)'])
-
-results = []
-
-with open(log_file, 'w', encoding='utf-8') as log:
-    log.write(f"Batch Processing Report\n")
-    log.write(f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-    log.write(f"Days: {', '.join(days)}\n")
-    log.write(f"Sensors: {', '.join(sensors)}\n")
-    log.write("=" * 60 + "\n\n")
-    
-    for day in days:
-        target_date = f"{day}.09.2024"
-        print(f"\nProcessing day {day}...")
-        log.write(f"\nDay {day} ({target_date}):\n")
-        
-        day_results = {"day": day, "total": 0, "with_data": 0, "empty": 0}
-        
-        for sensor in sensors:
-
-            sensor_num = f"0{sensor}" if len(sensor) == 1 else sensor
-            input_path = f'data/raw/SENSOR{sensor_num}.CSV'
-            output_path = f'data/raw/SENSOR{sensor_num}_DAY{day}.csv'
-            
-            day_results["total"] += 1
-            
+COLUMNS = ['Date', 'Time', 'Temperature (C)', 'Humidity (%)']
+EMPTY_FILE = ';'.join(COLUMNS) + '\n'
+CHUNK_LINES = 65536
+MONTH_YEAR = ".09.2024"
+
+def split_fields(lines):
+    """Rows of exactly len(COLUMNS) fields; short rows are padded like read_csv does"""
+    width = len(COLUMNS)
+    fields = ';'.join(lines).split(';')
+    if len(fields) == len(lines) * width:
+        return [fields[i:i + width] for i in range(0, len(fields), width)]
+    return [(line.split(';') + [''] * width)[:width] for line in lines]
+
+def parse_times(times):
+    """Seconds since midnight for "HH:MM:SS" strings, -1 where it does not parse"""
+    seconds = np.full(len(times), -1, dtype=np.int64)
+    fixed = np.array([len(t) == 8 and t.isascii() for t in times], dtype=bool)
+    raw = np.array([t if f else '' for t, f in zip(times, fixed.tolist())], dtype='S8')
+    chars = raw.view(np.uint8).reshape(len(raw), 8).astype(np.int64) - ord('0')
+    digits = chars[:, [0, 1, 3, 4, 6, 7]]
+    ok = fixed & (raw.view(np.uint8).reshape(len(raw), 8)[:, [2, 5]] == ord(':')).all(axis=1)
+    ok &= ((digits >= 0) & (digits <= 9)).all(axis=1)
+    hour, minute, second = (digits[:, 2 * k] * 10 + digits[:, 2 * k + 1] for k in range(3))
+    ok &= (hour < 24) & (minute < 60) & (second < 60)
+    seconds[ok] = (hour * 3600 + minute * 60 + second)[ok]
+
+    # Anything else ("9:27:50", padded values) goes through strptime, as the
+    # format string did for the whole column before
+    for i in np.flatnonzero(~ok).tolist():
+        try:
+            t = datetime.strptime(f"01.01.2000 {times[i]}", '%d.%m.%Y %H:%M:%S')
+            seconds[i] = t.hour * 3600 + t.minute * 60 + t.second
+        except (ValueError, TypeError):
+            pass
+    return seconds
+
+def to_numeric(values):
+    """Floats of the strings, NaN where a value is not a number"""
+    try:
+        return np.array(values, dtype=object).astype(np.float64)
+    except ValueError:
+        parsed = []
+        for v in values:
             try:
-                if not os.path.exists(input_path):
-                    empty_df.to_csv(output_path, index=False, sep=';')
-                    log.write(f"  Sensor {sensor}: EMPTY (file not found)\n")
-                    day_results["empty"] += 1
+                parsed.append(float(v))
+            except ValueError:
+                parsed.append(np.nan)
+        return np.array(parsed, dtype=np.float64)
+
+def format_values(values):
+    return ["" if v != v else repr(v) for v in values.tolist()]
+
+def split_sensor(task):
+    """Split one SENSORxx.CSV into its day files in a single pass
+
+    Returns {day: (status, rows, message)} for the log.
+    """
+    sensor, target_days = task
+    sensor_num = f"0{sensor}" if len(sensor) == 1 else sensor
+    input_path = f'data/raw/SENSOR{sensor_num}.CSV'
+    output_paths = {day: f'data/raw/SENSOR{sensor_num}_DAY{day}.csv' for day in target_days}
+    dates = {f"{day}{MONTH_YEAR}": day for day in target_days}
+
+    def write_empty(status, message=""):
+        for path in output_paths.values():
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(EMPTY_FILE)
+        return {day: (status, 0, message) for day in target_days}
+
+    if not os.path.exists(input_path):
+        return write_empty("missing")
+
+    try:
+        # 1. Stream the file once, keeping only rows of the target days;
+        # repeated header lines and blank lines drop out here
+        rows = {day: [] for day in target_days}
+        with open(input_path, 'r', encoding='utf-8') as f:
+            next(f, None)
+            while True:
+                chunk = [line.rstrip('\r\n') for line in itertools.islice(f, CHUNK_LINES)]
+                if not chunk:
+                    break
+                for fields in split_fields([line for line in chunk if line.strip()]):
+                    day = dates.get(fields[0])
+                    if day is not None and fields[1]:
+                        rows[day].append(fields)
+
+        # 2. Parse times and values once for the whole file, then sort each
+        # day by time and write all day files
+        results = {}
+        for day, day_rows in rows.items():
+            if not day_rows:
+                with open(output_paths[day], 'w', encoding='utf-8') as f:
+                    f.write(EMPTY_FILE)
+                results[day] = ("no data", 0, "")
+                continue
+            _, times, temps, hums = (list(col) for col in zip(*day_rows))
+            seconds = parse_times(times)
+            keep = np.flatnonzero(seconds >= 0)
+            order = keep[np.argsort(seconds[keep], kind='stable')]
+            date = f"{day}{MONTH_YEAR}"
+            clock = [f"{s // 3600:02d}:{s // 60 % 60:02d}:{s % 60:02d}" for s in seconds[order].tolist()]
+            temp = format_values(to_numeric(temps)[order])
+            hum = format_values(to_numeric(hums)[order])
+            with open(output_paths[day], 'w', encoding='utf-8') as f:
+                f.write(EMPTY_FILE)
+                f.write(''.join(f"{date};{t};{tv};{hv}\n" for t, tv, hv in zip(clock, temp, hum)))
+            results[day] = ("success", len(order), "")
+        return results
+
+    except Exception as e:
+        return write_empty("error", str(e))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Split every SENSORxx.CSV into SENSORxx_DAYyy.csv day files.")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="split sensors in this many processes (default: one per CPU)")
+    args = parser.parse_args(argv)
+    workers = args.workers or os.cpu_count() or 1
+
+    # Every sensor file is read once; the results come back per day so the
+    # log keeps its day-by-day layout
+    tasks = [(sensor, days) for sensor in sensors]
+    if workers <= 1:
+        by_sensor = dict(zip(sensors, map(split_sensor, tasks)))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            by_sensor = dict(zip(sensors, executor.map(split_sensor, tasks)))
+
+    results = []
+
+    with open(log_file, 'w', encoding='utf-8') as log:
+        log.write(f"Batch Processing Report\n")
+        log.write(f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+        log.write(f"Days: {', '.join(days)}\n")
+        log.write(f"Sensors: {', '.join(sensors)}\n")
+        log.write("=" * 60 + "\n\n")
+
+        for day in days:
+            target_date = f"{day}{MONTH_YEAR}"
+            print(f"\nProcessing day {day}...")
+            log.write(f"\nDay {day} ({target_date}):\n")
+
+            day_results = {"day": day, "total": 0, "with_data": 0, "empty": 0}
+
+            for sensor in sensors:
+                status, n_rows, message = by_sensor[sensor][day]
+                day_results["total"] += 1
+                if status == "success":
+                    log.write(f"  Sensor {sensor}: SUCCESS ({n_rows} rows)\n")
+                    day_results["with_data"] += 1
+                    print(f"  Sensor {sensor}: {n_rows} rows")
                     continue
-                
-                df = pd.read_csv(input_path, sep=';', low_memory=False)
-                df = df[df['Date'] != 'Date']
-                df = df.dropna(subset=['Date', 'Time'])
-                df = df[df['Date'] == target_date]
-                
-                if df.empty:
-                    empty_df.to_csv(output_path, index=False, sep=';')
+                if status == "missing":
+                    log.write(f"  Sensor {sensor}: EMPTY (file not found)\n")
+                elif status == "no data":
                     log.write(f"  Sensor {sensor}: EMPTY (no data)\n")
-                    day_results["empty"] += 1
-                    continue
-                
-                df['Temperature (C)'] = pd.to_numeric(df['Temperature (C)'], errors='coerce')
-                df['Humidity (%)'] = pd.to_numeric(df['Humidity (%)'], errors='coerce')
-                
-                df['Datetime'] = pd.to_datetime(df['Date'] + ' ' + df['Time'], 
-                                                format='%d.%m.%Y %H:%M:%S', errors='coerce')
-                df = df.dropna(subset=['Datetime'])
-                df = df.sort_values(by='Datetime')
-                df['Time'] = df['Datetime'].dt.strftime('%H:%M:%S')
-                
-                final_cols = ['Date', 'Time', 'Temperature (C)', 'Humidity (%)']
-                df[final_cols].to_csv(output_path, index=False, sep=';')
-                
-                log.write(f"  Sensor {sensor}: SUCCESS ({len(df)} rows)\n")
-                day_results["with_data"] += 1
-                
-                print(f"  Sensor {sensor}: {len(df)} rows")
-                
-            except Exception as e:
-                empty_df.to_csv(output_path, index=False, sep=';')
-                log.write(f"  Sensor {sensor}: ERROR - {str(e)[:50]}...\n")
+                else:
+                    log.write(f"  Sensor {sensor}: ERROR - {message[:50]}...\n")
                 day_results["empty"] += 1
-        
-        results.append(day_results)
-        log.write(f"  Summary: {day_results['with_data']}/{day_results['total']} with data\n")
-    
-    log.write("\n" + "=" * 60 + "\n")
-    log.write("FINAL SUMMARY\n")
-    log.write("=" * 60 + "\n")
-    
-    total_files = sum(r["total"] for r in results)
-    total_with_data = sum(r["with_data"] for r in results)
-    total_empty = sum(r["empty"] for r in results)
-    
-    log.write(f"Total days processed: {len(days)}\n")
-    log.write(f"Total sensors per day: {len(sensors)}\n")
-    log.write(f"Total output files: {total_files}\n")
-    log.write(f"Files with data: {total_with_data}\n")
-    log.write(f"Empty files: {total_empty}\n")
-    
-    if total_files > 0:
-        coverage = (total_with_data / total_files) * 100
-        log.write(f"Data coverage: {coverage:.1f}%\n")
-    
-    log.write("\nDay-by-day breakdown:\n")
-    for r in results:
-        coverage = (r["with_data"] / r["total"] * 100) if r["total"] > 0 else 0
-        log.write(f"  Day {r['day']}: {r['with_data']}/{r['total']} ({coverage:.1f}%)\n")
-
-print(f"\nProcessing complete!")
-print(f"Generated {total_files} files")
-print(f"{total_with_data} files contain data ({coverage:.1f}% coverage)")
-print(f"Log file: {log_file}")
\ No newline at end of file
+
+            results.append(day_results)
+            log.write(f"  Summary: {day_results['with_data']}/{day_results['total']} with data\n")
+
+        log.write("\n" + "=" * 60 + "\n")
+        log.write("FINAL SUMMARY\n")
+        log.write("=" * 60 + "\n")
+
+        total_files = sum(r["total"] for r in results)
+        total_with_data = sum(r["with_data"] for r in results)
+        total_empty = sum(r["empty"] for r in results)
+
+        log.write(f"Total days processed: {len(days)}\n")
+        log.write(f"Total sensors per day: {len(sensors)}\n")
+        log.write(f"Total output files: {total_files}\n")
+        log.write(f"Files with data: {total_with_data}\n")
+        log.write(f"Empty files: {total_empty}\n")
+
+        coverage = (total_with_data / total_files) * 100 if total_files > 0 else 0
+        if total_files > 0:
+            log.write(f"Data coverage: {coverage:.1f}%\n")
+
+        log.write("\nDay-by-day breakdown:\n")
+        for r in results:
+            coverage = (r["with_data"] / r["total"] * 100) if r["total"] > 0 else 0
+            log.write(f"  Day {r['day']}: {r['with_data']}/{r['total']} ({coverage:.1f}%)\n")
+
+    print(f"\nProcessing complete!")
+    print(f"Generated {total_files} files")
+    print(f"{total_with_data} files contain data ({coverage:.1f}% coverage)")
+    print(f"Log file: {log_file}")
+
+if __name__ == "__main__":
+    main()
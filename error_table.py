@@ -0,0 +1,172 @@
+import mmap
+
+import numpy as np
+
+TYPES = [None, "Missing Data", "Invalid Data", "Sensor Fault", "Timeline", "Format", "Spike", "Flatline", "Stuck at Zero"]
+VALID, MISSING_DATA, INVALID_DATA, SENSOR_FAULT, TIMELINE, FORMAT, SPIKE, FLATLINE, STUCK_ZERO = range(len(TYPES))
+
+FIELD_LABELS = [None, "Temp", "Hum"]
+NO_FIELD, TEMP, HUM = range(len(FIELD_LABELS))
+
+NO_OFFSET = -1
+COLUMNS = {
+    "slot": np.int32,
+    "sensor": np.int16,
+    "code": np.int8,
+    "field": np.int8,
+    "offset": np.int64,
+}
+
+
+class ErrorTable:
+    """Error records as parallel arrays instead of one dict per error.
+
+    slot      slot on the time axis, or len(axis) when the timestamp itself
+              was bad or outside the axis
+    sensor    index into self.sensors
+    code      index into TYPES
+    field     NO_FIELD, TEMP or HUM
+    offset    byte offset of the offending line in self.sources[sensor],
+              NO_OFFSET when there is no line
+
+    Messages and raw lines are only rebuilt from the source file when a
+    report is written, so memory stays at 16 bytes per error. Sources that
+    are tailed can be truncated or replaced under their offsets, so their
+    tables also keep lines, the raw line of each row taken when it was
+    recorded (None to read it from the source).
+    """
+
+    def __init__(self, sensors=(), sources=(), lines=None, **columns):
+        self.sensors = list(sensors)
+        self.sources = [str(s) for s in sources]
+        for name, dtype in COLUMNS.items():
+            setattr(self, name, np.asarray(columns.get(name, ()), dtype=dtype))
+        self.lines = None if lines is None else np.asarray(lines, dtype=object)
+
+    @classmethod
+    def for_sensor(cls, sensor, source, parts):
+        # parts: (slot, code, field, offset) array tuples collected during
+        # ingest, or (slot, code, field, offset, lines) for a tailed source.
+        columns = {name: np.concatenate([p[i] for p in parts]) if parts else ()
+                   for i, name in enumerate(("slot", "code", "field", "offset"))}
+        n = len(columns["slot"])
+        lines = np.concatenate([p[4] for p in parts]) if parts and len(parts[0]) > 4 else None
+        return cls([sensor], [source], lines, sensor=np.zeros(n), **columns)
+
+    def __len__(self):
+        return len(self.slot)
+
+    @property
+    def nbytes(self):
+        return sum(getattr(self, name).nbytes for name in COLUMNS)
+
+    def columns(self):
+        return {name: getattr(self, name) for name in COLUMNS}
+
+    def take(self, index):
+        return ErrorTable(self.sensors, self.sources, None if self.lines is None else self.lines[index],
+                          **{n: a[index] for n, a in self.columns().items()})
+
+    def rebase(self, offset, n_slots, new_n_slots):
+        # Moves slots onto a longer axis on which slot 0 of the current one
+        # is slot offset. Readings that fall outside it are dropped; rows
+        # past the end of the old axis stay past the end of the new one.
+        inside = self.slot < n_slots
+        slot = np.where(inside, self.slot.astype(np.int64) + offset, new_n_slots)
+        keep = ~inside | ((slot >= 0) & (slot < new_n_slots))
+        table = self.take(keep)
+        table.slot = slot[keep].astype(np.int32)
+        return table
+
+    def sorted(self):
+        # Each file contributes a run that is already (nearly) in slot order;
+        # the stable sort merges those runs and keeps file order for ties.
+        return self.take(np.argsort(self.slot, kind="stable"))
+
+    def counts_by_type(self):
+        counts = np.bincount(self.code, minlength=len(TYPES))
+        return {TYPES[c]: int(n) for c, n in enumerate(counts) if n}
+
+    def counts_by_sensor(self):
+        # The same sensor can appear under several ids after concat().
+        counts = {}
+        for s, n in zip(self.sensors, np.bincount(self.sensor, minlength=len(self.sensors)).tolist()):
+            counts[s] = counts.get(s, 0) + n
+        return counts
+
+    def records(self, timeline):
+        # Yields the old dict records, rebuilding msg and raw from the line at
+        # each offset. Only called while a report is being written; timeline
+        # is a timeaxis.TimeAxis.
+        n_slots = len(timeline)
+        labels = timeline.labels(np.minimum(self.slot, n_slots - 1)) if n_slots else [None] * len(self)
+        kept = [None] * len(self) if self.lines is None else self.lines.tolist()
+        with LineReader(self.sources) as lines:
+            for label, slot, sensor, code, field, offset, raw in zip(
+                    labels, *(getattr(self, n).tolist() for n in COLUMNS), kept):
+                if raw is None and offset != NO_OFFSET:
+                    raw = lines.line(sensor, offset)
+                # A line that is gone, or no longer has the field, is N/A.
+                parts = [p.strip() for p in raw.split(";")] if raw is not None else []
+                raw = "N/A" if raw is None else raw
+
+                if code == TIMELINE:
+                    msg = "Out of range"
+                elif code == FORMAT:
+                    msg = f"{len(parts)} fields"
+                else:
+                    msg = f"{FIELD_LABELS[field]}: {parts[1 + field] if len(parts) > 1 + field else 'N/A'}"
+
+                yield {
+                    "time": label if slot < n_slots else (parts[1] if len(parts) > 1 else ""),
+                    "sensor": self.sensors[sensor],
+                    "type": TYPES[code],
+                    "msg": msg,
+                    "raw": raw
+                }
+
+
+def concat(tables):
+    tables = list(tables)
+    sensors, sources, columns = [], [], {name: [] for name in COLUMNS}
+    for table in tables:
+        base = len(sensors)
+        sensors.extend(table.sensors)
+        sources.extend(table.sources)
+        for name, values in table.columns().items():
+            columns[name].append(values + base if name == "sensor" else values)
+    lines = None
+    if any(table.lines is not None for table in tables):
+        lines = np.concatenate([np.full(len(t), None, dtype=object) if t.lines is None else t.lines for t in tables])
+    return ErrorTable(sensors, sources, lines, **{n: np.concatenate(v) if v else () for n, v in columns.items()})
+
+
+class LineReader:
+    """Memory-maps the source files and returns the stripped line at an offset."""
+
+    def __init__(self, sources):
+        self.sources = sources
+        self.maps = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        for mm in self.maps.values():
+            if mm is not None:
+                mm.close()
+        self.maps.clear()
+
+    def line(self, sensor, offset):
+        # None when the file is gone or now ends before offset.
+        if sensor not in self.maps:
+            try:
+                with open(self.sources[sensor], "rb") as f:
+                    self.maps[sensor] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except (OSError, ValueError):
+                self.maps[sensor] = None
+        mm = self.maps[sensor]
+        if mm is None or offset >= len(mm):
+            return None
+        end = mm.find(b"\n", offset)
+        return mm[offset:end if end != -1 else len(mm)].decode("utf-8", "replace").strip()
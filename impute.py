@@ -0,0 +1,152 @@
+import numpy as np
+
+import store
+
+MAX_GAP_SECONDS = 300
+MIN_FIT = 12
+MIN_REFERENCE = 2
+
+# Quality of each (slot, sensor) value.
+MISSING = 0
+OBSERVED = 1
+IMPUTED = 2
+
+def _neighbours(valid):
+    # Per sensor row and slot, the last valid slot at or before it (-1 if
+    # none) and the next valid slot at or after it (n if none). Rows are
+    # sensors, so the accumulation runs along contiguous memory.
+    n = valid.shape[1]
+    slots = np.arange(n, dtype=np.int32)
+    last = np.maximum.accumulate(np.where(valid, slots, -1), axis=1)
+    following = np.minimum.accumulate(np.where(valid, slots, n)[:, ::-1], axis=1)[:, ::-1]
+    return last, following
+
+def _take(values, slots):
+    return np.take_along_axis(values, np.clip(slots, 0, values.shape[1] - 1), axis=1)
+
+def _gaps(values):
+    # values as (sensor x slot), where it is missing, its neighbours and
+    # the length of the gap it is in.
+    values = np.ascontiguousarray(values.T)
+    missing = np.isnan(values)
+    last, following = _neighbours(~missing)
+    return values, missing, last, following, following - last - 1
+
+def fill_ffill(values, max_slots):
+    # The last reading carried over gaps of at most max_slots slots,
+    # including one after the last reading (the tail of a live day).
+    values, missing, last, following, gap = _gaps(values)
+    target = missing & (last >= 0) & (gap <= max_slots)
+    return np.where(target, _take(values, last), values).T, target.T
+
+def fill_linear(values, max_slots):
+    # A straight line between the readings on both sides of gaps of at most
+    # max_slots slots.
+    values, missing, last, following, gap = _gaps(values)
+    target = missing & (last >= 0) & (following < values.shape[1]) & (gap <= max_slots)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        share = (np.arange(values.shape[1]) - last) / (following - last)
+        before = _take(values, last)
+        line = before + (_take(values, following) - before) * share
+    return np.where(target, np.round(line, store.DECIMALS), values).T, target.T
+
+def leave_one_out_median(values):
+
+    # (slot x sensor): the median of the other sensors reporting in the
+    # slot, and how many there are. A row is sorted once and a sensor's own
+    # rank shifts the middle positions; missing sensors get the full median.
+    valid = ~np.isnan(values)
+    n = valid.sum(axis=1)[:, None]
+    order = np.argsort(values, axis=1)
+    ranked = np.take_along_axis(values, order, axis=1)
+    rank = np.empty_like(order)
+    np.put_along_axis(rank, order, np.arange(values.shape[1])[None, :], axis=1)
+    rank = np.where(valid, rank, n)
+    others = n - valid
+
+    def pick(k):
+        k = np.maximum(k, 0)
+        return np.take_along_axis(ranked, np.minimum(k + (k >= rank), values.shape[1] - 1), axis=1)
+
+    median = (pick((others - 1) // 2) + pick(others // 2)) / 2
+    return np.where(others > 0, median, np.nan), others
+
+def fit_lines(values, reference):
+    # Least squares a + b * reference per column over the rows where both
+    # are known: (intercept, slope, rows used).
+    paired = ~np.isnan(values) & ~np.isnan(reference)
+    n = paired.sum(axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean_x = np.where(paired, reference, 0.0).sum(axis=0) / n
+        mean_y = np.where(paired, values, 0.0).sum(axis=0) / n
+        dx = np.where(paired, reference - mean_x, 0.0)
+        slope = (dx * np.where(paired, values - mean_y, 0.0)).sum(axis=0) / (dx * dx).sum(axis=0)
+    return mean_y - slope * mean_x, slope, n
+
+def fill_regression(values, max_slots):
+
+    # Each sensor as a + b * the median of the other sensors in the slot,
+    # filling gaps of at most max_slots where MIN_REFERENCE others report.
+    # Sensors with fewer than MIN_FIT paired slots are left as they are.
+    reference, others = leave_one_out_median(values)
+    intercept, slope, n = fit_lines(values, reference)
+    with np.errstate(invalid="ignore"):
+        fitted = intercept + slope * reference
+    ok = (n >= MIN_FIT) & np.isfinite(slope)
+    values_t, missing, last, following, gap = _gaps(values)
+    target = missing.T & (others >= MIN_REFERENCE) & (gap.T <= max_slots) & ok
+    return np.where(target, np.round(fitted, store.DECIMALS), values), target
+
+FILLERS = {
+    "ffill": fill_ffill,
+    "linear": fill_linear,
+    "regression": fill_regression,
+}
+
+class Imputation:
+    """A gap-filled store and the MISSING, OBSERVED or IMPUTED quality of
+    every (slot, sensor) value, written out as <field>_quality columns."""
+
+    def __init__(self, data, quality, method, max_gap):
+        self.data = data
+        self.quality = quality
+        self.method = method
+        self.max_gap = max_gap
+
+    @property
+    def imputed(self):
+        return {field: q == IMPUTED for field, q in self.quality.items()}
+
+    def counts(self):
+        return {field: int(np.count_nonzero(q == IMPUTED)) for field, q in self.quality.items()}
+
+    def to_columns(self):
+        columns = self.data.to_columns()
+        for field in store.FIELDS:
+            columns[f"{field}_quality"] = self.quality[field]
+        return columns
+
+    def to_dict(self):
+        rows = self.data.to_dict()
+        names = {OBSERVED: "observed", IMPUTED: "imputed", MISSING: store.MISSING}
+        quality = {field: self.quality[field].tolist() for field in store.FIELDS}
+        for slot, t in enumerate(self.data.timeline):
+            for col, s in enumerate(self.data.sensors):
+                for field in store.FIELDS:
+                    rows[t][s][f"{field}_quality"] = names[quality[field][slot][col]]
+        return rows
+
+def fill(data, method, max_gap=MAX_GAP_SECONDS):
+
+    # A filled copy of data; data itself keeps the observed readings only.
+    if method not in FILLERS:
+        raise ValueError(f"Unknown fill method: {method} (available: {', '.join(FILLERS)})")
+    max_slots = max_gap // data.timeline.step
+    filled = store.SensorStore(data.timeline, data.sensors)
+    quality = {}
+    for field in store.FIELDS:
+        values = data.values(field)
+        result, target = FILLERS[method](values, max_slots)
+        getattr(filled, field)[:] = result
+        quality[field] = np.where(target, IMPUTED, np.where(np.isnan(values), MISSING, OBSERVED)).astype(np.int8)
+    return Imputation(filled, quality, method, max_gap)
@@ -1,24 +1,203 @@
+import mmap
 import os
-from pathlib import Path
-
-def find_raw_files(directory_name):
-
-    data_path = Path(directory_name)
-    
-    if not data_path.exists():
-        return []
-    
-    files_info = []
-    
-    for file_path in data_path.glob("*_DAY02_raw.csv"):
-        
-        sensor_name = file_path.stem.replace("_DAY02_raw", "")
-        
-        files_info.append(
-            {
-            "path": file_path,
-            "sensor": sensor_name
-            }
-        )
-        
-    return files_info
\ No newline at end of file
+
+import numpy as np
+
+import timeaxis
+# The file catalog lives in catalog, which does without numpy for the
+# quick commands of cli.py; it is re-exported for the pipeline.
+from catalog import (FILE_PATTERN, SOURCE_PATTERN, VARIANTS, build_catalog, find_raw_files, find_sources,
+                     group_by_day, parse_days, parse_sensors)
+
+HEADER_FIELD = "Date"
+CHUNK_ROWS = 8192
+BLOCK_BYTES = 1 << 20
+
+NEWLINE = ord("\n")
+SEPARATOR = ord(";")
+HEADER_BYTES = HEADER_FIELD.encode()
+# Lines with any other byte outside this range (control characters,
+# non-ASCII) are split by split_line instead of on the raw bytes.
+PRINTABLE = (0x21, 0x7E)
+# The ASCII bytes str.strip() removes; around fields they are trimmed on
+# the raw bytes too.
+STRIPPED = np.zeros(256, dtype=bool)
+STRIPPED[[0x09, 0x0A, 0x0B, 0x0C, 0x0D, 0x1C, 0x1D, 0x1E, 0x1F, 0x20]] = True
+# Fields are gathered into arrays as wide as the longest one, so lines with
+# a field longer than this are split by split_line too, and such fields are
+# validated one at a time.
+FIELD_BYTES = 32
+
+
+def split_line(raw_line):
+    # (stripped line, stripped fields), or None for blank and header lines.
+    clean_line = raw_line.decode("utf-8").strip()
+    if not clean_line:
+        return None
+    parts = [p.strip() for p in clean_line.split(";")]
+    if parts[0] == HEADER_FIELD:
+        return None
+    return clean_line, parts
+
+
+def iter_chunks(path, chunk_size=CHUNK_ROWS):
+
+    # Yields lists of (byte offset, stripped line, stripped fields). Blank
+    # lines and header lines, including ones repeated mid-file, are skipped.
+    chunk = []
+    offset = 0
+
+    with open(path, "rb") as f:
+        for raw_line in f:
+            line_offset = offset
+            offset += len(raw_line)
+
+            split = split_line(raw_line)
+            if split is None:
+                continue
+
+            chunk.append((line_offset, *split))
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+
+    if chunk:
+        yield chunk
+
+
+def peek_date(path, max_lines=1000):
+    # Date of the first data row that has a valid one, or None.
+    with open(path, "rb") as f:
+        for _, raw_line in zip(range(max_lines), f):
+            split = split_line(raw_line)
+            date = split and timeaxis.parse_date(split[1][0])
+            if date:
+                return date
+    return None
+
+
+def map_file(path):
+    # Read-only uint8 view of the whole file. The mapping stays alive for as
+    # long as any view into it does.
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return np.zeros(0, dtype=np.uint8)
+        return np.frombuffer(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ), dtype=np.uint8)
+
+
+def gather(buf, starts, ends):
+    # Copies buf[start:end] for every row into one fixed-width bytes array,
+    # one character column at a time; only columns past the shortest row
+    # need their ends cleared.
+    lengths = ends - starts
+    width = max(int(lengths.max(initial=0)), 1)
+    shortest = int(lengths.min(initial=0))
+    chars = np.zeros((len(starts), width), dtype=np.uint8)
+    if len(buf):
+        at = starts.copy()
+        for k in range(width):
+            col = buf.take(at, mode="clip")
+            if k >= shortest:
+                col[lengths <= k] = 0
+            chars[:, k] = col
+            at += 1
+    return chars.view(f"S{width}").ravel()
+
+
+def _trim(spaces, begins, ends, rows):
+    # Moves the bounds of the given rows inwards past the runs of STRIPPED
+    # bytes at the sorted positions spaces, whatever their length.
+    if not len(spaces) or not len(rows):
+        return
+    breaks = np.flatnonzero(np.diff(spaces) != 1)
+    first = np.concatenate([[0], breaks + 1])
+    last = np.append(breaks, len(spaces) - 1)
+    run = np.repeat(np.arange(len(first)), last - first + 1)
+    run_begin, run_end = spaces[first][run], spaces[last][run] + 1
+    for b, e in zip(begins, ends):
+        at = np.minimum(np.searchsorted(spaces, b[rows]), len(spaces) - 1)
+        hit = spaces[at] == b[rows]
+        b[rows[hit]] = np.minimum(run_end[at[hit]], e[rows[hit]])
+        at = np.minimum(np.searchsorted(spaces, e[rows] - 1), len(spaces) - 1)
+        hit = spaces[at] == e[rows] - 1
+        e[rows[hit]] = np.maximum(run_begin[at[hit]], b[rows[hit]])
+
+
+def split_block(buf, base=0):
+
+    # Splits a block of whole lines on the raw bytes. Lines of four fields
+    # with no control or non-ASCII bytes (nearly all of them) come back as
+    # fixed-width bytes arrays (offsets, dates, times, temps, hums), with
+    # the whitespace around fields trimmed as split_line does; any other
+    # non-empty line, or one with a field longer than FIELD_BYTES, goes
+    # through split_line and comes back as an iter_chunks row.
+    # Newlines, separators and odd bytes are sparse, so one pass finds all
+    # of them and per-line counts come from their positions.
+    n = len(buf)
+    marks = np.flatnonzero(((buf - np.uint8(PRINTABLE[0])) > np.uint8(PRINTABLE[1] - PRINTABLE[0])) | (buf == SEPARATOR))
+    kinds = buf[marks]
+    is_newline = kinds == NEWLINE
+    is_sep = kinds == SEPARATOR
+    newlines = marks[is_newline]
+    seps = marks[is_sep]
+    odd = marks[~(is_newline | is_sep)]
+    spaces = odd[STRIPPED[buf[odd]]]
+    odd = odd[~STRIPPED[buf[odd]]]
+    ends = newlines if n and buf[-1] == NEWLINE else np.append(newlines, n)
+    starts = np.concatenate([[0], newlines + 1])[:len(ends)]
+
+    # The separators before each line, counted along the marks in order.
+    first_sep = np.concatenate([[0], np.cumsum(is_sep)[is_newline]])[:len(ends)]
+    n_seps = np.diff(first_sep, append=len(seps))
+    simple = n_seps == 3
+    simple[np.searchsorted(ends, odd)] = False
+    fast = np.flatnonzero(simple)
+    s1, s2, s3 = (seps[first_sep[fast] + k] for k in range(3))
+    begins = [starts[fast], s1 + 1, s2 + 1, s3 + 1]
+    field_ends = [s1, s2, s3, ends[fast]]
+    spaced = np.zeros(len(starts), dtype=bool)
+    spaced[np.searchsorted(ends, spaces)] = True
+    spaced = np.flatnonzero(spaced[fast])
+    _trim(spaces, begins, field_ends, spaced)
+    short = np.logical_and.reduce([e - b <= FIELD_BYTES for b, e in zip(begins, field_ends)])
+    simple[fast[~short]] = False
+
+    rows = []
+    for i in np.flatnonzero(~simple & (ends > starts)).tolist():
+        split = split_line(buf[starts[i]:ends[i]].tobytes())
+        if split is not None:
+            rows.append((base + int(starts[i]), *split))
+
+    # Only lines whose first field is as long as the header's can be one;
+    # blank lines have a single field.
+    begins = [b[short] for b in begins]
+    field_ends = [e[short] for e in field_ends]
+    data = field_ends[0] - begins[0] != len(HEADER_BYTES)
+    maybe = np.flatnonzero(~data)
+    for k, byte in enumerate(HEADER_BYTES):
+        data[maybe] |= buf[begins[0][maybe] + k] != byte
+
+    offsets = base + starts[fast[short]][data]
+    dates, times, temps, hums = (gather(buf, b[data], e[data]) for b, e in zip(begins, field_ends))
+    return offsets, dates, times, temps, hums, rows
+
+
+def iter_blocks(path, block_bytes=BLOCK_BYTES):
+
+    # Yields split_block results over the memory-mapped file, cut on line
+    # boundaries roughly every block_bytes.
+    buf = map_file(path)
+    start = 0
+    while start < len(buf):
+        end = min(start + block_bytes, len(buf))
+        window = 4096
+        while end < len(buf):
+            newlines = np.flatnonzero(buf[end - 1:end - 1 + window] == NEWLINE)
+            if len(newlines):
+                end += int(newlines[0])
+                break
+            if end - 1 + window >= len(buf):
+                end = len(buf)
+            window *= 2
+        yield split_block(buf[start:end], start)
+        start = end
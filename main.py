@@ -1,110 +1,456 @@
+import argparse
+import contextlib
+import datetime as dt
+from concurrent.futures import ProcessPoolExecutor
+import anomaly
+import cache
+import consensus
+import error_table
+import impute
 import io_utils
+import numpy as np
+import perf
 import proc
+import query
 import report
+import rollup
+import stats
+import store
+import timeaxis
+import watch
 import os
 
-def main():
-    
-    RAW_DIR = "data/raw"
-    PROCESSED_DIR = "data/processed"
-    all_errors = []
-    
-    timeline = [f"{h:02d}:{m:02d}:{s:02d}" for h in range(24) for m in range(60) for s in range(0,60,5)]
-    TEMP_RANGE = (-30.0, 60.0)
-    HUM_RANGE  = (0.0, 100.0)
-    INVALID_TOKEN = ['NAN']
-        
-    files_info = io_utils.find_raw_files(RAW_DIR)
-    sensor_names = [info["sensor"] for info in files_info]
-    normalized_data = {t: {s: {"temp": "N/A", "hum": "N/A"} for s in sensor_names} for t in timeline}
-
-    for info in files_info:
-        
-        found_time_interval = set()
-        f = info["path"].open("r", encoding="utf-8")
-        
-        next(f, None)
-        
-        for line_no, line in enumerate(f, 2):    
-            
-            clean_line = line.strip()
-            
-            if not clean_line: 
-                continue
-            
-            parts = [p.strip() for p in clean_line.split(";")]
-            
-            _ , time_v, t_raw, h_raw = parts
-            if time_v not in timeline:
-                all_errors.append(
-                    {
-                        "time": time_v,
-                        "sensor": info["sensor"],
-                        "type": "Timeline",
-                        "msg": "Out of range",
-                        "raw": clean_line
-                    }
-                )
-                continue
-
-            found_time_interval.add(time_v)
-            
-            t_val, t_err = proc.validate_field(t_raw, "temp", TEMP_RANGE, INVALID_TOKEN)
-            h_val, h_err = proc.validate_field(h_raw, "hum", HUM_RANGE, INVALID_TOKEN)
-            
-            if t_err: 
-                all_errors.append(
-                    {
-                        "time": time_v,
-                        "sensor": info["sensor"],
-                        "type": t_err,
-                        "msg": f"Temp: {t_raw}",
-                        "raw": clean_line
-                    }
-                )
-            
-            if h_err: 
-                all_errors.append(
-                    {
-                        "time": time_v,
-                        "sensor": info["sensor"],
-                        "type": h_err,
-                        "msg": f"Hum: {h_raw}",
-                        "raw": clean_line
-                    }
-                )
-            
-            normalized_data[time_v][info["sensor"]] = {
-                                                        "temp": t_val,
-                                                        "hum": h_val
-                                                      }
-
-        all_errors.extend(proc.identify_gaps(timeline, found_time_interval, info["sensor"]))
-
-    
-    sorted_errors = sorted(all_errors, key=lambda x: x['time'])
-    report.generate_error_log(sorted_errors, os.path.join(PROCESSED_DIR, "errors.log"))
-    report.generate_data_log(normalized_data, timeline, sensor_names, os.path.join(PROCESSED_DIR, "clean_data.log"))
-    
+RAW_DIR = "data/raw"
+PROCESSED_DIR = "data/processed"
+TEMP_RANGE = (-30.0, 60.0)
+HUM_RANGE  = (0.0, 100.0)
+INVALID_TOKEN = ['NAN']
+
+_worker_parser = "mmap"
+_worker_anomalies = None
+
+def _init_worker(parser="mmap", anomalies=None):
+    global _worker_parser, _worker_anomalies
+    _worker_parser = parser
+    _worker_anomalies = anomalies
+
+def _ingest_worker(info):
+    # Each file is parsed onto the axis of its own day (info["axis"]). The
+    # file's measurements are taken in the process that parses it and come
+    # back with the result.
+    record = {"source": "parsed", "pid": os.getpid()}
+    with perf.measure(record):
+        result = proc.ingest_file(
+            info["path"], info["sensor"], info["axis"], TEMP_RANGE, HUM_RANGE, INVALID_TOKEN,
+            parser=_worker_parser, counters=record, anomaly_limits=_worker_anomalies
+        )
+    return result, record
+
+def make_executor(workers, parser="mmap", anomalies=None):
+    if workers <= 1:
+        return None
+    return ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(parser, anomalies))
+
+def ingest_files(files_info, executor=None, parser="mmap", anomalies=None):
+    if executor is None:
+        _init_worker(parser, anomalies)
+        return map(_ingest_worker, files_info)
+    return executor.map(_ingest_worker, files_info)
+
+def load_day(files_info, executor=None, file_cache=None, lookups=None, parser="mmap", recorder=None, anomalies=None):
+
+    # Yields one ingest result per file, in order. Files with a current cache
+    # entry are loaded from it; the rest are parsed (in the pool, if any)
+    # and stored.
+    lookups = lookups or [(None, False)] * len(files_info)
+    recorder = recorder or perf.PerfRecorder()
+    misses = [info for info, (_, hit) in zip(files_info, lookups) if not hit]
+    parsed = ingest_files(misses, executor, parser, anomalies)
+
+    for info, (digest, hit) in zip(files_info, lookups):
+        if hit:
+            record = {"source": "cache", "rows": None}
+            with perf.measure(record):
+                columns, presence, errors = file_cache.load(info)
+                file_stats = stats.SensorStats.from_columns(columns["temp"], columns["hum"], info["axis"])
+            recorder.add_file(info, record)
+            yield columns, presence, errors, file_stats
+            continue
+        result, record = next(parsed)
+        recorder.add_file(info, record)
+        if file_cache:
+            file_cache.store(info, digest, info["axis"], *result[:3])
+        yield result
+
+def cache_settings(anomalies=None):
+    # Everything a cached parse depends on besides the file itself.
+    return {
+        "temp_range": list(TEMP_RANGE),
+        "hum_range": list(HUM_RANGE),
+        "invalid_tokens": INVALID_TOKEN,
+        "anomalies": anomalies
+    }
+
+def resolve_dates(by_day):
+
+    # The calendar date of each day group comes from the first data row of
+    # its files. A day whose files hold no rows takes month and year from
+    # another day of the selection.
+    dates = {}
+    for day, files_info in by_day.items():
+        dates[day] = next(filter(None, (io_utils.peek_date(info["path"]) for info in files_info)), None)
+    known = next((d for d in dates.values() if d), timeaxis.EPOCH.date())
+    for day, date in dates.items():
+        if date is None:
+            try:
+                dates[day] = known.replace(day=int(day))
+            except ValueError:
+                dates[day] = known
+    return dates
+
+def process_day(files_info, axis, output_dir, *, executor=None, levels=rollup.DEFAULT_LEVELS, formats=None, file_cache=None, stream_errors=False, parser="mmap", recorder=None, anomalies=None, fill=None, max_gap=impute.MAX_GAP_SECONDS):
+
+    # files_info may hold several days; each file is placed on axis at the
+    # offset of its own day axis, so a whole window is one contiguous store.
+    # With fill, the roll-ups are built from a gap-filled copy of the store;
+    # statistics and the consensus keep to the observed readings.
+    sensor_names = list(dict.fromkeys(info["sensor"] for info in files_info))
+    normalized_data = store.SensorStore(axis, sensor_names)
+    presence_by_sensor = {s: np.zeros(len(axis), dtype=bool) for s in sensor_names}
+    single_day = all(info["axis"] == axis for info in files_info)
+    sensor_stats = {}
+    formats = formats or {}
+    recorder = recorder or perf.PerfRecorder()
+    n_cells = len(axis) * len(sensor_names)
+
+    lookups = [file_cache.lookup(info, info["axis"]) for info in files_info] if file_cache else None
+    signature = {
+        "files": [[info["sensor"], digest] for info, (digest, _) in zip(files_info, lookups or [])],
+        "axis": axis.key,
+        "levels": list(levels),
+        "formats": formats,
+        "stream_errors": stream_errors,
+        "fill": [fill, max_gap] if fill else None
+    }
+    if file_cache and file_cache.day_is_current(output_dir, signature):
+        print("Inputs unchanged, keeping existing outputs")
+        return {
+            info["sensor"]: stats.SensorStats.from_columns(columns["temp"], columns["hum"], info["axis"])
+            for info, (columns, _, _) in zip(files_info, map(file_cache.load, files_info))
+        }
+
+    os.makedirs(output_dir, exist_ok=True)
+    error_log_path = os.path.join(output_dir, "errors.log")
+
+    # With stream_errors the error log is written file by file as ingest
+    # goes, grouped by sensor instead of globally sorted by time.
+    day_errors = []
+    day_gaps = []
+    uptime = {}
+    with contextlib.ExitStack() as stack:
+        error_log = stack.enter_context(report.ErrorLogWriter(error_log_path, report.time_width(axis))) if stream_errors else None
+
+        with recorder.stage("ingest") as record:
+            results = load_day(files_info, executor, file_cache, lookups, parser, recorder, anomalies)
+            for info, (sensor_columns, presence, errors, file_stats) in zip(files_info, results):
+
+                file_axis = info["axis"]
+                offset = axis.offset_of(file_axis)
+                first, last = max(offset, 0), min(offset + len(file_axis), len(axis))
+                if first < last:
+                    src = slice(first - offset, last - offset)
+                    for field, values in sensor_columns.items():
+                        normalized_data.set_column(info["sensor"], field, values[src], slice(first, last))
+                    presence_by_sensor[info["sensor"]][first:last] |= presence[src]
+                errors = errors.rebase(offset, len(file_axis), len(axis))
+                if single_day:
+                    sensor_stats[info["sensor"]] = file_stats
+                if error_log:
+                    error_log.write(errors.records(axis))
+                day_errors.append(errors)
+            record["rows"] = sum(int(np.count_nonzero(p)) for p in presence_by_sensor.values())
+
+        with recorder.stage("gaps", n_cells) as record:
+            for sensor, presence in presence_by_sensor.items():
+                gaps = proc.identify_gaps(axis, presence, sensor)
+                uptime[sensor] = proc.uptime_summary(presence, gaps)
+                day_gaps.extend(gaps)
+            if error_log:
+                error_log.write_gaps(day_gaps, uptime)
+
+    day_errors = error_table.concat(day_errors)
+    counts = ", ".join(f"{name}={n}" for name, n in day_errors.counts_by_type().items())
+    print(f"{len(day_errors)} errors ({counts or 'none'}), {len(day_gaps)} gap intervals")
+    if not stream_errors:
+        with recorder.stage("error_log", len(day_errors)):
+            report.generate_error_log(day_errors, axis, error_log_path, day_gaps, uptime)
+    with recorder.stage("data_log", n_cells):
+        report.generate_data_log(normalized_data, axis, sensor_names, os.path.join(output_dir, "clean_data.log"))
+
     print("Pre Processing Complete")
-    
+
     print("Calculating statistics...")
-    city_stats, sensors_stats = proc.statistics(normalized_data, sensor_names)
-    report.statistics_log(city_stats, sensors_stats, os.path.join(PROCESSED_DIR, "stats_report.log"))
-    
-    
-    print("Aggregating to minutely level...")
-    minutely_data = proc.aggregate_data(normalized_data, sensor_names, level="minutely")
-    
-    print("Aggregating to hourly level...")
-    hourly_data = proc.aggregate_data(minutely_data, sensor_names, level="hourly")
-
-    print("Build JSON files...")
-    report.generate_data_json(normalized_data, os.path.join(PROCESSED_DIR, "clean_data.json"))
-    report.generate_data_json(minutely_data, os.path.join(PROCESSED_DIR, "data_minutely.json"))
-    report.generate_data_json(hourly_data, os.path.join(PROCESSED_DIR, "data_hourly.json"))
-    
+    with recorder.stage("consensus", n_cells):
+        city = consensus.Consensus(normalized_data)
+        city_summary = city.summary()
+    with recorder.stage("statistics", n_cells):
+        if not single_day:
+            # Readings of several days per sensor: summarise the placed columns.
+            sensor_stats = {
+                s: stats.SensorStats.from_columns(normalized_data.temp[:, col], normalized_data.hum[:, col], axis)
+                for col, s in enumerate(sensor_names)
+            }
+        city_stats, sensors_stats = proc.statistics(normalized_data, sensor_names, sensor_stats)
+        report.statistics_log(city_stats, sensors_stats, os.path.join(output_dir, "stats_report.log"), city_summary)
+
+
+    filled = None
+    if fill:
+        with recorder.stage("fill", n_cells):
+            filled = impute.fill(normalized_data, fill, max_gap)
+        counts = ", ".join(f"{field}={n}" for field, n in filled.counts().items())
+        print(f"Filled gaps of up to {max_gap} s by {fill}: {counts} values imputed")
+
+    print(f"Aggregating to {', '.join(levels)} levels...")
+    with recorder.stage("rollup", n_cells):
+        if filled:
+            rolled = rollup.rollup(filled.data, levels, filled.imputed)
+        else:
+            rolled = rollup.rollup(normalized_data, levels)
+
+    print("Build data files...")
+    outputs = [os.path.join(output_dir, name) for name in ("errors.log", "clean_data.log", "stats_report.log")]
+    with recorder.stage("write_data") as record:
+        outputs.append(report.write_data(normalized_data, output_dir, "clean_data", formats.get("clean", "json")))
+        outputs.extend(consensus.write(city, output_dir, formats.get("consensus", "json"), city_summary))
+        if filled:
+            outputs.append(report.write_data(filled, output_dir, "data_filled", formats.get("filled", "json")))
+        for name, level in rolled.items():
+            outputs.append(report.write_data(level, output_dir, f"data_{name}", formats.get(name, "json")))
+        record["rows"] = n_cells + sum(len(level.labels) * len(sensor_names) for level in rolled.values())
+    with recorder.stage("index", n_cells):
+        outputs.append(query.write_index(output_dir, normalized_data, rolled))
+
+    if file_cache:
+        file_cache.mark_day(output_dir, signature, outputs)
+
     print("Multi-level processing complete")
+    return sensor_stats
+
+def parse_formats(spec, levels):
+
+    # "npz" sets every output; "json,minutely=npz,clean=compact" sets a
+    # default plus per-output overrides.
+    default = "json"
+    overrides = {}
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        name, _, fmt = item.rpartition("=")
+        if fmt not in report.available_formats():
+            raise SystemExit(f"Unsupported output format: {fmt} (available: {', '.join(report.available_formats())})")
+        if not name:
+            default = fmt
+        elif name in ("clean", "consensus", "filled") or name in levels:
+            overrides[name] = fmt
+        else:
+            raise SystemExit(f"Unknown output for --format: {name}")
+    return {name: overrides.get(name, default) for name in ["clean", "consensus", "filled", *levels]}
+
+def parse_args(argv=None):
+
+    parser = argparse.ArgumentParser(description="Clean, validate and aggregate sensor day files.")
+    parser.add_argument("--days", default="02",
+                        help="day or day range, e.g. 02, 01-10 or 2,4,7 (default: 02)")
+    parser.add_argument("--all", action="store_true",
+                        help="process every day found in the raw directory")
+    parser.add_argument("--sensors", default=None,
+                        help="comma separated sensors, e.g. SENSOR01,SENSOR04 or 1,4 (default: all)")
+    parser.add_argument("--variant", choices=io_utils.VARIANTS, default="raw",
+                        help="read the corrupted *_raw.csv files or the clean day files")
+    parser.add_argument("--levels", default=",".join(rollup.DEFAULT_LEVELS),
+                        help=f"comma separated roll-up levels out of {', '.join(rollup.LEVELS)} "
+                             f"(default: {','.join(rollup.DEFAULT_LEVELS)})")
+    parser.add_argument("--format", default="json",
+                        help="output format (json, compact, npz, parquet), optionally per output: "
+                             "json,clean=npz,consensus=npz,filled=npz,minutely=compact (default: json)")
+    parser.add_argument("--step", type=int, default=5,
+                        help="sampling interval in seconds; readings off this grid are Timeline errors (default: 5)")
+    parser.add_argument("--window", action="store_true",
+                        help="process the selected days as one multi-day time axis instead of one day at a time")
+    parser.add_argument("--start", default=None,
+                        help="start of the window, e.g. 2024-09-03 or 2024-09-03T06:00 (implies --window)")
+    parser.add_argument("--end", default=None,
+                        help="end of the window, exclusive (implies --window)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="parse sensor files in this many worker processes (default: 1)")
+    parser.add_argument("--parser", choices=proc.PARSERS, default="mmap",
+                        help="mmap scans the mapped file as bytes; lines decodes and splits line by line (default: mmap)")
+    parser.add_argument("--stream-errors", action="store_true",
+                        help="write errors.log while files are ingested, grouped per sensor instead of sorted by time")
+    parser.add_argument("--anomalies", action="store_true",
+                        help="flag spikes, flatlines and stuck-at-zero readings as errors and leave them out of "
+                             "the clean data, roll-ups and statistics (default: keep every valid reading)")
+    parser.add_argument("--fill", choices=list(impute.FILLERS), default=None,
+                        help="fill gaps before the roll-ups by carrying the last reading forward, a straight line "
+                             "between the readings around the gap, or a fit on the other sensors' median; "
+                             "roll-ups then carry each bucket's fill rate (default: no filling)")
+    parser.add_argument("--max-gap", type=int, default=impute.MAX_GAP_SECONDS,
+                        help=f"with --fill, longest gap in seconds that is filled (default: {impute.MAX_GAP_SECONDS})")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="re-parse every file and rewrite every output, ignoring data/processed/cache")
+    parser.add_argument("--profile", action="store_true",
+                        help=f"capture a cProfile of the run: {perf.PROFILE_FILE} plus the top functions in {perf.PERF_REPORT}")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help=f"trace Python allocations: per-stage peaks and the top allocation sites in {perf.PERF_REPORT}")
+    parser.add_argument("--watch", action="store_true",
+                        help="tail the SENSORxx.CSV source files and keep the live day's outputs up to date")
+    parser.add_argument("--from-end", action="store_true",
+                        help="with --watch, skip what the sources already hold and only follow new lines")
+    parser.add_argument("--poll-interval", type=float, default=watch.POLL_SECONDS,
+                        help=f"with --watch, seconds between polls of the sources (default: {watch.POLL_SECONDS:g})")
+    parser.add_argument("--flush-interval", type=float, default=watch.FLUSH_SECONDS,
+                        help=f"with --watch, seconds between output rewrites while new lines arrive (default: {watch.FLUSH_SECONDS:g})")
+    parser.add_argument("--ticks", type=int, default=None,
+                        help="with --watch, stop after this many polls (default: run until interrupted)")
+    parser.add_argument("--raw-dir", default=RAW_DIR)
+    parser.add_argument("--out-dir", default=PROCESSED_DIR)
+    args = parser.parse_args(argv)
+
+    try:
+        io_utils.parse_days(args.days)
+    except ValueError as e:
+        parser.error(f"--days: {e}")
+    bounds = {}
+    for name in ("start", "end"):
+        value = getattr(args, name)
+        try:
+            bounds[name] = dt.datetime.fromisoformat(value) if value else None
+        except ValueError:
+            parser.error(f"--{name}: not an ISO date or date and time: {value}")
+    if bounds["start"] and bounds["end"] and bounds["end"] <= bounds["start"]:
+        parser.error(f"--end {args.end} is not after --start {args.start}")
+    return args
+
+def main(argv=None):
+
+    args = parse_args(argv)
+    levels = [name.strip() for name in args.levels.split(",") if name.strip()]
+    unknown = [name for name in levels if name not in rollup.LEVELS]
+    if unknown:
+        raise SystemExit(f"Unknown roll-up level(s): {', '.join(unknown)}")
+    formats = parse_formats(args.format, levels)
+    anomalies = anomaly.LIMITS if args.anomalies else None
+    days = None if args.all else io_utils.parse_days(args.days)
+    sensors = io_utils.parse_sensors(args.sensors) if args.sensors else None
+
+    if args.step <= 0 or timeaxis.DAY_SECONDS % args.step:
+        raise SystemExit(f"--step must divide a day into whole slots: {args.step}")
+    coarse = [name for name in levels if rollup.LEVELS[name][0] % args.step]
+    if coarse:
+        raise SystemExit(f"Roll-up level(s) {', '.join(coarse)} are not a multiple of --step {args.step}")
+
+    if args.max_gap < 0:
+        raise SystemExit(f"--max-gap must not be negative: {args.max_gap}")
+
+    if args.watch:
+        if args.fill:
+            raise SystemExit("--fill works on whole days and cannot be combined with --watch")
+        sources = io_utils.find_sources(args.raw_dir, sensors)
+        if not sources:
+            print("No SENSORxx.CSV source files to watch")
+            return
+        watcher = watch.Watcher(sources, args.out_dir, args.step, levels, formats, args.flush_interval,
+                                from_end=args.from_end, temp_range=TEMP_RANGE, hum_range=HUM_RANGE,
+                                invalid_tokens=INVALID_TOKEN, anomaly_limits=anomalies)
+        watcher.run(args.poll_interval, args.ticks)
+        return
+
+    catalog = io_utils.build_catalog(args.raw_dir, days=days, sensors=sensors, variant=args.variant)
+    by_day = io_utils.group_by_day(catalog)
+    if not by_day:
+        print("No sensor files matched the selection")
+        return
+
+    # A single day keeps writing straight into the output directory; a batch
+    # gets one DAYxx sub-directory per day, unless it is processed as one
+    # window.
+    window = args.window or args.start or args.end
+    batch = len(by_day) > 1 and not window
+    recorder = perf.PerfRecorder(args.profile, args.trace_memory, settings={
+        "days": list(by_day),
+        "files": len(catalog),
+        "bytes": sum(info["size"] for info in catalog),
+        "variant": args.variant,
+        "step": args.step,
+        "window": bool(window),
+        "levels": levels,
+        "formats": formats,
+        "workers": args.workers,
+        "parser": args.parser,
+        "cache": not args.no_cache,
+        "stream_errors": args.stream_errors,
+        "anomalies": anomalies,
+        "fill": [args.fill, args.max_gap] if args.fill else None
+    }).start()
+
+    with recorder.stage("dates", len(catalog)):
+        dates = resolve_dates(by_day)
+        for day, files_info in by_day.items():
+            for info in files_info:
+                info["date"] = dates[day]
+                info["axis"] = timeaxis.TimeAxis.for_days(dates[day], step=args.step)
+
+    batch_stats = {}
+    file_cache = None
+    if not args.no_cache:
+        file_cache = cache.FileCache(os.path.join(args.out_dir, cache.CACHE_DIRNAME), cache_settings(anomalies))
+    executor = make_executor(args.workers, args.parser, anomalies)
+    day_options = dict(executor=executor, levels=levels, formats=formats, file_cache=file_cache,
+                       stream_errors=args.stream_errors, parser=args.parser, recorder=recorder,
+                       anomalies=anomalies, fill=args.fill, max_gap=args.max_gap)
+    try:
+        if window:
+            start = dt.datetime.fromisoformat(args.start) if args.start else min(dates.values())
+            end = dt.datetime.fromisoformat(args.end) if args.end else max(dates.values()) + dt.timedelta(days=1)
+            axis = timeaxis.TimeAxis.for_range(start, end, args.step)
+            if not len(axis):
+                raise SystemExit(f"Empty window: {start} - {end}")
+            files_info = [info for day_files in by_day.values() for info in day_files]
+            total_size = sum(info["size"] for info in files_info)
+            print(f"=== {axis[0]} - {axis[-1]}: {len(files_info)} files, {total_size:,} bytes, {len(axis):,} slots ===")
+            recorder.scope = "window"
+            process_day(files_info, axis, args.out_dir, **day_options)
+        for day, files_info in ([] if window else by_day.items()):
+            total_size = sum(info["size"] for info in files_info)
+            print(f"=== DAY{day}: {len(files_info)} files, {total_size:,} bytes ===")
+            output_dir = os.path.join(args.out_dir, f"DAY{day}") if batch else args.out_dir
+            recorder.scope = f"DAY{day}"
+            day_stats = process_day(files_info, files_info[0]["axis"], output_dir, **day_options)
+            for sensor, sensor_stats in day_stats.items():
+                sensor_stats.activity.relabel(lambda t: f"DAY{day} {t}")
+                batch_stats.setdefault(sensor, stats.SensorStats()).merge(sensor_stats)
+
+        if batch:
+            # Whole-batch statistics come from merging the per-day accumulators.
+            print(f"=== DAY{min(by_day)}-DAY{max(by_day)} ===")
+            recorder.scope = "batch"
+            with recorder.stage("statistics", len(batch_stats)):
+                sensor_names = sorted(batch_stats)
+                city_stats, sensors_stats = proc.statistics(None, sensor_names, batch_stats)
+                report.statistics_log(city_stats, sensors_stats, os.path.join(args.out_dir, "stats_report.log"))
+    finally:
+        if executor is not None:
+            executor.shutdown()
+        if file_cache is not None:
+            file_cache.save()
+            print(f"File cache: {file_cache.hits} reused, {file_cache.misses} parsed")
+        recorder.stop()
+
+    print("Performance by stage:")
+    print(recorder.summary())
+    print(f"Performance report: {recorder.write(args.out_dir)}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,196 @@
+import contextlib
+import cProfile
+import datetime as dt
+import json
+import os
+import platform
+import pstats
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+PERF_REPORT = "perf_report.json"
+PROFILE_FILE = "perf_profile.pstats"
+REPORT_VERSION = 1
+TOP_ENTRIES = 25
+
+
+def peak_rss_mb(who="self"):
+    # Peak resident set size so far; ru_maxrss is in KB on Linux, bytes on macOS.
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN if who == "children" else resource.RUSAGE_SELF)
+    scale = 1 if sys.platform == "darwin" else 1024
+    return round(usage.ru_maxrss * scale / 1e6, 1)
+
+
+def children_cpu_s():
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return round(usage.ru_utime + usage.ru_stime, 4)
+
+
+@contextlib.contextmanager
+def measure(record=None):
+
+    # Fills record with wall and CPU seconds of the block and the peak RSS
+    # at its end; with tracemalloc running, also the peak of traced Python
+    # allocations inside the block.
+    record = {} if record is None else record
+    tracing = tracemalloc.is_tracing()
+    if tracing:
+        tracemalloc.reset_peak()
+    wall, cpu = time.perf_counter(), time.process_time()
+    try:
+        yield record
+    finally:
+        record["wall_s"] = round(time.perf_counter() - wall, 4)
+        record["cpu_s"] = round(time.process_time() - cpu, 4)
+        record["peak_rss_mb"] = peak_rss_mb()
+        if tracing:
+            record["traced_peak_mb"] = round(tracemalloc.get_traced_memory()[1] / 1e6, 2)
+
+
+def timed(iterable, counters, rows=len):
+
+    # Re-yields iterable, adding the time spent producing each item to
+    # counters["parse_s"] and its row count to counters["rows"].
+    items = iter(iterable)
+    while True:
+        start = time.perf_counter()
+        item = next(items, None)
+        counters["parse_s"] = counters.get("parse_s", 0.0) + time.perf_counter() - start
+        if item is None:
+            return
+        counters["rows"] = counters.get("rows", 0) + rows(item)
+        yield item
+
+
+class PerfRecorder:
+    """Stage and per-file measurements of one run, written to perf_report.json.
+
+    Stages are timed in the main process with stage(); files parsed in
+    worker processes bring their own measurements back with the ingest
+    result. profile and trace_memory switch on a cProfile capture and
+    tracemalloc for the whole run; both cost noticeable time, so they are
+    off unless asked for.
+    """
+
+    def __init__(self, profile=False, trace_memory=False, settings=None):
+        self.settings = settings or {}
+        self.scope = None
+        self.stages = []
+        self.files = []
+        self.profiler = cProfile.Profile() if profile else None
+        self.trace_memory = trace_memory
+        self.started = None
+        self.total = {}
+        self._run = None
+
+    def start(self):
+        self.started = dt.datetime.now().isoformat(timespec="seconds")
+        if self.trace_memory:
+            tracemalloc.start()
+        self._run = measure(self.total)
+        self._run.__enter__()
+        if self.profiler:
+            self.profiler.enable()
+        return self
+
+    def stop(self):
+        if self.profiler:
+            self.profiler.disable()
+        if self._run is not None:
+            self._run.__exit__(None, None, None)
+            self._run = None
+        self.total["children_cpu_s"] = children_cpu_s()
+        self.total["children_peak_rss_mb"] = peak_rss_mb("children")
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    @contextlib.contextmanager
+    def stage(self, name, rows=None):
+        # The yielded record can be given its row count inside the block.
+        record = {"stage": name, "scope": self.scope, "rows": rows}
+        with measure(record):
+            yield record
+        self.stages.append(record)
+
+    def add_file(self, info, record):
+        self.files.append({
+            "file": os.path.basename(str(info["path"])),
+            "sensor": info["sensor"],
+            "day": info.get("day"),
+            "bytes": info.get("size"),
+            **record
+        })
+
+    def _profile_top(self, top):
+        stats = pstats.Stats(self.profiler)
+        entries = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:top]
+        return [
+            {
+                "function": f"{os.path.basename(filename)}:{line}({func})",
+                "calls": calls,
+                "tottime_s": round(tottime, 4),
+                "cumtime_s": round(cumtime, 4)
+            }
+            for (filename, line, func), (_, calls, tottime, cumtime, _) in entries
+        ]
+
+    def _memory_top(self, top):
+        snapshot = tracemalloc.take_snapshot()
+        return [
+            {"site": str(stat.traceback), "size_mb": round(stat.size / 1e6, 3), "blocks": stat.count}
+            for stat in snapshot.statistics("lineno")[:top]
+        ]
+
+    def write(self, output_dir, top=TOP_ENTRIES):
+        os.makedirs(output_dir, exist_ok=True)
+        report = {
+            "version": REPORT_VERSION,
+            "started": self.started,
+            "argv": sys.argv[1:],
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "settings": self.settings,
+            "total": self.total,
+            "stages": self.stages,
+            "files": self.files,
+        }
+        if self.profiler:
+            self.profiler.dump_stats(os.path.join(output_dir, PROFILE_FILE))
+            report["profile"] = self._profile_top(top)
+        if self.trace_memory and tracemalloc.is_tracing():
+            # Allocations still alive at the end of the run, largest first.
+            report["live_memory"] = self._memory_top(top)
+            tracemalloc.stop()
+        path = os.path.join(output_dir, PERF_REPORT)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        return path
+
+    def summary(self):
+        # Wall time per stage summed over scopes, slowest first.
+        totals = {}
+        for record in self.stages:
+            wall, cpu, rows = totals.get(record["stage"], (0.0, 0.0, 0))
+            totals[record["stage"]] = (wall + record["wall_s"], cpu + record["cpu_s"], rows + (record["rows"] or 0))
+        lines = [f"  {'stage':<12} {'wall':>9} {'cpu':>9} {'rows':>12}"]
+        for name, (wall, cpu, rows) in sorted(totals.items(), key=lambda item: -item[1][0]):
+            lines.append(f"  {name:<12} {wall:>8.3f}s {cpu:>8.3f}s {rows:>12,}")
+        lines.append(f"  {'total':<12} {self.total.get('wall_s', 0):>8.3f}s {self.total.get('cpu_s', 0):>8.3f}s"
+                     f"   peak RSS {self.total.get('peak_rss_mb')} MB")
+        return "\n".join(lines)
@@ -1,4 +1,13 @@
-import math
+import time
+
+import numpy as np
+
+import anomaly
+import error_table
+import io_utils
+import perf
+import stats
+import timeaxis
 
 def validate_field(val_raw, field_name, v_range, invalid_tokens):
     
@@ -23,132 +32,419 @@ def validate_field(val_raw, field_name, v_range, invalid_tokens):
             
     return final_val, error_type
 
-def identify_gaps(timeline, found_minutes, sensor):
-    
-    missing_minutes = set(timeline) - found_minutes
-    gaps = []
-    for m_time in missing_minutes:
-        gaps.append(
-            {
-            "time": m_time,
-            "sensor": sensor,
-            "type": "UNRECIEVED",
-            "msg": "Missing data entry",
-            "raw": "N/A"
-            }
+def build_timeline(step=5, day=None):
+    # One day of slots; without a date, the labels of any day.
+    return timeaxis.TimeAxis.for_days(day or timeaxis.EPOCH.date(), step=step)
+
+ERROR_TYPES = error_table.TYPES
+FIELDS = {"temp": error_table.TEMP, "hum": error_table.HUM}
+VALID, MISSING_DATA, INVALID_DATA, SENSOR_FAULT = (
+    error_table.VALID, error_table.MISSING_DATA, error_table.INVALID_DATA, error_table.SENSOR_FAULT
+)
+
+POW10 = np.array([float(10 ** k) for k in range(23)])
+DIGIT_WEIGHTS = np.array([10 ** k for k in range(16)], dtype=np.int64)
+MAX_DIGITS = 15
+MAX_SCALE = 22
+WORDS = [sign + word for sign in (b"", b"-", b"+") for word in (b"NAN", b"INF", b"INFINITY")]
+# Bytes float() strips or accepts that the parsers below leave to it.
+SCALAR_BYTES = np.zeros(256, dtype=bool)
+SCALAR_BYTES[[9, 10, 11, 12, 13, 28, 29, 30, 31, 32, ord("_")]] = True
+SCALAR_BYTES[128:] = True
+
+def _parse_decimals(raw):
+    # Parses fixed-width byte strings of the form -?digits[.digits] one
+    # character column at a time; a row is one when its digits, dot and sign
+    # make up its whole length. With at most 15 digits the mantissa and
+    # 10**k are exact, so one division gives the same double as float().
+    n, width = len(raw), raw.dtype.itemsize
+    if not n or not width:
+        return np.full(n, np.nan), np.zeros(n, dtype=bool)
+
+    columns = np.ascontiguousarray(raw.view(np.uint8).reshape(n, width).T)
+    neg = columns[0] == ord("-")
+    mantissa = np.zeros(n, dtype=np.int16 if width <= 4 else np.int32 if width <= 9 else np.int64)
+    n_digits = np.zeros(n, dtype=np.int8)
+    n_dots = np.zeros(n, dtype=np.int8)
+    dot_at = np.zeros(n, dtype=np.int8)
+
+    for j, c in enumerate(columns):
+        d = c - np.uint8(ord("0"))
+        digit = d < 10
+        dot = c == ord(".")
+        mantissa = np.where(digit, mantissa * 10 + d, mantissa)
+        n_digits += digit
+        n_dots += dot
+        if j:
+            dot_at += dot * np.int8(j)
+
+    length = np.char.str_len(raw)
+    ok = (n_digits + n_dots + neg == length) & (n_dots <= 1) & (n_digits > 0) & (n_digits <= MAX_DIGITS)
+    n_frac = np.where(n_dots > 0, length - 1 - dot_at, 0)
+    values = mantissa / POW10[np.minimum(n_frac, MAX_DIGITS)]
+    values = np.where(neg, -values, values)
+    values[~ok] = np.nan
+    return values, ok
+
+def _upper(raw):
+    chars = raw.view(np.uint8)
+    return np.where((chars >= ord("a")) & (chars <= ord("z")), chars - 32, chars).view(raw.dtype)
+
+def _parse_numbers(raw):
+    # The rest of float()'s grammar for the few rows _parse_decimals turns
+    # down: a "+" sign, an exponent, nan/inf/infinity. Returns the values,
+    # the rows that are numbers and the rows only float() can tell
+    # (whitespace, "_", non-ASCII, too many digits or too large a scale).
+    n, width = len(raw), raw.dtype.itemsize
+    if not n or not width:
+        return np.full(n, np.nan), np.zeros(n, dtype=bool), np.zeros(n, dtype=bool)
+
+    chars = raw.view(np.uint8).reshape(n, width)
+    upper = _upper(raw)
+    digit = (chars >= ord("0")) & (chars <= ord("9"))
+    dot = chars == ord(".")
+    exp = upper.view(np.uint8).reshape(n, width) == ord("E")
+    pad = chars == 0
+    sign = (chars == ord("-")) | (chars == ord("+"))
+    in_exp = np.cumsum(exp, axis=1) > 0
+    lead = np.zeros_like(exp)
+    lead[:, 0] = True
+    lead[:, 1:] = exp[:, :-1]
+    minus = (chars == ord("-")) & lead
+
+    mant = digit & ~in_exp
+    exp_digits = digit & in_exp
+    n_mant = mant.sum(axis=1)
+    n_exp = exp_digits.sum(axis=1)
+    number = (
+        ~(~(digit | dot | exp | pad | sign) | (sign & ~lead) | (dot & in_exp)).any(axis=1)
+        & ~(pad[:, :-1] & ~pad[:, 1:]).any(axis=1)
+        & (exp.sum(axis=1) <= 1) & (dot.sum(axis=1) <= 1) & (n_mant > 0) & (in_exp.any(axis=1) <= (n_exp > 0))
+    )
+
+    # Every digit is weighted by the digits to its right in its own part.
+    right = np.cumsum(mant[:, ::-1], axis=1)[:, ::-1] - mant
+    mantissa = np.where(mant, (chars - ord("0")) * DIGIT_WEIGHTS[np.minimum(right, MAX_DIGITS)], 0).sum(axis=1)
+    right = np.cumsum(exp_digits[:, ::-1], axis=1)[:, ::-1] - exp_digits
+    power = np.where(exp_digits, (chars - ord("0")) * DIGIT_WEIGHTS[np.minimum(right, MAX_DIGITS)], 0).sum(axis=1)
+    power = np.where((minus & in_exp).any(axis=1), -power, power)
+    scale = power - (mant & (np.cumsum(dot, axis=1) > 0)).sum(axis=1)
+
+    scalar = SCALAR_BYTES[chars].any(axis=1)
+    scalar |= number & ((n_mant > MAX_DIGITS) | (n_exp > 3) | (np.abs(scale) > MAX_SCALE))
+    number &= ~scalar
+    factor = POW10[np.minimum(np.abs(scale), MAX_SCALE)]
+    values = np.where(scale < 0, mantissa / factor, mantissa * factor)
+    values = np.where(minus[:, 0], -values, values)
+
+    for word in WORDS:
+        match = upper == word
+        values[match] = np.nan if word.endswith(b"NAN") else -np.inf if word.startswith(b"-") else np.inf
+        number |= match
+    values[~number] = np.nan
+    return values, number, scalar
+
+def _validate_array(raw, v_range, invalid_tokens):
+
+    # raw is a fixed-width ASCII bytes array. Plain decimals have no letters
+    # and the rest is upper-cased byte-wise, which is str.upper() for ASCII.
+    nums, parsed = _parse_decimals(raw)
+    codes = np.zeros(len(raw), dtype=np.int8)
+    values = np.full(len(raw), np.nan)
+    empty = raw == b""
+    codes[empty] = MISSING_DATA
+    tokens = [t.encode() for t in invalid_tokens if t.isascii()]
+    for token in tokens:
+        if not token.translate(None, b"-.0123456789"):
+            codes[parsed & (raw == token)] = INVALID_DATA
+
+    others = np.flatnonzero(~parsed & ~empty)
+    upper = _upper(raw[others])
+    for token in tokens:
+        codes[others[upper == token]] = INVALID_DATA
+    others = others[codes[others] == VALID]
+    o_nums, o_number, o_scalar = _parse_numbers(raw[others])
+    codes[others[~o_number & ~o_scalar]] = INVALID_DATA
+    nums[others[o_number]] = o_nums[o_number]
+    parsed[others[o_number]] = True
+
+    checked = (codes == VALID) & parsed
+    in_range = checked & (nums >= v_range[0]) & (nums <= v_range[1])
+    codes[checked & ~in_range] = SENSOR_FAULT
+    values[in_range] = nums[in_range]
+
+    for i in others[o_scalar].tolist():
+        final_val, error_type = validate_field(raw[i].decode(), None, v_range, invalid_tokens)
+        codes[i] = ERROR_TYPES.index(error_type)
+        in_range[i] = error_type is None
+        values[i] = final_val if error_type is None else np.nan
+    return values, in_range, codes
+
+def _ascii_column(fields):
+    # One fixed-width bytes array for str fields, gathered from a single
+    # joined buffer rather than encoded field by field; None when a field is
+    # non-ASCII, longer than io_utils.FIELD_BYTES or holds NUL or a newline.
+    joined = "\n".join(fields)
+    if not joined.isascii() or "\x00" in joined:
+        return None
+    buf = np.frombuffer(joined.encode("ascii"), dtype=np.uint8)
+    breaks = np.flatnonzero(buf == ord("\n"))
+    if len(breaks) != max(len(fields) - 1, 0):
+        return None
+    starts = np.concatenate([[0], breaks + 1])[:len(fields)]
+    ends = np.append(breaks, len(buf))[:len(fields)]
+    if (ends - starts).max(initial=0) > io_utils.FIELD_BYTES:
+        return None
+    return io_utils.gather(buf, starts, ends)
+
+def validate_column(raw_values, v_range, invalid_tokens):
+
+    # Bytes arrays from the mmap parser are validated as they are. Fields
+    # that are non-ASCII, longer than io_utils.FIELD_BYTES (one garbage
+    # field would widen the array of every other one) or hold NUL or a
+    # newline go through validate_field instead.
+    if isinstance(raw_values, np.ndarray):
+        if raw_values.dtype.kind == "S" and raw_values.dtype.itemsize <= io_utils.FIELD_BYTES:
+            return _validate_array(raw_values, v_range, invalid_tokens)
+        raw_values = [v.decode("utf-8", "replace") if isinstance(v, bytes) else v for v in raw_values.tolist()]
+    raw = _ascii_column(raw_values)
+    if raw is not None:
+        return _validate_array(raw, v_range, invalid_tokens)
+
+    scalar = [
+        i for i, v in enumerate(raw_values)
+        if len(v) > io_utils.FIELD_BYTES or not v.isascii() or "\x00" in v or "\n" in v
+    ]
+    fields = [raw_values[i] for i in scalar]
+    raw_values = list(raw_values)
+    for i in scalar:
+        raw_values[i] = ""
+    values, in_range, codes = _validate_array(_ascii_column(raw_values), v_range, invalid_tokens)
+    for i, val_raw in zip(scalar, fields):
+        final_val, error_type = validate_field(val_raw, None, v_range, invalid_tokens)
+        codes[i] = ERROR_TYPES.index(error_type)
+        in_range[i] = error_type is None
+        values[i] = final_val if error_type is None else np.nan
+    return values, in_range, codes
+
+def _timestamp_slots(axis, dates, times):
+    # A field past io_utils.FIELD_BYTES or holding NUL is no timestamp; it
+    # goes in as "-" so it cannot widen the arrays or lose its NULs.
+    def raw(fields):
+        return np.array([f.encode() if len(f) <= io_utils.FIELD_BYTES and "\x00" not in f else b"-"
+                         for f in fields], dtype=bytes)
+    seconds, ok = timeaxis.parse_timestamps(raw(dates), raw(times))
+    return axis.slots(seconds, ok)
+
+def _split_rows(chunk, axis):
+
+    # Sorts iter_chunks rows into readings on a known slot and lines that
+    # are errors as a whole (Format, Timeline).
+    if not chunk:
+        empty = np.zeros(0, dtype=np.int64)
+        return (empty, empty, [], []), (empty, empty, empty)
+    n_slots = len(axis)
+    rows = [([], [], [], [], [], []), ([], [], [], [], [], [])]
+    for offset, _, parts in chunk:
+        complete = len(parts) == 4
+        date_v, time_v, t_raw, h_raw = parts if complete else (parts + ["", ""])[:2] + ["", ""]
+        for column, value in zip(rows[complete], (offset, date_v, time_v, t_raw, h_raw, len(parts))):
+            column.append(value)
+
+    (f_offsets, f_dates, f_times, _, _, f_counts), (offsets, dates, times, t_raws, h_raws, _) = rows
+    f_slots = _timestamp_slots(axis, f_dates, f_times)
+    f_slots = np.where((f_slots >= 0) & (np.array(f_counts) > 1), f_slots, n_slots)
+    slots = _timestamp_slots(axis, dates, times)
+    known = slots >= 0
+    unknown = np.flatnonzero(~known)
+
+    good = (slots[known], np.array(offsets, dtype=np.int64)[known],
+            [t for t, k in zip(t_raws, known) if k], [h for h, k in zip(h_raws, known) if k])
+    bad = (
+        np.concatenate([f_slots, np.full(len(unknown), n_slots)]),
+        np.concatenate([np.full(len(f_slots), error_table.FORMAT), np.full(len(unknown), error_table.TIMELINE)]),
+        np.concatenate([f_offsets, np.array(offsets, dtype=np.int64)[unknown]])
+    )
+    return good, bad
+
+def _validate_rows(slots, offsets, t_raws, h_raws, temp_range, hum_range, invalid_tokens):
+    t_vals, _, t_codes = validate_column(t_raws, temp_range, invalid_tokens)
+    h_vals, _, h_codes = validate_column(h_raws, hum_range, invalid_tokens)
+    return np.asarray(slots, dtype=np.int64), np.asarray(offsets, dtype=np.int64), t_vals, t_codes, h_vals, h_codes
+
+def _store_rows(parts, bad, columns, presence, errors, lines=None):
+
+    # parts are validated row groups; together they are put back in file
+    # order so errors follow the lines and the last duplicate wins.
+    slots, offsets, t_vals, t_codes, h_vals, h_codes = (np.concatenate(c) for c in zip(*parts))
+    if len(parts) > 1:
+        order = np.argsort(offsets, kind="stable")
+        slots, offsets, t_vals, t_codes, h_vals, h_codes = (
+            a[order] for a in (slots, offsets, t_vals, t_codes, h_vals, h_codes)
         )
-    return gaps
 
-def get_average(values):
-    valid_vals = [v for v in values if isinstance(v, (int, float))]
-    return round(sum(valid_vals) / len(valid_vals), 2) if valid_vals else "N/A"
+    t_rows = np.flatnonzero(t_codes)
+    h_rows = np.flatnonzero(h_codes)
+    rows = np.concatenate([t_rows, h_rows])
+
+    # Records go out in line order, Temp before Hum for the same line.
+    err_offsets = np.concatenate([bad[2], offsets[rows]]).astype(np.int64)
+    order = np.argsort(err_offsets, kind="stable")
+    errors.append((
+        np.concatenate([bad[0], slots[rows]])[order],
+        np.concatenate([bad[1], t_codes[t_rows], h_codes[h_rows]])[order],
+        np.concatenate([
+            np.full(len(bad[0]), error_table.NO_FIELD),
+            np.full(len(t_rows), error_table.TEMP),
+            np.full(len(h_rows), error_table.HUM)
+        ])[order],
+        err_offsets[order]
+    ))
+
+    # A repeated timestamp overwrites the earlier reading, so keep the last
+    # row per slot.
+    _, last = np.unique(slots[::-1], return_index=True)
+    keep = len(slots) - 1 - last
+
+    presence[slots] = True
+    columns["temp"][slots[keep]] = t_vals[keep]
+    columns["hum"][slots[keep]] = h_vals[keep]
+    if lines is not None:
+        lines[slots[keep]] = offsets[keep]
+
+def _ingest_chunk(chunk, axis, temp_range, hum_range, invalid_tokens, columns, presence, errors, lines=None):
+    good, bad = _split_rows(chunk, axis)
+    parts = [_validate_rows(*good, temp_range, hum_range, invalid_tokens)]
+    _store_rows(parts, bad, columns, presence, errors, lines)
+
+def _ingest_block(block, axis, temp_range, hum_range, invalid_tokens, columns, presence, errors, lines=None):
+
+    # Only the fields of lines that fail validation ever become str objects,
+    # when the error log is written.
+    offsets, dates, times, temps, hums, rows = block
+    slots = axis.slots(*timeaxis.parse_timestamps(dates, times))
+    known = slots >= 0
+
+    good, bad = _split_rows(rows, axis)
+    bad_offsets = offsets[~known]
+    bad = (
+        np.concatenate([bad[0], np.full(len(bad_offsets), len(axis))]),
+        np.concatenate([bad[1], np.full(len(bad_offsets), error_table.TIMELINE)]),
+        np.concatenate([bad[2], bad_offsets])
+    )
+
+    parts = [_validate_rows(slots[known], offsets[known], temps[known], hums[known], temp_range, hum_range, invalid_tokens)]
+    if len(good[0]):
+        parts.append(_validate_rows(*good, temp_range, hum_range, invalid_tokens))
+    _store_rows(parts, bad, columns, presence, errors, lines)
 
-def get_std(data, avg):
-    if len(data) < 2:
-        return 0
-    variance = sum((x - avg) ** 2 for x in data) / len(data)
-    return math.sqrt(variance)
+def flag_anomalies(columns, lines, step, limits=anomaly.LIMITS):
 
-def statistics(normalized_data, sensor_names):
+    # Readings the rolling-window detector flags become errors of their
+    # field and leave the columns, as readings failing validation do.
+    # lines holds the offset of the line behind every slot.
+    parts = []
+    for field, codes in anomaly.detect_columns(columns, step, limits).items():
+        slots = np.flatnonzero(codes)
+        columns[field][slots] = np.nan
+        parts.append((slots, codes[slots], np.full(len(slots), FIELDS[field]), lines[slots]))
+    return parts
 
-    sensors_summary = {}
-    city_summary = {
-        "temps": [],
-        "hums": []
+PARSERS = ("mmap", "lines")
+
+def ingest_file(path, sensor, axis, temp_range, hum_range, invalid_tokens, chunk_size=io_utils.CHUNK_ROWS, keep_values=False, parser="mmap", counters=None, anomaly_limits=None):
+
+    # Readings are placed on the slots of axis by their Date and Time; rows
+    # outside it are Timeline errors. Memory is bounded by the slot arrays
+    # plus one chunk of rows (or one block of the mapped file), however
+    # large the file is. A counters dict gets the data rows read and the
+    # seconds spent splitting them (parse_s), validating and storing them
+    # (validate_s) and summarising the columns (stats_s). With
+    # anomaly_limits, readings flagged by anomaly.detect are taken out
+    # before the columns are summarised.
+    start = time.perf_counter()
+    n_slots = len(axis)
+    presence = np.zeros(n_slots, dtype=bool)
+    columns = {
+        "temp": np.full(n_slots, np.nan, dtype=np.float32),
+        "hum": np.full(n_slots, np.nan, dtype=np.float32)
     }
+    errors = []
+    lines = None if anomaly_limits is None else np.full(n_slots, error_table.NO_OFFSET, dtype=np.int64)
+
+    if parser == "mmap":
+        blocks = io_utils.iter_blocks(path)
+        if counters is not None:
+            blocks = perf.timed(blocks, counters, lambda block: len(block[0]) + len(block[5]))
+        for block in blocks:
+            _ingest_block(block, axis, temp_range, hum_range, invalid_tokens, columns, presence, errors, lines)
+    else:
+        chunks = io_utils.iter_chunks(path, chunk_size)
+        if counters is not None:
+            chunks = perf.timed(chunks, counters)
+        for chunk in chunks:
+            _ingest_chunk(chunk, axis, temp_range, hum_range, invalid_tokens, columns, presence, errors, lines)
+    if anomaly_limits is not None:
+        errors.extend(flag_anomalies(columns, lines, axis.step, anomaly_limits))
+
+    stats_start = time.perf_counter()
+    sensor_stats = stats.SensorStats.from_columns(columns["temp"], columns["hum"], axis, keep_values)
+    if counters is not None:
+        counters.setdefault("rows", 0)
+        counters["parse_s"] = round(counters.get("parse_s", 0.0), 4)
+        counters["validate_s"] = round(stats_start - start - counters["parse_s"], 4)
+        counters["stats_s"] = round(time.perf_counter() - stats_start, 4)
+    return columns, presence, error_table.ErrorTable.for_sensor(sensor, path, errors), sensor_stats
+
+def gap_runs(presence):
+    # First and last slot of every run of missing slots, from the edges of
+    # the padded presence bitmap.
+    missing = ~np.asarray(presence, dtype=bool)
+    edges = np.diff(np.concatenate([[0], missing.view(np.int8), [0]]))
+    return np.flatnonzero(edges == 1), np.flatnonzero(edges == -1) - 1
+
+def identify_gaps(axis, presence, sensor):
 
-    for s in sensor_names:
-
-        temps = []
-        hums = []
-        active_times = []
-
-        for t, row in normalized_data.items():
-            temp = row[s]["temp"]
-            hum = row[s]["hum"]
-
-            valid = False
-
-            if isinstance(temp, float):
-                temps.append(temp)
-                valid = True
-
-            if isinstance(hum, float):
-                hums.append(hum)
-                valid = True
-
-            if valid:
-                active_times.append(t)
-
-        city_summary["temps"].extend(temps)
-        city_summary["hums"].extend(hums)
-
-        t_avg = sum(temps) / len(temps) if temps else None
-        h_avg = sum(hums) / len(hums) if hums else None
-
-        sensors_summary[s] = {
-            "temperature": {
-                "values": temps,
-                "avg": round(t_avg, 2) if t_avg is not None else None,
-                "min": min(temps) if temps else None,
-                "max": max(temps) if temps else None,
-                "std": round(get_std(temps, t_avg), 2) if t_avg is not None else None,
-                "valid_count": len(temps)
-            },
-            "humidity": {
-                "values": hums,
-                "avg": round(h_avg, 2) if h_avg is not None else None,
-                "min": min(hums) if hums else None,
-                "max": max(hums) if hums else None,
-                "std": round(get_std(hums, h_avg), 2) if h_avg is not None else None,
-                "valid_count": len(hums)
-            },
-            "activity": {
-                "active_count": len(active_times),
-                "start_time": min(active_times) if active_times else None,
-                "end_time": max(active_times) if active_times else None
-            }
+    starts, ends = gap_runs(presence)
+    return [
+        {
+            "sensor": sensor,
+            "start": start_label,
+            "end": end_label,
+            "slots": last - first + 1,
+            "seconds": (last - first + 1) * axis.step
         }
+        for first, last, start_label, end_label in zip(
+            starts.tolist(), ends.tolist(), axis.labels(starts), axis.labels(ends)
+        )
+    ]
 
-    temps = city_summary["temps"]
-    hums = city_summary["hums"]
+def uptime_summary(presence, gaps):
+    received = int(np.count_nonzero(presence))
+    return {
+        "received": received,
+        "slots": len(presence),
+        "uptime": round(100 * received / len(presence), 2) if len(presence) else None,
+        "gaps": len(gaps),
+        "longest_gap": max((g["seconds"] for g in gaps), default=0)
+    }
 
-    city_summary.update({
-        "avg_temp": round(sum(temps) / len(temps), 2) if temps else None,
-        "min_temp": min(temps) if temps else None,
-        "max_temp": max(temps) if temps else None,
-        "avg_hum": round(sum(hums) / len(hums), 2) if hums else None,
-        "min_hum": min(hums) if hums else None,
-        "max_hum": max(hums) if hums else None,
-        "total_temp_records": len(temps),
-        "total_hum_records": len(hums)
-    })
+def statistics(normalized_data, sensor_names, sensor_stats=None, keep_values=False):
 
-    return city_summary, sensors_summary
+    # sensor_stats are the accumulators ingest_file already built; without
+    # them each sensor column is summarised once from the store.
+    if sensor_stats is None:
+        sensor_stats = {
+            s: stats.SensorStats.from_columns(
+                normalized_data.temp[:, normalized_data.sensor_index[s]],
+                normalized_data.hum[:, normalized_data.sensor_index[s]],
+                normalized_data.timeline,
+                keep_values
+            )
+            for s in sensor_names
+        }
 
+    sensors_summary = {s: sensor_stats[s].summary() for s in sensor_names}
+    city_summary = stats.city_summary([sensor_stats[s] for s in sensor_names], keep_values)
 
-def aggregate_data(data, sensor_names, level="minutely"):
-    new_data = {}
-    
-    if level == "minutely":
-        time_keys = [f"{h:02d}:{m:02d}" for h in range(24) for m in range(60)]
-        for tk in time_keys:
-            new_data[tk] = {}
-            for s in sensor_names:
-                samples = [data[f"{tk}:{sec:02d}"][s] for sec in range(0, 60, 5)]
-                new_data[tk][s] = {
-                    "temp": get_average([samp["temp"] for samp in samples]),
-                    "hum":  get_average([samp["hum"] for samp in samples])
-                }
-                
-    elif level == "hourly":
-        time_keys = [f"{h:02d}" for h in range(24)]
-        for tk in time_keys:
-            new_data[tk] = {}
-            for s in sensor_names:
-                samples = [data[f"{tk}:{m:02d}"][s] for m in range(60)]
-                new_data[tk][s] = {
-                    "temp": get_average([samp["temp"] for samp in samples]),
-                    "hum":  get_average([samp["hum"] for samp in samples])
-                }
-    return new_data
\ No newline at end of file
+    return city_summary, sensors_summary
@@ -0,0 +1,239 @@
+import argparse
+import datetime as dt
+import json
+import os
+import re
+
+import numpy as np
+
+import store
+import timeaxis
+
+PROCESSED_DIR = "data/processed"
+INDEX_DIRNAME = "index"
+META_NAME = "meta.json"
+INDEX_VERSION = 1
+SLOTS = "slots"
+AGGREGATES = ("count", "total", "low", "high")
+FILLED = "filled"
+CLOCK = re.compile(r"^\d{1,2}:\d{2}(:\d{2})?$")
+
+def _save(path, values):
+    # Swapped in whole, so a reader never maps a half written column.
+    tmp_path = path + ".tmp.npy"
+    np.save(tmp_path, np.ascontiguousarray(values))
+    os.replace(tmp_path, path)
+
+def _level_columns(level):
+    columns = {f"{field}_{agg}": getattr(level, agg)[field] for field in store.FIELDS for agg in AGGREGATES}
+    if level.filled is not None:
+        columns.update({f"{field}_{FILLED}": level.filled[field] for field in store.FIELDS})
+    return columns
+
+def _write_levels(index_dir, meta, levels):
+    for name, (axis, columns) in levels.items():
+        os.makedirs(os.path.join(index_dir, name), exist_ok=True)
+        for column, values in columns.items():
+            _save(os.path.join(index_dir, name, f"{column}.npy"), values)
+        meta["levels"][name] = {
+            "start": axis.start, "step": axis.step, "n_slots": len(axis), "key_len": axis.key_len,
+            "columns": list(columns)
+        }
+
+    meta_path = os.path.join(index_dir, META_NAME)
+    with open(meta_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=1)
+    os.replace(meta_path + ".tmp", meta_path)
+    return meta_path
+
+def write_index(output_dir, data, rolled=None):
+
+    # One directory of .npy columns per level, (slot x sensor) as in the
+    # store. Roll-up levels keep count, sum, min and max, so bucket reads
+    # give exactly the data_<level> values.
+    levels = {SLOTS: (data.timeline, {field: getattr(data, field) for field in store.FIELDS})}
+    levels.update({name: (level.axis, _level_columns(level)) for name, level in (rolled or {}).items()})
+    meta = {"version": INDEX_VERSION, "sensors": list(data.sensors), "levels": {}}
+    return _write_levels(os.path.join(output_dir, INDEX_DIRNAME), meta, levels)
+
+def add_levels(output_dir, rolled):
+    # Adds roll-up levels to an existing index, replacing ones of the same
+    # name and keeping the others.
+    index_dir = os.path.join(output_dir, INDEX_DIRNAME)
+    with open(os.path.join(index_dir, META_NAME), "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    return _write_levels(index_dir, meta, {name: (level.axis, _level_columns(level)) for name, level in rolled.items()})
+
+def _seconds(when):
+    return int(when) if isinstance(when, (int, np.integer)) else timeaxis.to_seconds(when)
+
+def _or_none(values):
+    return [None if v != v else v for v in values.tolist()]
+
+class DayIndex:
+    """The index of one output directory, read by (sensor, epoch second);
+    columns are memory-mapped on first use, ranges exclude their end."""
+
+    def __init__(self, output_dir):
+        self.output_dir = str(output_dir)
+        self.index_dir = os.path.join(self.output_dir, INDEX_DIRNAME)
+        with open(os.path.join(self.index_dir, META_NAME), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("version") != INDEX_VERSION:
+            raise ValueError(f"{self.index_dir}: index version {meta.get('version')}, expected {INDEX_VERSION}")
+        self.sensors = meta["sensors"]
+        self.sensor_index = {s: col for col, s in enumerate(self.sensors)}
+        self.axes = {
+            name: timeaxis.TimeAxis(level["start"], level["n_slots"], level["step"], level["key_len"])
+            for name, level in meta["levels"].items()
+        }
+        self._columns = {}
+        self._names = {name: set(level["columns"]) for name, level in meta["levels"].items()}
+
+    @property
+    def axis(self):
+        return self.axes[SLOTS]
+
+    @property
+    def filled(self):
+        # Whether the roll-ups were built from gap-filled data.
+        return any(column.endswith(f"_{FILLED}") for columns in self._names.values() for column in columns)
+
+    @property
+    def levels(self):
+        return [name for name in self.axes if name != SLOTS]
+
+    def column(self, level, name):
+        key = (level, name)
+        if key not in self._columns:
+            self._columns[key] = np.load(os.path.join(self.index_dir, level, f"{name}.npy"), mmap_mode="r")
+        return self._columns[key]
+
+    def _col(self, sensor):
+        if sensor not in self.sensor_index:
+            raise KeyError(f"{sensor} is not in {self.output_dir}")
+        return self.sensor_index[sensor]
+
+    def _axis(self, level):
+        if level not in self.axes:
+            raise KeyError(f"No {level} level in {self.output_dir}; it has {', '.join(self.axes)}")
+        return self.axes[level]
+
+    def _rows(self, axis, start, end):
+        # Slots of axis that overlap [start, end).
+        first = min(max((_seconds(start) - axis.start) // axis.step, 0), len(axis))
+        last = min(max(-(-(_seconds(end) - axis.start) // axis.step), first), len(axis))
+        return first, last
+
+    def range(self, sensor, start, end):
+        col = self._col(sensor)
+        first, last = self._rows(self.axis, start, end)
+        result = {"time": self.axis.labels(np.arange(first, last))}
+        for field in store.FIELDS:
+            result[field] = store.to_float64(self.column(SLOTS, field)[first:last, col])
+        return result
+
+    def point(self, sensor, when):
+        # The slot holding when, or None outside the axis.
+        col = self._col(sensor)
+        slot = (_seconds(when) - self.axis.start) // self.axis.step
+        if not 0 <= slot < len(self.axis):
+            return None
+        reading = {"time": self.axis[slot]}
+        for field in store.FIELDS:
+            reading[field] = _or_none(store.to_float64(self.column(SLOTS, field)[slot:slot + 1, col]))[0]
+        return reading
+
+    def buckets(self, sensor, level, start, end):
+        # Mean, count, min and max per bucket, NaN for buckets without
+        # readings, and the fill rate on levels of gap-filled data.
+        col = self._col(sensor)
+        axis = self._axis(level)
+        first, last = self._rows(axis, start, end)
+        result = {"time": axis.labels(np.arange(first, last))}
+        for field in store.FIELDS:
+            count, total, low, high = (
+                np.asarray(self.column(level, f"{field}_{agg}")[first:last, col]) for agg in AGGREGATES
+            )
+            with np.errstate(invalid="ignore", divide="ignore"):
+                result[field] = store.round_values(total / count)
+            result[f"{field}_count"] = count
+            result[f"{field}_min"] = np.where(count > 0, low, np.nan)
+            result[f"{field}_max"] = np.where(count > 0, high, np.nan)
+            if f"{field}_{FILLED}" in self._names[level]:
+                filled = np.asarray(self.column(level, f"{field}_{FILLED}")[first:last, col])
+                with np.errstate(invalid="ignore", divide="ignore"):
+                    result[f"{field}_fill_rate"] = np.where(count > 0, filled / count, np.nan)
+        return result
+
+def find_index(processed_dir=PROCESSED_DIR, day=None):
+
+    # The output directory for day: processed_dir/DAYxx from a batch run,
+    # processed_dir/YYYY-MM-DD from watch mode, or processed_dir itself.
+    date = dt.date.fromisoformat(day) if day is not None and "-" in day else None
+    name = None if day is None else date.isoformat() if date else f"DAY{int(day):02d}"
+    candidates = [processed_dir] if day is None else [os.path.join(processed_dir, name), processed_dir]
+    for path in candidates:
+        if not os.path.exists(os.path.join(path, INDEX_DIRNAME, META_NAME)):
+            continue
+        index = DayIndex(path)
+        start = timeaxis.from_seconds(index.axis.start).date()
+        if day is None or path != processed_dir or (start == date if date else start.day == int(day)):
+            return index
+    where = processed_dir if day is None else f"{name} under {processed_dir}"
+    raise FileNotFoundError(f"No index for {where}; run main.py to write one")
+
+def parse_when(text, axis):
+    # "HH:MM[:SS]" on the first day of axis, or an ISO date/time.
+    text = text.strip()
+    if CLOCK.match(text):
+        hours, minutes, *seconds = (int(part) for part in text.split(":"))
+        day_start = axis.start - axis.start % timeaxis.DAY_SECONDS
+        return day_start + hours * 3600 + minutes * 60 + (seconds[0] if seconds else 0)
+    return timeaxis.to_seconds(dt.datetime.fromisoformat(text))
+
+def _cell(value):
+    return "N/A" if value != value else f"{value:.2f}" if isinstance(value, float) else str(value)
+
+def format_table(columns):
+    names = list(columns)
+    rows = [[_cell(v) for v in values] for values in zip(*(np.asarray(columns[n]).tolist() for n in names))]
+    widths = [max([len(n)] + [len(row[i]) for row in rows]) for i, n in enumerate(names)]
+    lines = [" | ".join(n.ljust(w) for n, w in zip(names, widths))]
+    lines.append("-" * len(lines[0]))
+    lines.extend(" | ".join(cell.ljust(w) for cell, w in zip(row, widths)) for row in rows)
+    return "\n".join(lines)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Read readings and roll-ups from the index main.py writes.")
+    parser.add_argument("sensor", help="sensor, e.g. SENSOR04 or 4")
+    parser.add_argument("--day", default=None, help="day of a batch run, e.g. 07 for DAY07, or the date of a watched day, "
+                                                              "e.g. 2024-09-02 (default: the directory itself)")
+    parser.add_argument("--at", default=None, help="point lookup: HH:MM[:SS] on the day, or an ISO date/time")
+    parser.add_argument("--start", default=None, help="start of the range, included (default: start of the index)")
+    parser.add_argument("--end", default=None, help="end of the range, excluded (default: end of the index)")
+    parser.add_argument("--level", default=SLOTS,
+                        help=f"{SLOTS} for raw readings or a roll-up level, e.g. minutely (default: {SLOTS})")
+    parser.add_argument("--processed-dir", default=PROCESSED_DIR)
+    args = parser.parse_args(argv)
+
+    sensor = f"SENSOR{int(args.sensor):02d}" if args.sensor.isdigit() else args.sensor.upper()
+    try:
+        index = find_index(args.processed_dir, args.day)
+        if args.at:
+            reading = index.point(sensor, parse_when(args.at, index.axis))
+            print(format_table({k: [v if v is not None else np.nan] for k, v in reading.items()})
+                  if reading else f"{args.at} is outside {index.output_dir}")
+            return
+        start = parse_when(args.start, index.axis) if args.start else index.axis.start
+        end = parse_when(args.end, index.axis) if args.end else index.axis.end
+        if args.level == SLOTS:
+            columns = index.range(sensor, start, end)
+        else:
+            columns = index.buckets(sensor, args.level, start, end)
+    except (FileNotFoundError, KeyError, ValueError) as e:
+        raise SystemExit(str(e).strip("'\""))
+    print(format_table(columns))
+
+if __name__ == "__main__":
+    main()
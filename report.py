@@ -1,52 +1,202 @@
+import importlib.util
 import json
+import os
 from datetime import datetime
 
-def generate_error_log(sorted_errors, output_path):
-    
-    log_file = open(output_path, "w", encoding="utf-8")
-    
-    log_file.write("=== SENSOR ERROR & GAP REPORT TABLE ===\n\n")
-    header = f"{'Time':<8} | {'Sensor':<10} | {'Error Type':<15} | {'Reason/Message':<22} | {'Raw Content'}\n"
-    log_file.write(header + "-"*len(header) + "\n")
-    
-    last_time = None
-    for err in sorted_errors:
-        display_time = "" if err['time'] == last_time else err['time']
-        log_file.write(
-            f"{display_time:<8} | {err['sensor']:<10} | "
-            f"{err['type']:<15} | {err['msg']:<22} | {err['raw']}\n"
-        )
-        last_time = err['time']
+import numpy as np
+
+import store
+
+# pyarrow takes longer to import than the rest of the pipeline, so it is
+# only imported once parquet is written.
+HAS_PYARROW = importlib.util.find_spec("pyarrow") is not None
+
+WRITE_BUFFER = 1 << 20
+BLOCK_ROWS = 8192
+
+def open_report(output_path):
+    return open(output_path, "w", encoding="utf-8", buffering=WRITE_BUFFER)
+
+
+class ErrorLogWriter:
+    """errors.log writer that can be fed a batch of error records at a time.
+
+    write() takes dict records, e.g. ErrorTable.records(timeline).
+    time_width is the width of the time columns; multi-day labels carry
+    the date and need more than the 8 characters of "HH:MM:SS".
+
+    Rows are formatted a block at a time and handed to a 1 MB buffered
+    handle, so the log can also be streamed while files are being ingested.
+    """
+
+    def __init__(self, output_path, time_width=8):
+        self.output_path = output_path
+        self.time_width = time_width
+        self.last_time = None
+        self.file = None
+
+    def __enter__(self):
+        self.file = open_report(self.output_path)
+        self.file.write("=== SENSOR ERROR & GAP REPORT TABLE ===\n\n")
+        header = f"{'Time':<{self.time_width}} | {'Sensor':<10} | {'Error Type':<15} | {'Reason/Message':<22} | {'Raw Content'}\n"
+        self.file.write(header + "-"*len(header) + "\n")
+        return self
+
+    def __exit__(self, *exc):
+        self.file.close()
+
+    def write(self, errors):
+        last_time = self.last_time
+        width = self.time_width
+        rows = []
+        for err in errors:
+            display_time = "" if err['time'] == last_time else err['time']
+            rows.append(
+                f"{display_time:<{width}} | {err['sensor']:<10} | "
+                f"{err['type']:<15} | {err['msg']:<22} | {err['raw']}\n"
+            )
+            last_time = err['time']
+            if len(rows) >= BLOCK_ROWS:
+                self.file.write("".join(rows))
+                rows = []
+        self.file.write("".join(rows))
+        self.last_time = last_time
+
+
+    def write_gaps(self, gaps, uptime):
+        # One row per run of missing slots, then one uptime row per sensor.
+        self.file.write("\n=== GAP INTERVALS ===\n\n")
+        width = self.time_width
+        header = f"{'Sensor':<10} | {'Start':<{width}} | {'End':<{width}} | {'Slots':>6} | {'Duration'}\n"
+        rows = [header, "-"*len(header) + "\n"]
+        for gap in gaps:
+            rows.append(
+                f"{gap['sensor']:<10} | {gap['start']:<{width}} | {gap['end']:<{width}} | "
+                f"{gap['slots']:>6} | {_duration(gap['seconds'])}\n"
+            )
+        self.file.write("".join(rows))
+
+        self.file.write("\n=== SENSOR UPTIME ===\n\n")
+        header = f"{'Sensor':<10} | {'Received':>8} | {'Slots':>6} | {'Uptime':>7} | {'Gaps':>5} | {'Longest gap'}\n"
+        rows = [header, "-"*len(header) + "\n"]
+        for sensor, up in uptime.items():
+            rows.append(
+                f"{sensor:<10} | {up['received']:>8} | {up['slots']:>6} | {up['uptime']:>6.2f}% | "
+                f"{up['gaps']:>5} | {_duration(up['longest_gap'])}\n"
+            )
+        self.file.write("".join(rows))
+
+
+def _duration(seconds):
+    minutes, seconds = divmod(seconds, 60)
+    return f"{minutes // 60}:{minutes % 60:02d}:{seconds:02d}"
+
+
+def time_width(timeline):
+    return max(8, len(timeline[0])) if len(timeline) else 8
+
+
+def generate_error_log(errors, timeline, output_path, gaps=(), uptime=None):
+    with ErrorLogWriter(output_path, time_width(timeline)) as log:
+        log.write(errors.sorted().records(timeline))
+        log.write_gaps(gaps, uptime or {})
+
+
+def _format_value(v):
+    return f"{v:.2f}" if isinstance(v, float) else str(v)
+
+def _data_cells(normalized_data, timeline, sensor_names, field):
+    if isinstance(normalized_data, store.SensorStore):
+        cols = [normalized_data.sensor_index[s] for s in sensor_names]
+        if timeline is normalized_data.timeline:
+            values = normalized_data.values(field)[:, cols]
+        else:
+            slots = [normalized_data.slot_index[t] for t in timeline]
+            values = normalized_data.values(field)[np.ix_(slots, cols)]
+        return [[f"{v:.2f}" if v == v else store.MISSING for v in row] for row in values.tolist()]
+    return [[_format_value(normalized_data[t][s][field]) for s in sensor_names] for t in timeline]
 
 def generate_data_log(normalized_data, timeline, sensor_names, output_path):
-    
-    data_file = open(output_path, "w", encoding="utf-8")
-    
-    data_file.write("=== CLEAN EXTRACTED DATA REPORT ===\n")
-    header = f"{'Time':<8} | {'Sensor':<10} | {'Temp':<8} | {'Humidity':<8}\n"
-    data_file.write(header + "="*len(header) + "\n")
-    
-    for t in timeline:
-        first_entry = True
-        for s in sensor_names:
-            time_col = t if first_entry else ""
-            temp = normalized_data[t][s]["temp"]
-            hum = normalized_data[t][s]["hum"]
-            t_str = f"{temp:.2f}" if isinstance(temp, float) else str(temp)
-            h_str = f"{hum:.2f}" if isinstance(hum, float) else str(hum)
-            
-            data_file.write(f"{time_col:<8} | {s:<10} | {t_str:<8} | {h_str:<8}\n")
-            first_entry = False
-        
-        data_file.write("-" * 40 + "\n")
-                
+
+    temps = _data_cells(normalized_data, timeline, sensor_names, "temp")
+    hums = _data_cells(normalized_data, timeline, sensor_names, "hum")
+    sensor_cols = [f"{s:<10}" for s in sensor_names]
+    width = time_width(timeline)
+    separator = "-" * (32 + width) + "\n"
+
+    with open_report(output_path) as data_file:
+
+        data_file.write("=== CLEAN EXTRACTED DATA REPORT ===\n")
+        header = f"{'Time':<{width}} | {'Sensor':<10} | {'Temp':<8} | {'Humidity':<8}\n"
+        data_file.write(header + "="*len(header) + "\n")
+
+        rows = []
+        for i, t in enumerate(timeline):
+            time_col = t
+            for s_col, t_str, h_str in zip(sensor_cols, temps[i], hums[i]):
+                rows.append(f"{time_col:<{width}} | {s_col} | {t_str:<8} | {h_str:<8}\n")
+                time_col = ""
+            rows.append(separator)
+            if len(rows) >= BLOCK_ROWS:
+                data_file.write("".join(rows))
+                rows = []
+        data_file.write("".join(rows))
+
 
 def generate_data_json(data_dict, output_path):
-    f = open(output_path, "w", encoding="utf-8")
-    json.dump(data_dict, f, ensure_ascii=False, indent=2)
+    if hasattr(data_dict, "to_dict"):
+        data_dict = data_dict.to_dict()
+    with open_report(output_path) as f:
+        json.dump(data_dict, f, ensure_ascii=False, indent=2)
+
+
+def generate_data_json_compact(data_dict, output_path):
+    if hasattr(data_dict, "to_dict"):
+        data_dict = data_dict.to_dict()
+    with open_report(output_path) as f:
+        json.dump(data_dict, f, ensure_ascii=False, separators=(",", ":"))
+
+
+def generate_data_npz(data, output_path):
+    # One (time x sensor) array per column; NaN marks a missing value.
+    np.savez_compressed(output_path, **data.to_columns())
+
 
+def generate_data_parquet(data, output_path):
+    if not HAS_PYARROW:
+        raise RuntimeError("Parquet output needs pyarrow, which is not installed")
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    columns = data.to_columns()
+    times, sensors = columns.pop("time"), columns.pop("sensor")
+    table = {
+        "time": np.repeat(times, len(sensors)),
+        "sensor": np.tile(sensors, len(times))
+    }
+    for name, values in columns.items():
+        table[name] = pa.array(values.ravel(), from_pandas=True)
+    pq.write_table(pa.table(table), output_path)
 
-def statistics_log(city_summary, sensors_summary, output_path):
+
+OUTPUT_FORMATS = {
+    # format: (file extension, writer)
+    "json": (".json", generate_data_json),
+    "compact": (".json", generate_data_json_compact),
+    "npz": (".npz", generate_data_npz),
+    "parquet": (".parquet", generate_data_parquet),
+}
+
+def available_formats():
+    return [fmt for fmt in OUTPUT_FORMATS if fmt != "parquet" or HAS_PYARROW]
+
+def write_data(data, output_dir, name, fmt="json"):
+    extension, writer = OUTPUT_FORMATS[fmt]
+    output_path = os.path.join(output_dir, name + extension)
+    writer(data, output_path)
+    return output_path
+
+
+def statistics_log(city_summary, sensors_summary, output_path, consensus=None):
     print("\n-----------------------------------------------------\n")
     print("                CITY WEATHER REPORT                  \n")
     
@@ -68,22 +218,63 @@ def statistics_log(city_summary, sensors_summary, output_path):
         print(f"  Humidity (%)       : avg={hum['avg']} | min={hum['min']} | max={hum['max']} | std={hum['std']}")
         print("-" * 50)
 
-    stats_file = open(output_path, "w", encoding="utf-8")
-    stats_file.write("=== CITY WEATHER STATISTICS REPORT ===\n\n")
-    stats_file.write(f"City Averages:\n")
-    stats_file.write(f"  Temperature : {city_summary.get('avg_temp', 'N/A')} °C\n")
-    stats_file.write(f"  Humidity    : {city_summary.get('avg_hum', 'N/A')} %\n")
-    stats_file.write("\n" + "=" * 60 + "\n\n")
+    lines = [
+        "=== CITY WEATHER STATISTICS REPORT ===\n\n",
+        f"City Averages:\n",
+        f"  Temperature : {city_summary.get('avg_temp', 'N/A')} °C\n",
+        f"  Humidity    : {city_summary.get('avg_hum', 'N/A')} %\n",
+        "\n" + "=" * 60 + "\n\n"
+    ]
 
     for sensor, data in sensors_summary.items():
         temp = data["temperature"]
         hum = data["humidity"]
         act = data["activity"]
 
-        stats_file.write(f"Sensor: {sensor}\n")
-        stats_file.write(f"  Active time_quantum: {act['active_count']}\n")
-        stats_file.write(f"  Time range         : {act['start_time']} → {act['end_time']}\n")
-        stats_file.write(f"  Valid records      : Temp={temp['valid_count']} | Hum={hum['valid_count']}\n")
-        stats_file.write(f"  Temperature (°C)   : avg={temp['avg']}, min={temp['min']}, max={temp['max']}, std={temp['std']}\n")
-        stats_file.write(f"  Humidity (%)       : avg={hum['avg']}, min={hum['min']}, max={hum['max']}, std={hum['std']}\n")
-        stats_file.write("-" * 50 + "\n")
\ No newline at end of file
+        lines.extend([
+            f"Sensor: {sensor}\n",
+            f"  Active time_quantum: {act['active_count']}\n",
+            f"  Time range         : {act['start_time']} → {act['end_time']}\n",
+            f"  Valid records      : Temp={temp['valid_count']} | Hum={hum['valid_count']}\n",
+            f"  Temperature (°C)   : avg={temp['avg']}, min={temp['min']}, max={temp['max']}, std={temp['std']}\n",
+            f"  Humidity (%)       : avg={hum['avg']}, min={hum['min']}, max={hum['max']}, std={hum['std']}\n",
+            "-" * 50 + "\n"
+        ])
+
+    if consensus:
+        lines.extend(_consensus_lines(consensus))
+
+    with open_report(output_path) as stats_file:
+        stats_file.write("".join(lines))
+
+
+def _cell(value, spec=".2f"):
+    return "N/A" if value is None else format(value, spec)
+
+
+def _consensus_lines(consensus):
+    # The city section of stats_report.log, from Consensus.summary().
+    lines = [
+        "\n=== CITY CONSENSUS ===\n\n",
+        f"Slots with at least {consensus['min_sensors']} sensors reporting:\n",
+    ]
+    for field, label in (("temp", "Temperature (°C)"), ("hum", "Humidity (%)")):
+        city = consensus["city"][field]
+        lines.append(
+            f"  {label:<17}: slots={city['slots']}, sensors avg={_cell(city['sensors_avg'])}, "
+            f"median avg={_cell(city['median_avg'])}, min={_cell(city['median_min'])}, max={_cell(city['median_max'])}, "
+            f"spread avg={_cell(city['spread_avg'])}, max={_cell(city['spread_max'])}\n"
+        )
+
+    header = (
+        f"{'Sensor':<10} | {'Field':<5} | {'Slots':>6} | {'Bias':>7} | {'Mean abs':>8} | "
+        f"{'Max abs':>7} | {'Avg corr':>8}\n"
+    )
+    lines.extend(["\nDeviation from the city median:\n", header, "-" * len(header) + "\n"])
+    for sensor, fields in consensus["deviation"].items():
+        for field, dev in fields.items():
+            lines.append(
+                f"{sensor:<10} | {field:<5} | {dev['slots']:>6} | {_cell(dev['bias'], '+.2f'):>7} | "
+                f"{_cell(dev['mean_abs']):>8} | {_cell(dev['max_abs']):>7} | {_cell(dev['correlation'], '.3f'):>8}\n"
+            )
+    return lines
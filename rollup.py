@@ -0,0 +1,216 @@
+import numpy as np
+
+import store
+
+LEVELS = {
+    # level: (bucket width in seconds, characters of the HH:MM:SS label
+    # kept, 0 for the date instead)
+    "minutely": (60, 5),
+    "5min": (300, 5),
+    "15min": (900, 5),
+    "hourly": (3600, 2),
+    "daily": (86400, 0),
+}
+DEFAULT_LEVELS = ("minutely", "hourly")
+
+
+def _reduce_samples(buckets):
+    # count, sum, min and max over axis 1 of (bucket, sample, sensor) values.
+    valid = ~np.isnan(buckets)
+    count = valid.sum(axis=1)
+    # Accumulate sample by sample so the float sums match sum() exactly.
+    zeroed = np.where(valid, buckets, 0.0)
+    total = np.zeros(count.shape)
+    for i in range(buckets.shape[1]):
+        total += zeroed[:, i]
+    low = np.where(valid, buckets, np.inf).min(axis=1)
+    high = np.where(valid, buckets, -np.inf).max(axis=1)
+    return count, total, low, high
+
+
+def _take_rows(values, buckets, size, lead, fill):
+    # Rows of the given buckets as (bucket, size, ...), fill outside values.
+    rows = buckets[:, None] * size + np.arange(size) - lead
+    inside = (rows >= 0) & (rows < len(values))
+    taken = values[np.clip(rows, 0, max(len(values) - 1, 0))]
+    taken[~inside] = fill
+    return taken
+
+
+def _pad(values, lead, n_rows, fill):
+    # values placed at row lead of n_rows rows, fill elsewhere.
+    if lead == 0 and len(values) == n_rows:
+        return values
+    padded = np.full((n_rows,) + values.shape[1:], fill, dtype=values.dtype)
+    padded[lead:lead + len(values)] = values
+    return padded
+
+
+class RollupLevel:
+    """count, sum, min and max per (bucket, sensor) for temp and hum.
+
+    A coarser level is derived from these four arrays alone, so raw samples
+    are only touched once for the finest level. Buckets are aligned to their
+    width on the epoch-second axis. Levels of gap-filled data also keep
+    filled, how many of the counted samples were imputed.
+    """
+
+    def __init__(self, name, axis, sensors, count, total, low, high, filled=None):
+        self.name = name
+        self.axis = axis
+        self.width = axis.step
+        self.labels = list(axis)
+        self.sensors = list(sensors)
+        self.count = count
+        self.total = total
+        self.low = low
+        self.high = high
+        self.filled = filled
+
+    @classmethod
+    def from_samples(cls, name, width, data, key_len, imputed=None):
+        axis = data.timeline.resample(width, key_len)
+        size = width // data.timeline.step
+        lead = (data.timeline.start - axis.start) // data.timeline.step
+        count, total, low, high = {}, {}, {}, {}
+        for field in store.FIELDS:
+            values = _pad(data.values(field), lead, len(axis) * size, np.nan)
+            buckets = values.reshape(-1, size, len(data.sensors))
+            count[field], total[field], low[field], high[field] = _reduce_samples(buckets)
+        filled = None
+        if imputed is not None:
+            filled = {
+                field: _pad(mask, lead, len(axis) * size, False).reshape(-1, size, len(data.sensors)).sum(axis=1)
+                for field, mask in imputed.items()
+            }
+        return cls(name, axis, data.sensors, count, total, low, high, filled)
+
+    def coarsen(self, name, width, key_len):
+        axis = self.axis.resample(width, key_len)
+        factor = width // self.width
+        lead = (self.axis.start - axis.start) // self.width
+        n_sensors = len(self.sensors)
+
+        def fold(arrays, reduce, fill):
+            return {
+                f: reduce(_pad(a, lead, len(axis) * factor, fill).reshape(-1, factor, n_sensors), axis=1)
+                for f, a in arrays.items()
+            }
+
+        return RollupLevel(name, axis, self.sensors,
+                           fold(self.count, np.sum, 0), fold(self.total, np.sum, 0.0),
+                           fold(self.low, np.min, np.inf), fold(self.high, np.max, -np.inf),
+                           fold(self.filled, np.sum, 0) if self.filled is not None else None)
+
+    def refresh_samples(self, buckets, data):
+        # Recomputes the given buckets in place from the slots of data.
+        size = self.width // data.timeline.step
+        lead = (data.timeline.start - self.axis.start) // data.timeline.step
+        for field in store.FIELDS:
+            values = store.to_float64(_take_rows(getattr(data, field), buckets, size, lead, np.nan))
+            (self.count[field][buckets], self.total[field][buckets],
+             self.low[field][buckets], self.high[field][buckets]) = _reduce_samples(values)
+
+    def refresh_from(self, buckets, finer):
+        # Recomputes the given buckets in place from the level coarsen() folds.
+        factor = self.width // finer.width
+        lead = (finer.axis.start - self.axis.start) // finer.width
+        for arrays, target, reduce, fill in ((finer.count, self.count, np.sum, 0), (finer.total, self.total, np.sum, 0.0),
+                                             (finer.low, self.low, np.min, np.inf), (finer.high, self.high, np.max, -np.inf)):
+            for field, values in arrays.items():
+                target[field][buckets] = reduce(_take_rows(values, buckets, factor, lead, fill), axis=1)
+
+    def mean(self, field):
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return store.round_values(self.total[field] / self.count[field])
+
+    def coverage(self, field):
+        return self.count[field]
+
+    def fill_rate(self, field):
+        # Share of the bucket's samples that were imputed, NaN when empty.
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(self.count[field] > 0, self.filled[field] / self.count[field], np.nan)
+
+    def minimum(self, field):
+        return np.where(self.count[field] > 0, self.low[field], np.nan)
+
+    def maximum(self, field):
+        return np.where(self.count[field] > 0, self.high[field], np.nan)
+
+    def to_store(self):
+        averaged = store.SensorStore(self.axis, self.sensors)
+        for field in store.FIELDS:
+            getattr(averaged, field)[:] = self.mean(field)
+        return averaged
+
+    def to_columns(self):
+        columns = {"time": np.array(self.labels), "sensor": np.array(self.sensors)}
+        for field in store.FIELDS:
+            columns[field] = self.mean(field).astype(np.float32)
+            columns[f"{field}_count"] = self.count[field].astype(np.int32)
+            columns[f"{field}_min"] = self.minimum(field).astype(np.float32)
+            columns[f"{field}_max"] = self.maximum(field).astype(np.float32)
+            if self.filled is not None:
+                columns[f"{field}_fill_rate"] = self.fill_rate(field).astype(np.float32)
+        return columns
+
+    def to_dict(self):
+        rows = self.to_store().to_dict()
+        counts = {field: self.count[field].tolist() for field in store.FIELDS}
+        rates = {}
+        if self.filled is not None:
+            for field in store.FIELDS:
+                rate = self.fill_rate(field)
+                cells = np.round(rate, 3).astype(object)
+                cells[np.isnan(rate)] = store.MISSING
+                rates[field] = cells.tolist()
+        for slot, t in enumerate(self.labels):
+            for col, s in enumerate(self.sensors):
+                for field in store.FIELDS:
+                    rows[t][s][f"{field}_count"] = counts[field][slot][col]
+                    if rates:
+                        rows[t][s][f"{field}_fill_rate"] = rates[field][slot][col]
+        return rows
+
+
+def rollup(data, levels=DEFAULT_LEVELS, imputed=None):
+
+    # Each requested level is folded from the next finer requested one when
+    # its width divides evenly, otherwise from the slot data on data.timeline.
+    # imputed, {field: (slot x sensor) mask}, adds the fill counts.
+    results = {}
+    previous = None
+    for name in sorted(levels, key=lambda n: LEVELS[n][0]):
+        width, key_len = LEVELS[name]
+        if width % data.timeline.step:
+            raise ValueError(f"{name} buckets of {width} s are not a multiple of the {data.timeline.step} s sampling interval")
+        if previous is not None and width % previous.width == 0:
+            level = previous.coarsen(name, width, key_len)
+        else:
+            level = RollupLevel.from_samples(name, width, data, key_len, imputed)
+        results[name] = level
+        previous = level
+    return results
+
+
+def update(results, data, slots):
+
+    # Brings rollup(data, ...) results up to date after the given slots of
+    # data changed, deriving every level the way rollup() does. Only the
+    # buckets holding one of slots are recomputed, so the cost follows the
+    # number of changed slots, not the length of the axis.
+    slots = np.unique(np.asarray(slots, dtype=np.int64))
+    if not len(slots):
+        return results
+    seconds = data.timeline.start + slots * data.timeline.step
+    previous = None
+    for name in sorted(results, key=lambda n: results[n].width):
+        level = results[name]
+        buckets = np.unique((seconds - level.axis.start) // level.width)
+        if previous is not None and level.width % previous.width == 0:
+            level.refresh_from(buckets, previous)
+        else:
+            level.refresh_samples(buckets, data)
+        previous = level
+    return results
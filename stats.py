@@ -0,0 +1,165 @@
+import math
+
+import numpy as np
+
+import store
+
+
+class RunningStats:
+    """Count, mean, M2, min and max of a stream of readings.
+
+    Batches are folded in with Chan's parallel update, so two accumulators
+    built from different sensors, days or worker processes merge into the
+    same result as one pass over all of their values.
+    """
+
+    def __init__(self, keep_values=False):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self.values = [] if keep_values else None
+
+    def _combine(self, count, mean, m2, v_min, v_max):
+        if not self.count:
+            self.count, self.mean, self.m2, self.min, self.max = count, mean, m2, v_min, v_max
+            return
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * count / total
+        self.m2 += m2 + delta * delta * self.count * count / total
+        self.count = total
+        self.min = min(self.min, v_min)
+        self.max = max(self.max, v_max)
+
+    def add(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        if not values.size:
+            return self
+        mean = float(values.mean())
+        m2 = float(((values - mean) ** 2).sum())
+        self._combine(values.size, mean, m2, float(values.min()), float(values.max()))
+        if self.values is not None:
+            self.values.extend(values.tolist())
+        return self
+
+    def merge(self, other):
+        if other.count:
+            self._combine(other.count, other.mean, other.m2, other.min, other.max)
+            if self.values is not None and other.values is not None:
+                self.values.extend(other.values)
+        return self
+
+    @property
+    def std(self):
+        # Population standard deviation, 0 below two readings.
+        return math.sqrt(self.m2 / self.count) if self.count >= 2 else 0
+
+    def summary(self):
+        summary = {
+            "avg": round(self.mean, 2) if self.count else None,
+            "min": self.min if self.count else None,
+            "max": self.max if self.count else None,
+            "std": round(self.std, 2) if self.count else None,
+            "valid_count": self.count
+        }
+        if self.values is not None:
+            summary["values"] = self.values
+        return summary
+
+
+class ActivitySpan:
+    """Number of active slots and the first/last active time label."""
+
+    def __init__(self):
+        self.count = 0
+        self.first = None
+        self.last = None
+
+    def add(self, count, first, last):
+        if count:
+            self.count += count
+            self.first = first if self.first is None else min(self.first, first)
+            self.last = last if self.last is None else max(self.last, last)
+        return self
+
+    def merge(self, other):
+        return self.add(other.count, other.first, other.last)
+
+    def relabel(self, fn):
+        if self.count:
+            self.first, self.last = fn(self.first), fn(self.last)
+        return self
+
+    def summary(self):
+        return {
+            "active_count": self.count,
+            "start_time": self.first,
+            "end_time": self.last
+        }
+
+
+class SensorStats:
+
+    def __init__(self, keep_values=False):
+        self.temperature = RunningStats(keep_values)
+        self.humidity = RunningStats(keep_values)
+        self.activity = ActivitySpan()
+
+    @classmethod
+    def from_columns(cls, temps, hums, labels, keep_values=False):
+        sensor_stats = cls(keep_values)
+        temps = store.to_float64(temps)
+        hums = store.to_float64(hums)
+        t_valid = ~np.isnan(temps)
+        h_valid = ~np.isnan(hums)
+        sensor_stats.temperature.add(temps[t_valid])
+        sensor_stats.humidity.add(hums[h_valid])
+        active = np.flatnonzero(t_valid | h_valid)
+        if len(active):
+            sensor_stats.activity.add(len(active), labels[active[0]], labels[active[-1]])
+        return sensor_stats
+
+    def merge(self, other):
+        self.temperature.merge(other.temperature)
+        self.humidity.merge(other.humidity)
+        self.activity.merge(other.activity)
+        return self
+
+    def summary(self):
+        return {
+            "temperature": self.temperature.summary(),
+            "humidity": self.humidity.summary(),
+            "activity": self.activity.summary()
+        }
+
+
+def merge_all(accumulators, keep_values=False):
+    total = None
+    for acc in accumulators:
+        if total is None:
+            total = type(acc)(keep_values)
+        total.merge(acc)
+    return total
+
+
+def city_summary(sensor_stats, keep_values=False):
+
+    temps = merge_all((s.temperature for s in sensor_stats), keep_values) or RunningStats(keep_values)
+    hums = merge_all((s.humidity for s in sensor_stats), keep_values) or RunningStats(keep_values)
+
+    summary = {
+        "avg_temp": round(temps.mean, 2) if temps.count else None,
+        "min_temp": temps.min if temps.count else None,
+        "max_temp": temps.max if temps.count else None,
+        "avg_hum": round(hums.mean, 2) if hums.count else None,
+        "min_hum": hums.min if hums.count else None,
+        "max_hum": hums.max if hums.count else None,
+        "total_temp_records": temps.count,
+        "total_hum_records": hums.count
+    }
+    if keep_values:
+        summary["temps"] = temps.values
+        summary["hums"] = hums.values
+    return summary
@@ -0,0 +1,134 @@
+from collections.abc import Mapping
+
+import numpy as np
+
+import timeaxis
+
+MISSING = "N/A"
+FIELDS = ("temp", "hum")
+DECIMALS = 2
+
+
+def to_float64(values):
+    # float32 keeps ~7 significant digits, so give each reading back as the
+    # shortest decimal that maps to the same float32, i.e. what was parsed.
+    values = np.asarray(values)
+    wide = values.astype(np.float64)
+    if values.dtype != np.float32:
+        return wide
+    # Most readings have at most DECIMALS decimals; below 2**16 float32 steps
+    # are finer than 10**-DECIMALS, so a rounding that maps back is the one.
+    rounded = np.round(wide, DECIMALS)
+    done = (rounded.astype(np.float32) == values) & (np.abs(wide) < 2 ** 16)
+    wide = np.where(done, rounded, wide)
+    flat = wide.reshape(-1)
+    narrow = values.reshape(-1)
+    pending = np.flatnonzero(~done.reshape(-1) & np.isfinite(flat) & (flat != 0))
+    exponent = np.floor(np.log10(np.abs(flat[pending])))
+    # The scales below stay exact powers of ten (up to 10**22) for these;
+    # the few others go through str().
+    exact_scale = (exponent >= -14) & (exponent <= 27)
+    for i in pending[~exact_scale].tolist():
+        flat[i] = float(str(narrow[i]))
+    pending, exponent = pending[exact_scale], exponent[exact_scale]
+    for digits in range(6, 10):
+        if not len(pending):
+            break
+        decimals = digits - 1 - exponent
+        scale = 10.0 ** np.abs(decimals)
+        x = flat[pending]
+        shortest = np.where(decimals >= 0, np.round(x * scale) / scale, np.round(x / scale) * scale)
+        exact = shortest.astype(np.float32) == narrow[pending]
+        flat[pending[exact]] = shortest[exact]
+        pending, exponent = pending[~exact], exponent[~exact]
+    return wide
+
+
+def round_values(values):
+    # np.round on the scaled value can land on the other side of a .xx5 tie
+    # than round() does, so redo the few near a tie with round().
+    values = np.asarray(values, dtype=np.float64)
+    scale = 10.0 ** DECIMALS
+    scaled = values * scale
+    rounded = np.round(scaled) / scale
+    ties = np.flatnonzero(np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6)
+    flat = rounded.reshape(-1)
+    for i, v in zip(ties.tolist(), values.reshape(-1)[ties].tolist()):
+        flat[i] = round(v, DECIMALS)
+    return rounded
+
+
+class SensorStore(Mapping):
+    """Slot x sensor float32 columns for temp and hum, NaN where missing.
+
+    Behaves like the old nested dict: store[time][sensor]["temp"] returns a
+    float or "N/A". timeline is a TimeAxis or a list of labels.
+    """
+
+    def __init__(self, timeline, sensors):
+        self.timeline = timeline if isinstance(timeline, timeaxis.TimeAxis) else list(timeline)
+        self.sensors = list(sensors)
+        self.sensor_index = {s: col for col, s in enumerate(self.sensors)}
+        self._slot_index = None
+        shape = (len(self.timeline), len(self.sensors))
+        self.temp = np.full(shape, np.nan, dtype=np.float32)
+        self.hum = np.full(shape, np.nan, dtype=np.float32)
+
+    @property
+    def slot_index(self):
+        # Label -> slot, only built when a row is looked up by its label.
+        if self._slot_index is None:
+            self._slot_index = {t: slot for slot, t in enumerate(self.timeline)}
+        return self._slot_index
+
+    def set_column(self, sensor, field, values, slots=slice(None)):
+        getattr(self, field)[slots, self.sensor_index[sensor]] = values
+
+    def values(self, field):
+        return to_float64(getattr(self, field))
+
+    def valid(self, field):
+        return ~np.isnan(getattr(self, field))
+
+    @property
+    def nbytes(self):
+        return self.temp.nbytes + self.hum.nbytes
+
+    def _cell(self, field, slot, col):
+        v = getattr(self, field)[slot, col]
+        return MISSING if np.isnan(v) else float(str(v))
+
+    def __getitem__(self, t):
+        slot = self.slot_index[t]
+        return {
+            s: {field: self._cell(field, slot, col) for field in FIELDS}
+            for col, s in enumerate(self.sensors)
+        }
+
+    def __iter__(self):
+        return iter(self.timeline)
+
+    def __len__(self):
+        return len(self.timeline)
+
+    def to_columns(self):
+        return {
+            "time": np.array(list(self.timeline)),
+            "sensor": np.array(self.sensors),
+            "temp": self.temp,
+            "hum": self.hum
+        }
+
+    def _rows(self, field):
+        vals = self.values(field)
+        obj = vals.astype(object)
+        obj[np.isnan(vals)] = MISSING
+        return obj.tolist()
+
+    def to_dict(self):
+        temps = self._rows("temp")
+        hums = self._rows("hum")
+        return {
+            t: {s: {"temp": temps[slot][col], "hum": hums[slot][col]} for col, s in enumerate(self.sensors)}
+            for slot, t in enumerate(self.timeline)
+        }
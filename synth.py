@@ -0,0 +1,119 @@
+import datetime as dt
+import importlib
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+import timeaxis
+
+CORRUPTION_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "raw", "_corruption.py")
+HEADER = "Date;Time;Temperature (C);Humidity (%)\n"
+START_DATE = dt.date(2024, 9, 1)
+MANIFEST = "corpus.json"
+
+_corruption = None
+
+
+def load_corruption():
+    # data/raw is not a package; it goes on sys.path so that worker
+    # processes can import the script's worker function by name too.
+    global _corruption
+    if _corruption is None:
+        sys.path.insert(0, os.path.dirname(CORRUPTION_SCRIPT))
+        _corruption = importlib.import_module("_corruption")
+    return _corruption
+
+
+def parse_scales(spec):
+    # "9x1,100x90" -> [(9, 1), (100, 90)], sensors x days.
+    scales = []
+    for part in str(spec).split(","):
+        part = part.strip().lower()
+        if part:
+            sensors, _, days = part.partition("x")
+            scales.append((int(sensors), int(days or 1)))
+    return scales
+
+
+def day_readings(rng, n_slots, coverage):
+
+    # Slowly drifting temperature and humidity with one random outage per
+    # sensor-day, so roughly 1 - coverage of the slots have no row.
+    online = np.ones(n_slots, dtype=bool)
+    outage = int(round(n_slots * (1 - coverage)))
+    if outage:
+        start = int(rng.integers(0, n_slots - outage + 1))
+        online[start:start + outage] = False
+
+    steps = rng.normal(0, 1, size=(n_slots, 2)) * (0.02, 0.1)
+    temp = np.clip(rng.uniform(8, 24) + np.cumsum(steps[:, 0]), -5, 45)
+    hum = np.clip(rng.uniform(45, 90) + np.cumsum(steps[:, 1]), 5, 99)
+    return online, np.round(temp, 1), np.round(hum, 1)
+
+
+def write_clean_day(path, date, interval, rng, coverage=0.9):
+    n_slots = timeaxis.DAY_SECONDS // interval
+    online, temp, hum = day_readings(rng, n_slots, coverage)
+    axis = timeaxis.TimeAxis.for_days(date, step=interval)
+    times = axis.labels(np.flatnonzero(online))
+    day = date.strftime(timeaxis.DATE_FORMAT)
+    rows = [f"{day};{t};{tv:.1f};{hv:.1f}\n" for t, tv, hv in zip(times, temp[online].tolist(), hum[online].tolist())]
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(HEADER)
+        f.writelines(rows)
+    return len(rows)
+
+
+def generate_corpus(out_dir, sensors=9, days=1, interval=5, corruption_rate=0.15, coverage=0.9, seed=0, workers=None):
+
+    # Writes SENSORxx_DAYyy.csv and its corrupted SENSORxx_DAYyy_raw.csv for
+    # every sensor and day, in the layout of data/raw. Every file gets its
+    # own generators seeded from (seed, sensor, day), so a corpus is the
+    # same on every run, whatever the number of workers corrupting it.
+    corruption = load_corruption()
+    os.makedirs(out_dir, exist_ok=True)
+    stats = corruption.CorruptionStats()
+    start = time.perf_counter()
+    clean_rows = 0
+
+    tasks = []
+    for d in range(days):
+        date = START_DATE + dt.timedelta(days=d)
+        for s in range(1, sensors + 1):
+            name = f"SENSOR{s:02d}_DAY{d + 1:02d}"
+            clean_path = os.path.join(out_dir, f"{name}.csv")
+            clean_rows += write_clean_day(clean_path, date, interval, np.random.default_rng([seed, s, d]), coverage)
+            tasks.append((clean_path, os.path.join(out_dir, f"{name}_raw.csv"), [seed, s, d, 1], corruption_rate))
+
+    with open(os.path.join(out_dir, "_corruption.log"), "w", encoding="utf-8") as log_file:
+        for _, file_stats, file_log, _ in corruption.corrupt_files(tasks, workers):
+            stats.merge(file_stats)
+            log_file.write(file_log)
+        elapsed = time.perf_counter() - start
+        corruption.generate_detailed_report(stats, log_file, elapsed, corruption_rate)
+
+    raw_bytes = sum(
+        os.path.getsize(os.path.join(out_dir, f)) for f in os.listdir(out_dir) if f.endswith("_raw.csv")
+    )
+    manifest = {
+        "sensors": sensors,
+        "days": days,
+        "interval": interval,
+        "corruption_rate": corruption_rate,
+        "coverage": coverage,
+        "seed": seed,
+        "files": sensors * days,
+        "clean_rows": clean_rows,
+        "raw_bytes": raw_bytes,
+        "generate_s": round(elapsed, 3),
+        "rows_deleted": stats.rows_deleted,
+        "rows_corrupted": stats.rows_corrupted,
+        "failed": stats.failed,
+        "corruption_by_type": stats.corruption_by_type
+    }
+    with open(os.path.join(out_dir, MANIFEST), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
@@ -0,0 +1,183 @@
+import datetime as dt
+from collections.abc import Sequence
+
+import numpy as np
+
+DAY_SECONDS = 86400
+EPOCH = dt.datetime(1970, 1, 1)
+DATE_FORMAT = "%d.%m.%Y"
+TIME_FORMAT = "%H:%M:%S"
+
+
+def to_seconds(when):
+    if not isinstance(when, dt.datetime):
+        when = dt.datetime.combine(when, dt.time())
+    return int((when - EPOCH).total_seconds())
+
+
+def from_seconds(seconds):
+    return EPOCH + dt.timedelta(seconds=int(seconds))
+
+
+def _digits(chars, columns):
+    values = np.zeros(chars.shape[1], dtype=np.int32)
+    ok = np.ones(chars.shape[1], dtype=bool)
+    for j in columns:
+        digit = chars[j] - np.uint8(ord("0"))
+        ok &= digit < 10
+        values = values * 10 + digit
+    return values, ok
+
+
+def _char_matrix(raw, width):
+    # Character columns (width x rows), contiguous so each is one pass.
+    # Rows shorter than width are NUL padded and fail the digit/separator
+    # checks; longer rows must be NUL past width.
+    raw = np.asarray(raw, dtype=bytes)
+    if raw.dtype.itemsize < width:
+        raw = raw.astype(f"S{width}")
+    chars = raw.view(np.uint8).reshape(len(raw), raw.dtype.itemsize)
+    return np.ascontiguousarray(chars[:, :width].T), (chars[:, width:] == 0).all(axis=1)
+
+
+def _parse_days(dates):
+    # "DD.MM.YYYY" bytes to days since the epoch. Returns (days, ok).
+    chars, ok = _char_matrix(dates, 10)
+    ok &= (chars[2] == ord(".")) & (chars[5] == ord("."))
+    day, ok_d = _digits(chars, (0, 1))
+    month, ok_m = _digits(chars, (3, 4))
+    year, ok_y = _digits(chars, (6, 7, 8, 9))
+    ok &= ok_d & ok_m & ok_y & (month >= 1) & (month <= 12)
+
+    months = np.where(ok, (year - 1970) * 12 + month - 1, 0)
+    first_day = months.astype("datetime64[M]").astype("datetime64[D]").astype(np.int64)
+    next_first = (months + 1).astype("datetime64[M]").astype("datetime64[D]").astype(np.int64)
+    ok &= (day >= 1) & (day <= next_first - first_day)
+    return first_day + day - 1, ok
+
+
+def parse_timestamps(dates, times):
+
+    # "DD.MM.YYYY" and "HH:MM:SS" bytes arrays to epoch seconds, parsed on
+    # the character columns. A file holds a date or two, so only the first
+    # row and the rows with another date have theirs parsed. Returns
+    # (seconds, ok).
+    dates = np.asarray(dates, dtype=bytes)
+    other = np.flatnonzero(dates != dates[0]) if len(dates) else np.zeros(0, dtype=np.int64)
+    some_days, some_ok = _parse_days(np.concatenate([dates[:1], dates[other]]))
+    days = np.full(len(dates), some_days[0] if len(dates) else 0)
+    ok = np.full(len(dates), some_ok[0] if len(dates) else False)
+    days[other] = some_days[1:]
+    ok[other] = some_ok[1:]
+
+    chars, time_ok = _char_matrix(times, 8)
+    ok &= time_ok & (chars[2] == ord(":")) & (chars[5] == ord(":"))
+    hour, ok_h = _digits(chars, (0, 1))
+    minute, ok_mi = _digits(chars, (3, 4))
+    second, ok_s = _digits(chars, (6, 7))
+    ok &= ok_h & ok_mi & ok_s & (hour < 24) & (minute < 60) & (second < 60)
+
+    seconds = days * DAY_SECONDS + hour * 3600 + minute * 60 + second
+    return np.where(ok, seconds, 0), ok
+
+
+def parse_date(text):
+    try:
+        return dt.datetime.strptime(text.strip(), DATE_FORMAT).date()
+    except ValueError:
+        return None
+
+
+class TimeAxis(Sequence):
+    """Evenly spaced slots as integers: slot i starts at start + i * step
+    epoch seconds.
+
+    Indexing gives the slot label, so an axis stands in for the old list of
+    "HH:MM:SS" strings. Labels are cut to key_len characters of HH:MM:SS
+    and carry the date as well once the axis spans more than one day; with
+    key_len 0 they are the YYYY-MM-DD date alone.
+    """
+
+    def __init__(self, start, n_slots, step=5, key_len=8):
+        self.start = int(start)
+        self.n_slots = int(n_slots)
+        self.step = int(step)
+        self.key_len = key_len
+        last = self.start + max(self.n_slots - 1, 0) * self.step
+        self.multi_day = self.start // DAY_SECONDS != last // DAY_SECONDS
+
+    @classmethod
+    def for_days(cls, first, last=None, step=5):
+        start = to_seconds(first)
+        end = to_seconds(last or first) + DAY_SECONDS
+        return cls(start, (end - start) // step, step)
+
+    @classmethod
+    def for_range(cls, start, end, step=5):
+        # start is aligned down to the step so slots stay on the day grid;
+        # an end before start gives an empty axis.
+        start = to_seconds(start)
+        start -= start % step
+        return cls(start, max(-(-(to_seconds(end) - start) // step), 0), step)
+
+    @property
+    def end(self):
+        return self.start + self.n_slots * self.step
+
+    @property
+    def key(self):
+        return [self.start, self.step, self.n_slots]
+
+    def __len__(self):
+        return self.n_slots
+
+    def __eq__(self, other):
+        return isinstance(other, TimeAxis) and self.key + [self.key_len] == other.key + [other.key_len]
+
+    def __hash__(self):
+        return hash((*self.key, self.key_len))
+
+    def seconds(self):
+        return self.start + np.arange(self.n_slots, dtype=np.int64) * self.step
+
+    def _format(self, seconds):
+        stamps = np.datetime_as_string(np.asarray(seconds, dtype=np.int64).astype("datetime64[s]")).tolist()
+        key_len = self.key_len
+        if not key_len:
+            return [s[:10] for s in stamps]
+        if self.multi_day:
+            return [f"{s[:10]} {s[11:11 + key_len]}" for s in stamps]
+        return [s[11:11 + key_len] for s in stamps]
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return self._format(self.seconds()[i])
+        if i < 0:
+            i += self.n_slots
+        if not 0 <= i < self.n_slots:
+            raise IndexError("slot out of range")
+        return self._format([self.start + i * self.step])[0]
+
+    def __iter__(self):
+        return iter(self._format(self.seconds()))
+
+    def labels(self, slots):
+        # Labels of many slots at once, without indexing one by one.
+        return self._format(self.start + np.asarray(slots, dtype=np.int64) * self.step)
+
+    def slots(self, seconds, ok=True):
+        # Slot of each timestamp; -1 when it is invalid, outside the axis or
+        # not on the sampling grid.
+        rel = np.asarray(seconds, dtype=np.int64) - self.start
+        slot = rel // self.step
+        ok = ok & (rel >= 0) & (rel % self.step == 0) & (slot < self.n_slots)
+        return np.where(ok, slot, -1)
+
+    def offset_of(self, other):
+        # Slot of this axis where other's first slot falls (same step).
+        return (other.start - self.start) // self.step
+
+    def resample(self, width, key_len=8):
+        # Axis of width-second buckets covering this one, aligned to width.
+        start = self.start - self.start % width
+        return TimeAxis(start, -(-(self.end - start) // width), width, key_len)
@@ -0,0 +1,366 @@
+import os
+import time
+
+import numpy as np
+
+import anomaly
+import consensus
+import error_table
+import io_utils
+import proc
+import query
+import report
+import rollup
+import stats
+import store
+import timeaxis
+
+POLL_SECONDS = 1.0
+FLUSH_SECONDS = 60.0
+ROLLOVER_GRACE = 30.0
+TICK_BYTES = io_utils.BLOCK_BYTES
+
+class SourceTail:
+    """A growing SENSORxx.CSV, read on from the byte after its last whole line."""
+
+    def __init__(self, path, sensor, offset=0):
+        # held is the date of a line past the live day; the tail waits there
+        # for the rollover. resets counts truncations and replacements.
+        self.path = path
+        self.sensor = sensor
+        self.offset = offset
+        self.held = None
+        self.behind = False
+        self.resets = 0
+        self.identity = None
+        self.base = 0
+        self.data = b""
+
+    @classmethod
+    def at_end(cls, path, sensor):
+        return cls(path, sensor, os.path.getsize(path))
+
+    def poll(self, max_bytes=TICK_BYTES):
+
+        # The new whole lines, about max_bytes at most, as a split_block
+        # block; data holds their bytes from file offset base. A file that
+        # shrank or was replaced is read again from its start.
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        size, identity = st.st_size, (st.st_dev, st.st_ino)
+        if size < self.offset or self.identity not in (None, identity):
+            self.offset = 0
+            self.resets += 1
+        self.identity = identity
+        if size == self.offset:
+            self.behind = False
+            return None
+
+        with open(self.path, "rb") as f:
+            f.seek(self.offset)
+            data = f.read(min(size - self.offset, max_bytes))
+            end = data.rfind(b"\n") + 1
+            # A line longer than max_bytes is still read whole; a last line
+            # without its newline is being written and waits for the next poll.
+            while not end and self.offset + len(data) < size:
+                data += f.read(max_bytes)
+                end = data.rfind(b"\n") + 1
+        if not end:
+            self.behind = False
+            return None
+
+        self.base, self.data = self.offset, data
+        self.offset += end
+        self.behind = self.offset < size
+        return io_utils.split_block(np.frombuffer(data, dtype=np.uint8, count=end), self.base)
+
+def _row_times(block):
+    # File offsets and epoch seconds of every row of a block, ok where the
+    # row has a valid Date and Time.
+    offsets, dates, times, _, _, rows = block
+    seconds, ok = timeaxis.parse_timestamps(dates, times)
+    if not rows:
+        return offsets, seconds, ok
+    fields = [(parts + ["", ""])[:2] for _, _, parts in rows]
+    row_seconds, row_ok = timeaxis.parse_timestamps(
+        np.array([d.encode() for d, _ in fields], dtype=bytes),
+        np.array([t.encode() for _, t in fields], dtype=bytes)
+    )
+    row_offsets = np.array([offset for offset, _, _ in rows], dtype=np.int64)
+    return (np.concatenate([offsets, row_offsets]), np.concatenate([seconds, row_seconds]),
+            np.concatenate([ok, row_ok]))
+
+def _lines_at(data, base, offsets):
+    # The stripped lines of data, read from file offset base, at offsets.
+    lines = np.empty(len(offsets), dtype=object)
+    for i, offset in enumerate(offsets.tolist()):
+        end = data.find(b"\n", offset - base)
+        lines[i] = data[offset - base:end if end != -1 else len(data)].decode("utf-8", "replace").strip()
+    return lines
+
+def _cut_block(block, cut):
+    # The rows of a block before file offset cut.
+    offsets, dates, times, temps, hums, rows = block
+    keep = offsets < cut
+    return (offsets[keep], dates[keep], times[keep], temps[keep], hums[keep],
+            [row for row in rows if row[0] < cut])
+
+class LiveDay:
+    """Store, presence, errors, statistics and roll-ups of the day being
+    watched, updated from the new lines only; flush() writes what main.py
+    writes for a day."""
+
+    def __init__(self, date, sources, step=5, levels=rollup.DEFAULT_LEVELS,
+                 temp_range=None, hum_range=None, invalid_tokens=(), anomaly_limits=None):
+        self.date = date
+        self.axis = timeaxis.TimeAxis.for_days(date, step=step)
+        self.sources = {info["sensor"]: str(info["path"]) for info in sources}
+        self.sensors = list(self.sources)
+        self.ranges = (temp_range, hum_range, list(invalid_tokens))
+        self.anomaly_limits = anomaly_limits
+        self.data = store.SensorStore(self.axis, self.sensors)
+        self.raw = store.SensorStore(self.axis, self.sensors)
+        self.lines = {s: np.full(len(self.axis), error_table.NO_OFFSET, dtype=np.int64) for s in self.sensors}
+        self.generation = {s: np.zeros(len(self.axis), dtype=np.int32) for s in self.sensors}
+        self.resets = {s: 0 for s in self.sensors}
+        self.flags = {s: {field: np.zeros(len(self.axis), dtype=np.int8) for field in store.FIELDS} for s in self.sensors}
+        self.presence = {s: np.zeros(len(self.axis), dtype=bool) for s in self.sensors}
+        self.error_parts = {s: [] for s in self.sensors}
+        self._unflagged = {s: None for s in self.sensors}
+        self.stats = {s: stats.SensorStats() for s in self.sensors}
+        self.rolled = rollup.rollup(self.data, levels)
+        self.rows = 0
+        self.dirty = False
+        self._touched = []
+
+        # Slot-sized scratch arrays each block is ingested into; only the
+        # slots a block touched are read back and reset.
+        self._columns = {field: np.full(len(self.axis), np.nan, dtype=np.float32) for field in store.FIELDS}
+        self._presence = np.zeros(len(self.axis), dtype=bool)
+        self._lines = np.zeros(len(self.axis), dtype=np.int64)
+
+    def ingest(self, tail, block):
+
+        # Lines past the end of the day are left in the file for the next
+        # day; the tail is held at the first of them.
+        offsets, seconds, ok = _row_times(block)
+        later = ok & (seconds >= self.axis.end)
+        if later.any():
+            first = np.flatnonzero(later)[np.argmin(offsets[later])]
+            tail.offset = int(offsets[first])
+            tail.held = timeaxis.from_seconds(seconds[first]).date()
+            block = _cut_block(block, tail.offset)
+
+        n_rows = len(block[0]) + len(block[5])
+        if not n_rows:
+            return 0
+
+        sensor = tail.sensor
+        col = self.data.sensor_index[sensor]
+        parts = self.error_parts[sensor]
+        proc._ingest_block(block, self.axis, *self.ranges, self._columns, self._presence, parts, self._lines)
+        parts[-1] += (_lines_at(tail.data, tail.base, parts[-1][3]),)
+        touched = np.flatnonzero(self._presence)
+        self.lines[sensor][touched] = self._lines[touched]
+        self.resets[sensor] = tail.resets
+        self.generation[sensor][touched] = tail.resets
+        temps, hums = (self._columns[field][touched] for field in store.FIELDS)
+        self._presence[touched] = False
+        for values in self._columns.values():
+            values[touched] = np.nan
+
+        presence = self.presence[sensor]
+        replaced = presence[touched].any()
+        presence[touched] = True
+        for target in (self.data, self.raw):
+            target.temp[touched, col] = temps
+            target.hum[touched, col] = hums
+        for flags in self.flags[sensor].values():
+            flags[touched] = error_table.VALID
+        if len(touched):
+            pending = self._unflagged[sensor]
+            self._unflagged[sensor] = int(touched[0]) if pending is None else min(pending, int(touched[0]))
+        if replaced:
+            # A repeated timestamp replaced a reading: summarise the column again.
+            self.stats[sensor] = stats.SensorStats.from_columns(self.data.temp[:, col], self.data.hum[:, col], self.axis)
+        else:
+            self.stats[sensor].merge(stats.SensorStats.from_columns(temps, hums, self.axis.labels(touched)))
+        self._touched.append(touched)
+
+        self.rows += n_rows
+        self.dirty = True
+        return n_rows
+
+    def flag_anomalies(self):
+
+        # Only the stretch the readings since the last call can affect is
+        # scanned again (anomaly.detect_since), not the whole day so far.
+        if self.anomaly_limits is None:
+            return
+        for sensor, col in self.data.sensor_index.items():
+            first, self._unflagged[sensor] = self._unflagged[sensor], None
+            if first is None:
+                continue
+            changed = []
+            for field in store.FIELDS:
+                raw = getattr(self.raw, field)[:, col]
+                start, codes = anomaly.detect_since(raw, self.axis.step, first, *self.anomaly_limits[field])
+                flags = self.flags[sensor][field]
+                flips = start + np.flatnonzero(codes != flags[start:])
+                if len(flips):
+                    getattr(self.data, field)[flips, col] = np.where(codes[flips - start] != error_table.VALID, np.nan, raw[flips])
+                    flags[flips] = codes[flips - start]
+                    changed.append(flips)
+            if changed:
+                self.stats[sensor] = stats.SensorStats.from_columns(self.data.temp[:, col], self.data.hum[:, col], self.axis)
+                self._touched.extend(changed)
+
+    def update(self):
+        if self._touched:
+            rollup.update(self.rolled, self.data, np.concatenate(self._touched))
+            self._touched = []
+
+    def errors(self):
+        # Errors keep the line they were recorded from; see _stored_lines.
+        tables = []
+        for sensor, parts in self.error_parts.items():
+            if len(parts) > 1:
+                parts[:] = [tuple(np.concatenate(column) for column in zip(*parts))]
+            flagged = []
+            for field, codes in self.flags[sensor].items():
+                slots = np.flatnonzero(codes)
+                flagged.append((slots, codes[slots], np.full(len(slots), proc.FIELDS[field]),
+                                self.lines[sensor][slots], self._stored_lines(sensor, slots)))
+            tables.append(error_table.ErrorTable.for_sensor(sensor, self.sources[sensor], parts + flagged))
+        return error_table.concat(tables)
+
+    def _stored_lines(self, sensor, slots):
+        # None for slots whose line is still at its offset, the line rebuilt
+        # from the raw readings for slots read before the source was reset.
+        lines = np.full(len(slots), None, dtype=object)
+        stale = np.flatnonzero(self.generation[sensor][slots] != self.resets[sensor])
+        if len(stale):
+            col = self.raw.sensor_index[sensor]
+            date = self.date.strftime(timeaxis.DATE_FORMAT)
+            values = [self.raw.values(field)[slots[stale], col].tolist() for field in store.FIELDS]
+            for i, label, temp, hum in zip(stale.tolist(), self.axis.labels(slots[stale]), *values):
+                lines[i] = ";".join([date, label] + ["" if v != v else str(v) for v in (temp, hum)])
+        return lines
+
+    def flush(self, output_dir, formats=None):
+        formats = formats or {}
+        os.makedirs(output_dir, exist_ok=True)
+        self.flag_anomalies()
+        self.update()
+
+        gaps = []
+        uptime = {}
+        for sensor, presence in self.presence.items():
+            sensor_gaps = proc.identify_gaps(self.axis, presence, sensor)
+            uptime[sensor] = proc.uptime_summary(presence, sensor_gaps)
+            gaps.extend(sensor_gaps)
+        report.generate_error_log(self.errors(), self.axis, os.path.join(output_dir, "errors.log"), gaps, uptime)
+        report.generate_data_log(self.data, self.axis, self.sensors, os.path.join(output_dir, "clean_data.log"))
+
+        city_stats, sensors_stats = proc.statistics(self.data, self.sensors, self.stats)
+        city = consensus.Consensus(self.data)
+        city_summary = city.summary()
+        report.statistics_log(city_stats, sensors_stats, os.path.join(output_dir, "stats_report.log"), city_summary)
+
+        report.write_data(self.data, output_dir, "clean_data", formats.get("clean", "json"))
+        consensus.write(city, output_dir, formats.get("consensus", "json"), city_summary)
+        for name, level in self.rolled.items():
+            report.write_data(level, output_dir, f"data_{name}", formats.get(name, "json"))
+        query.write_index(output_dir, self.data, self.rolled)
+        self.dirty = False
+
+class Watcher:
+    """Tails every source and keeps output_dir/YYYY-MM-DD of the live day
+    current, flushing every flush_interval seconds while there is news."""
+
+    def __init__(self, sources, output_dir, step=5, levels=rollup.DEFAULT_LEVELS, formats=None,
+                 flush_interval=FLUSH_SECONDS, rollover_grace=ROLLOVER_GRACE, from_end=False,
+                 tick_bytes=TICK_BYTES, **validation):
+        self.sources = list(sources)
+        self.tails = [
+            (SourceTail.at_end if from_end else SourceTail)(info["path"], info["sensor"]) for info in self.sources
+        ]
+        self.output_dir = output_dir
+        self.step = step
+        self.levels = list(levels)
+        self.formats = formats or {}
+        self.flush_interval = flush_interval
+        self.rollover_grace = rollover_grace
+        self.tick_bytes = tick_bytes
+        self.validation = validation
+        self.live = None
+        self.ticks = 0
+        self.last_flush = time.monotonic()
+        self.first_hold = None
+
+    def _start_day(self, date):
+        self.live = LiveDay(date, self.sources, self.step, self.levels, **self.validation)
+        for tail in self.tails:
+            tail.held = None
+        self.first_hold = None
+        print(f"=== Watching {date}: {len(self.tails)} sources ===")
+
+    def day_dir(self):
+        # Named by the full date: days of different months cannot share it.
+        return os.path.join(self.output_dir, self.live.date.isoformat())
+
+    def flush(self):
+        self.live.flush(self.day_dir(), self.formats)
+        self.last_flush = time.monotonic()
+
+    def tick(self):
+
+        # Returns the number of lines ingested. The day rolls over once every
+        # tail is past it or quiet, after up to rollover_grace seconds.
+        self.ticks += 1
+        polled = [(tail, tail.poll(self.tick_bytes)) for tail in self.tails if tail.held is None]
+        if self.live is None:
+            # The live day starts at the earliest date any source has; lines
+            # before the first valid date have nothing to be placed on.
+            dates = [times[1][times[2]] for times in (_row_times(block) for _, block in polled if block)]
+            dates = np.concatenate(dates) if dates else np.zeros(0, dtype=np.int64)
+            if not len(dates):
+                return 0
+            self._start_day(timeaxis.from_seconds(dates.min()).date())
+
+        for tail in self.tails:
+            self.live.resets[tail.sensor] = tail.resets
+        rows = sum(self.live.ingest(tail, block) for tail, block in polled if block)
+        self.live.update()
+
+        now = time.monotonic()
+        held = [tail.held for tail in self.tails if tail.held]
+        if held:
+            self.first_hold = self.first_hold or now
+            quiet = all(tail.held or not tail.behind for tail in self.tails)
+            if quiet and (len(held) == len(self.tails) or now - self.first_hold >= self.rollover_grace):
+                self.flush()
+                print(f"Day {self.live.date} complete: {self.live.rows:,} lines -> {self.day_dir()}")
+                self._start_day(min(held))
+                return rows
+        if self.live.dirty and now - self.last_flush >= self.flush_interval:
+            self.flush()
+        return rows
+
+    def run(self, poll_interval=POLL_SECONDS, max_ticks=None):
+
+        # Polls until interrupted (or max_ticks), without sleeping while a
+        # tail is still catching up, and flushes what is pending on the way out.
+        try:
+            while max_ticks is None or self.ticks < max_ticks:
+                started = time.monotonic()
+                self.tick()
+                if not any(tail.behind and not tail.held for tail in self.tails):
+                    time.sleep(max(0.0, poll_interval - (time.monotonic() - started)))
+        except KeyboardInterrupt:
+            print("Stopping watch")
+        finally:
+            if self.live is not None and self.live.dirty:
+                self.flush()